@@ -2,12 +2,18 @@ import re
 
 from glob import glob
 from operator import itemgetter
-from os.path import isdir, join
+from os.path import isdir, join, normpath
 from sys import stderr, stdin
 
 from common import error, prompt_user, usage_error
+from mappingfile import get_format, read_entries, write_entries
+from matcher import ANYBRANCH, MappingMatcher
 from serverapi import ResourceConflict, ResourceNotFound
 
+# Default for "codemapper analyze": report files matched by more than this
+# number of groups.
+DEFAULT_MAX_GROUPS_PER_FILE = 2
+
 
 def arity(min_num, max_num=None):
     """
@@ -65,6 +71,35 @@ def create_regexp_from_pattern(pattern):
     return re.compile(regexp)
 
 
+def is_pattern_under(pattern, patternish_path):
+    """
+    Return whether the static prefix of pattern (the part before the first
+    segment with a wildcard) is patternish_path or a path under it, so that
+    all files the pattern matches on the branch of patternish_path are under
+    it. An ANYBRANCH segment stands for the branch in patternish_path.
+    """
+    path_segments = patternish_path.split("/")
+    i = 0
+    for segment in pattern.split("/"):
+        if i == len(path_segments):
+            return True
+        if segment == ANYBRANCH:
+            if path_segments[i] == "trunk":
+                i += 1
+            elif (path_segments[i] == "branches"
+                  and i + 1 < len(path_segments)):
+                i += 2
+            else:
+                return False
+        elif "*" in segment or ANYBRANCH in segment:
+            return False
+        elif segment == path_segments[i]:
+            i += 1
+        else:
+            return False
+    return i == len(path_segments)
+
+
 def is_affirmative(answer):
     return answer.lower().startswith("y")
 
@@ -76,10 +111,11 @@ def sanitize_base_path(base_path):
 
 
 class CommandExecutor:
-    def __init__(self, server, svn, output_fp):
+    def __init__(self, server, svn, output_fp, trust_paths=False):
         self._server = server
         self._svn = svn
         self._output_fp = output_fp
+        self._trust_paths = trust_paths
 
     #
     # Commands
@@ -94,6 +130,109 @@ class CommandExecutor:
         group = self._get_group_by_name(group_name)
         self._add_mapping(pattern, group, triggers_katt2)
 
+    @arity(0, 2)
+    def cmd_analyze(self, base_path, max_groups):
+        base_path = sanitize_base_path(base_path)
+        if max_groups is None:
+            max_groups = DEFAULT_MAX_GROUPS_PER_FILE
+        elif not max_groups.isdigit():
+            usage_error("MAX_GROUPS must be a non-negative integer")
+        else:
+            max_groups = int(max_groups)
+        base_path_info = self._get_path_info(base_path)
+        mappings = self._server.get_mappings()
+        group_map = create_id_to_item_map(self._server.get_groups())
+        matcher = MappingMatcher(create_mapping_regexps(mappings))
+        paths = self._svn.get_wc_files_under_path(base_path)
+        patternish_paths = self._get_patternish_paths(base_path, paths)
+
+        hits = dict((x["id"], 0) for x in mappings)
+        # For each mapping that has matched something: IDs of the other
+        # mappings in the same group that have matched all of its files.
+        covering_ids = {}
+        crowded_paths = []
+        for i, (patternish_path, path) in enumerate(
+                sorted(patternish_paths.iteritems()), 1):
+            if (i - 1) % 11 == 0 or i == len(patternish_paths):
+                self._tty_output(
+                    "\rAnalyzing file {0}/{1}...".format(
+                        i, len(patternish_paths)),
+                    False)
+                self._tty_flush()
+            matches = matcher.match(patternish_path)
+            group_ids = set(x["group_id"] for x in matches)
+            if len(group_ids) > max_groups:
+                crowded_paths.append((path, group_ids))
+            for mapping in matches:
+                hits[mapping["id"]] += 1
+                others = set(x["id"] for x in matches
+                             if x["group_id"] == mapping["group_id"]
+                             and x["id"] != mapping["id"])
+                if mapping["id"] in covering_ids:
+                    covering_ids[mapping["id"]] &= others
+                else:
+                    covering_ids[mapping["id"]] = others
+        self._tty_output("")
+
+        # Only mappings for files under the analyzed path can be expected to
+        # match something.
+        patternish_base_path = create_pattern_from_url(base_path_info.url)
+        unused_mappings = [x for x in mappings
+                           if hits[x["id"]] == 0
+                           and is_pattern_under(x["pattern"],
+                                                patternish_base_path)]
+        shadowed_mappings = [x for x in mappings if covering_ids.get(x["id"])]
+
+        self._output("Analyzed {0} files under \"{1}\".".format(
+            len(patternish_paths), base_path))
+        self._output("\nMatching mappings (number of matched files):")
+        used_mappings = [x for x in mappings if hits[x["id"]] > 0]
+        used_mappings.sort(
+            key=lambda x: (-hits[x["id"]], x["pattern"], x["id"]))
+        for mapping in used_mappings:
+            self._output("{0:>7} [id: {1}] {2} -> {3}".format(
+                hits[mapping["id"]], mapping["id"], mapping["pattern"],
+                group_map[mapping["group_id"]]["name"]))
+        self._output("\nMappings for {0}/* matching no files:".format(
+            patternish_base_path))
+        self._print_mappings(unused_mappings, group_map.values())
+        self._output(
+            "\nMappings whose files are all matched by other mappings for the"
+            " same group:")
+        shadowed_mappings.sort(key=itemgetter("pattern"))
+        for mapping in shadowed_mappings:
+            self._output("[id: {0}] {1} -> {2} (covered by {3})".format(
+                mapping["id"], mapping["pattern"],
+                group_map[mapping["group_id"]]["name"],
+                ", ".join(str(x)
+                          for x in sorted(covering_ids[mapping["id"]]))))
+        self._output("\nFiles matched by more than {0} groups:".format(
+            max_groups))
+        for path, group_ids in crowded_paths:
+            self._output("{0}: {1}".format(
+                path,
+                ", ".join(sorted(group_map[x]["name"] for x in group_ids))))
+
+    @arity(1)
+    def cmd_apply(self, path):
+        try:
+            with open(path) as fp:
+                entries = read_entries(fp, get_format(path))
+        except IOError as e:
+            error("Could not read mapping file: {0}".format(e))
+        additions, updates, deletions = self._compute_mapping_changes(entries)
+        if not (additions or updates or deletions):
+            self._output("No changes to apply.")
+            return
+        self._print_mapping_changes(additions, updates, deletions)
+        answer = prompt_user("Are you sure you want to apply these changes"
+                             " [y/n]?")
+        if is_affirmative(answer):
+            self._apply_mapping_changes(additions, updates, deletions)
+            self._output("Changes applied.")
+        else:
+            self._output("No changes were made.")
+
     @arity(1)
     def cmd_clone(self, mapping_id):
         old_mapping, old_group, new_mapping, new_group = \
@@ -134,11 +273,29 @@ class CommandExecutor:
             self._output("Changes to mapping {0} saved.".format(mapping_id))
             self._print_hint_about_testing_pattern(mapping_id)
 
+    @arity(0, 1)
+    def cmd_export(self, path):
+        mappings = self._server.get_mappings()
+        group_map = create_id_to_item_map(self._server.get_groups())
+        mappings.sort(key=itemgetter("pattern", "id"))
+        entries = [{"id": x["id"],
+                    "pattern": x["pattern"],
+                    "group": group_map[x["group_id"]]["name"],
+                    "triggers_katt2": x["triggers_katt2"]}
+                   for x in mappings]
+        if path is None:
+            write_entries(self._output_fp, entries, "json")
+        else:
+            with open(path, "w") as fp:
+                write_entries(fp, entries, get_format(path))
+            self._output("Exported {0} mappings to {1}.".format(
+                len(entries), path))
+
     @arity(0, 1)
     def cmd_find_orphans(self, base_path):
         base_path = sanitize_base_path(base_path)
         mappings = self._server.get_mappings()
-        mappings_and_regexps = create_mapping_regexps(mappings)
+        matcher = MappingMatcher(create_mapping_regexps(mappings))
         paths = self._svn.get_wc_files_under_path(base_path)
         patternish_paths = self._get_patternish_paths(base_path, paths)
         unmatched_paths = set(paths)
@@ -151,10 +308,8 @@ class CommandExecutor:
                     "\rChecking file {0}/{1}...".format(i, len(paths)),
                     False)
                 self._tty_flush()
-            for mapping, regexp in mappings_and_regexps:
-                if regexp.match(patternish_path):
-                    unmatched_paths.remove(path)
-                    break
+            if matcher.matches_any(patternish_path):
+                unmatched_paths.remove(path)
         self._tty_output("")
         if unmatched_paths:
             self._tty_output("Unmatched files:")
@@ -264,9 +419,9 @@ class CommandExecutor:
         paths = self._svn.get_wc_files_under_path(base_path)
         patternish_paths = self._get_patternish_paths(base_path, paths)
         matching_paths = []
-        regexp = create_regexp_from_pattern(mapping["pattern"])
+        matcher = MappingMatcher(create_mapping_regexps([mapping]))
         for patternish_path, path in patternish_paths.iteritems():
-            if regexp.match(patternish_path):
+            if matcher.matches_any(patternish_path):
                 matching_paths.append(path)
         matching_paths.sort()
         for path in matching_paths:
@@ -306,6 +461,20 @@ class CommandExecutor:
                     pattern, group["name"], mapping["id"]))
         self._print_hint_about_testing_pattern(mapping["id"])
 
+    def _apply_mapping_changes(self, additions, updates, deletions):
+        try:
+            self._server.delete_mappings([x["id"] for x in deletions])
+            self._server.update_mappings([new for old, new in updates])
+            self._server.add_mappings(additions)
+        except ResourceConflict:
+            error("At least one mapping in the file conflicts with an existing"
+                  " mapping; some changes may have been applied, run"
+                  " \"codemapper apply\" again to see what remains")
+        except ResourceNotFound:
+            error("At least one mapping or group in the file no longer exists"
+                  " on the server; some changes may have been applied, run"
+                  " \"codemapper apply\" again to see what remains")
+
     def _ask_for_mapping_details(self, mapping_id):
         old_mapping = self._get_mapping_by_id(mapping_id)
         old_group = self._server.get_group_by_id(old_mapping["group_id"])
@@ -326,6 +495,69 @@ class CommandExecutor:
         new_mapping["triggers_katt2"] = new_triggers_katt2
         return old_mapping, old_group, new_mapping, new_group
 
+    def _compute_mapping_changes(self, entries):
+        """
+        Compare mapping file entries with the mappings on the server.
+
+        Returns (additions, updates, deletions) where additions is a list of
+        new mappings (without ID), updates is a list of (old_mapping,
+        new_mapping) and deletions is a list of mappings to delete. Patterns
+        of added and updated mappings are verified in one batch.
+        """
+        # Entry IDs are strings while the server may use numbers.
+        mappings = dict(
+            (unicode(x["id"]), x) for x in self._server.get_mappings())
+        groups_by_name = dict(
+            (x["name"], x) for x in self._server.get_groups())
+        mapping_by_pattern_and_group = dict(
+            ((x["pattern"], x["group_id"]), x) for x in mappings.values())
+
+        unknown_groups = set(
+            x["group"] for x in entries
+            if not x["delete"] and x["group"] not in groups_by_name)
+        if unknown_groups:
+            error("Unknown group(s) in mapping file: {0}".format(
+                ", ".join(sorted(unknown_groups))))
+
+        additions, updates, deletions = [], [], []
+        seen_ids = set()
+        for entry in entries:
+            mapping_id = entry["id"]
+            if mapping_id is not None:
+                if mapping_id in seen_ids:
+                    error("Mapping {0} occurs more than once in the mapping"
+                          " file".format(mapping_id))
+                seen_ids.add(mapping_id)
+                if mapping_id not in mappings:
+                    error("Mapping {0} does not exist".format(mapping_id))
+            if entry["delete"]:
+                deletions.append(mappings[mapping_id])
+                continue
+
+            pattern = entry["pattern"].rstrip("/")
+            if ":" not in pattern:
+                pattern = "dev:" + pattern
+            group = groups_by_name[entry["group"]]
+            old_mapping = (
+                mappings.get(mapping_id)
+                or mapping_by_pattern_and_group.get((pattern, group["id"])))
+            new_mapping = {"group_id": group["id"],
+                           "pattern": pattern,
+                           "triggers_katt2": entry["triggers_katt2"]}
+            if old_mapping is None:
+                additions.append(new_mapping)
+            else:
+                new_mapping = dict(old_mapping, **new_mapping)
+                if new_mapping != old_mapping:
+                    updates.append((old_mapping, new_mapping))
+
+        patterns_to_verify = set(x["pattern"] for x in additions)
+        patterns_to_verify.update(
+            new["pattern"] for old, new in updates
+            if new["pattern"] != old["pattern"])
+        self._verify_patterns(patterns_to_verify)
+        return additions, updates, deletions
+
     def _get_group_by_name(self, name):
         try:
             return self._server.get_group_by_name(name)
@@ -364,6 +596,8 @@ class CommandExecutor:
 
     def _get_patternish_paths_from_diff(self, diff_fp):
         patternish_paths = set()
+        paths = []
+        seen_paths = set()
         for line in diff_fp:
             m = re.match(r"[AMD] {7}(?P<path_or_url>\S+)", line)
             if m:
@@ -383,15 +617,27 @@ class CommandExecutor:
                 if context and "working copy" not in context:
                     error("cannot recognize the origin of the diff, please"
                           " pass the --summarize option to svn and try again")
-            path_info = self._svn.get_wc_path_info(path)
-            if path_info is None:
+            if path not in seen_paths:
+                seen_paths.add(path)
+                paths.append(path)
+
+        if not paths:
+            return patternish_paths
+        if self._trust_paths:
+            patternish_paths.update(
+                self._get_patternish_paths(
+                    ".", [normpath(x) for x in paths]).keys())
+            return patternish_paths
+
+        urls = self._svn.get_wc_urls(paths)
+        for path in paths:
+            if path not in urls:
                 error(
                     "the diff/patch modifies the file \"{0}\", which does not"
                     " exist relative to the current working directory (make"
                     " sure you are located in the directory in which the diff"
                     " was created)".format(path))
-            patternish_paths.add(
-                self._get_patternish_paths(".", [path]).keys()[0])
+            patternish_paths.add(create_pattern_from_url(urls[path]))
         return patternish_paths
 
     def _guess_and_verify_pattern(self, pattern):
@@ -451,17 +697,17 @@ class CommandExecutor:
 
     def _map_paths(self, patternish_paths):
         mappings = self._server.get_mappings()
-        mappings_and_regexps = create_mapping_regexps(mappings)
+        matcher = MappingMatcher(create_mapping_regexps(mappings))
         matching_mapping_ids = set()
-        for i, (mapping, regexp) in enumerate(mappings_and_regexps, 1):
-            self._tty_output(
-                "\rMapping pattern {0}/{1}...".format(i, len(mappings)),
-                False)
-            self._tty_flush()
-            for patternish_path in patternish_paths:
-                if regexp.match(patternish_path):
-                    matching_mapping_ids.add(mapping["id"])
-                    break
+        for i, patternish_path in enumerate(patternish_paths, 1):
+            if (i - 1) % 11 == 0 or i == len(patternish_paths):
+                self._tty_output(
+                    "\rMapping file {0}/{1}...".format(
+                        i, len(patternish_paths)),
+                    False)
+                self._tty_flush()
+            for mapping in matcher.match(patternish_path):
+                matching_mapping_ids.add(mapping["id"])
         self._tty_output("")
         mappings = [x for x in mappings if x["id"] in matching_mapping_ids]
         if mappings:
@@ -477,7 +723,7 @@ class CommandExecutor:
         group1_mappings = self._server.get_mappings_by_group(group1["id"])
         for mapping in group1_mappings:
             mapping["group_id"] = group2["id"]
-            self._server.update_mapping(mapping)
+        self._server.update_mappings(group1_mappings)
         self._server.delete_group(group1["id"])
 
     def _output(self, message, print_newline=True):
@@ -505,12 +751,33 @@ class CommandExecutor:
             mapping["pattern"], pattern_width,
             group_name))
 
+    def _print_mapping_changes(self, additions, updates, deletions):
+        group_map = create_id_to_item_map(self._server.get_groups())
+
+        def describe(mapping):
+            return "{0} -> {1}{2}".format(
+                mapping["pattern"],
+                group_map[mapping["group_id"]]["name"],
+                (" (triggers KATT2)"
+                 if mapping["triggers_katt2"] == "true" else ""))
+
+        for mapping in sorted(deletions, key=itemgetter("pattern")):
+            self._output("Delete [id: {0}] {1}".format(
+                mapping["id"], describe(mapping)))
+        for old, new in sorted(updates, key=lambda x: x[1]["pattern"]):
+            self._output("Update [id: {0}] {1}\n    to {2}".format(
+                old["id"], describe(old), describe(new)))
+        for mapping in sorted(additions, key=itemgetter("pattern")):
+            self._output("Add {0}".format(describe(mapping)))
+        self._output("\n{0} to add, {1} to update, {2} to delete.\n".format(
+            len(additions), len(updates), len(deletions)))
+
     def _print_mappings(self, mappings, groups):
         if not mappings:
             return
         group_map = create_id_to_item_map(groups)
         mappings.sort(key=itemgetter("pattern"))
-        id_width = max(len(x["id"]) for x in mappings)
+        id_width = max(len(str(x["id"])) for x in mappings)
         pattern_width = max(len(x["pattern"]) for x in mappings)
         show_tk2_width = any(
             mapping["triggers_katt2"] == "true" for mapping in mappings)
@@ -529,7 +796,8 @@ class CommandExecutor:
                 message += "\n"
             stderr.write(message)
 
-    def _verify_pattern(self, pattern):
+    def _check_pattern_syntax(self, pattern):
+        """Return (repo, static_part_of_path, url_to_check) for pattern."""
         if not pattern:
             error("Empty pattern not allowed")
         repo, _, path = pattern.partition(":")
@@ -539,6 +807,24 @@ class CommandExecutor:
             error("Slash not allowed in repository part of pattern")
         static_part_of_path = path.partition("*")[0].partition("ANYBRANCH")[0]
         url_to_check = self._svn.get_url(repo, static_part_of_path)
+        return repo, static_part_of_path, url_to_check
+
+    def _verify_pattern(self, pattern):
+        repo, static_part_of_path, url_to_check = \
+            self._check_pattern_syntax(pattern)
         if not self._svn.path_exists_in_repo(url_to_check):
             error("The path \"{0}\" does not exist in the {1} repository (URL:"
                   " {2})".format(static_part_of_path, repo, url_to_check))
+
+    def _verify_patterns(self, patterns):
+        urls = {}
+        for pattern in patterns:
+            url = self._check_pattern_syntax(pattern)[2]
+            urls.setdefault(url, []).append(pattern)
+        missing_urls = set(urls) - self._svn.get_existing_urls(urls.keys())
+        if missing_urls:
+            error("The static part of the following pattern(s) does not exist"
+                  " in the repository:\n  {0}".format(
+                      "\n  ".join(sorted(pattern
+                                         for url in missing_urls
+                                         for pattern in urls[url]))))
@@ -0,0 +1,113 @@
+import socket
+
+from StringIO import StringIO
+from httplib import BadStatusLine, HTTPConnection, HTTPException
+from httplib import HTTPSConnection
+from threading import Lock
+from urllib import addinfourl
+from urllib2 import HTTPHandler, HTTPSHandler, URLError
+
+DEFAULT_POOL_SIZE = 4
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of idle keep-alive connections, keyed by scheme and host.
+    At most pool_size idle connections are kept per host.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        self._pool_size = pool_size
+        self._idle = {}
+        self._lock = Lock()
+
+    def acquire(self, connection_class, host, timeout):
+        """
+        Return (connection, reused), where reused tells whether the connection
+        has been used for an earlier request.
+        """
+        key = (connection_class, host)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return connection_class(host, timeout=timeout), False
+
+    def release(self, connection_class, host, connection):
+        key = (connection_class, host)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self._pool_size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+            self._idle.clear()
+
+
+class _KeepAliveMixin:
+    def _open_with_pool(self, connection_class, req):
+        host = req.get_host()
+        if not host:
+            raise URLError("no host given")
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update(dict((k, v) for k, v in req.headers.items()
+                            if k not in headers))
+        headers["Connection"] = "keep-alive"
+        headers = dict((name.title(), val) for name, val in headers.items())
+
+        while True:
+            connection, reused = self._pool.acquire(
+                connection_class, host, req.timeout)
+            try:
+                connection.request(req.get_method(), req.get_selector(),
+                                   req.data, headers)
+                response = connection.getresponse()
+                # Read the whole body so that the connection can be reused.
+                body = response.read()
+                break
+            except (socket.error, BadStatusLine, HTTPException) as e:
+                connection.close()
+                if reused:
+                    # The server has probably closed the idle connection;
+                    # retry once with a fresh one.
+                    continue
+                raise URLError(e)
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._pool.release(connection_class, host, connection)
+
+        result = addinfourl(StringIO(body), response.msg, req.get_full_url())
+        result.code = response.status
+        result.msg = response.reason
+        return result
+
+
+class KeepAliveHTTPHandler(_KeepAliveMixin, HTTPHandler):
+    """urllib2 handler that reuses pooled HTTP connections."""
+
+    def __init__(self, pool):
+        HTTPHandler.__init__(self)
+        self._pool = pool
+
+    def http_open(self, req):
+        return self._open_with_pool(HTTPConnection, req)
+
+
+class KeepAliveHTTPSHandler(_KeepAliveMixin, HTTPSHandler):
+    """urllib2 handler that reuses pooled HTTPS connections."""
+
+    def __init__(self, pool):
+        HTTPSHandler.__init__(self)
+        self._pool = pool
+
+    def https_open(self, req):
+        return self._open_with_pool(HTTPSConnection, req)
@@ -3,15 +3,18 @@ import sys
 from errno import EPIPE
 from optparse import OptionParser
 from os import mkdir
-from os.path import dirname, expanduser, isdir
+from os.path import dirname, expanduser, isdir, join
 from urllib import urlencode
 from urllib2 import urlopen
 
 from commandexecutor import CommandExecutor
 from common import error, ExecutionError, prompt_user, usage_error, UsageError
+from httppool import DEFAULT_POOL_SIZE
 from serverapi import ServerApi
+from snapshotcache import SnapshotCache
 from svnapi import SvnApi
 
+CACHE_DIR = expanduser("~/.cache/codemapper")
 CONFIG_FILE = expanduser("~/.config/codemapper.conf")
 
 BUILDUSER_API_URL = "http://svn.arrisi.com/builduser_remote.php"
@@ -67,6 +70,19 @@ def main(usage):
     parser.add_option(
         "--username",
         help="specify SVN username to use when modifying groups or mappings")
+    parser.add_option(
+        "--connections",
+        type="int",
+        default=DEFAULT_POOL_SIZE,
+        metavar="N",
+        help=("maximum number of concurrent connections to the server when"
+              " modifying many mappings (default: %default)"))
+    parser.add_option(
+        "--trust-paths",
+        action="store_true",
+        help=("let map-diff assume that the paths in the diff are relative to"
+              " the current working copy directory instead of looking them up"
+              " (faster, but paths that do not exist are not detected)"))
     options, args = parser.parse_args()
     if not args or args[0] == "help":
         parser.print_help()
@@ -75,9 +91,12 @@ def main(usage):
     command_args = args[1:]
 
     username_provider = UsernameProvider(options.username)
-    server = ServerApi(CODEMAPPING_API_URL, username_provider)
-    svn = SvnApi(SVN_BASE_URL)
-    command_executor = CommandExecutor(server, svn, sys.stdout)
+    snapshot_cache = SnapshotCache(CACHE_DIR, CODEMAPPING_API_URL)
+    server = ServerApi(CODEMAPPING_API_URL, username_provider, snapshot_cache,
+                       max(1, options.connections))
+    svn = SvnApi(SVN_BASE_URL, join(CACHE_DIR, "wc-index"))
+    command_executor = CommandExecutor(server, svn, sys.stdout,
+                                       options.trust_paths)
     command_handler = getattr(command_executor,
                               "cmd_" + command.replace("-", "_"),
                               None)
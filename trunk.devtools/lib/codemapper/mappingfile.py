@@ -0,0 +1,94 @@
+import csv
+import json
+
+from common import error
+
+FIELDS = ["id", "pattern", "group", "triggers_katt2", "delete"]
+REQUIRED_FIELDS = ["pattern", "group", "triggers_katt2"]
+BOOLEAN_FIELDS = ["triggers_katt2", "delete"]
+
+
+def get_format(path):
+    if path is not None and path.lower().endswith(".csv"):
+        return "csv"
+    else:
+        return "json"
+
+
+def read_entries(fp, file_format):
+    """
+    Read mapping entries from a JSON or CSV file.
+
+    Each entry is a dict with the keys "id" (None for new mappings),
+    "pattern", "group" (a group name), "triggers_katt2" ("true" or "false")
+    and "delete" (True if the mapping should be deleted).
+    """
+    if file_format == "csv":
+        rows = list(csv.DictReader(fp))
+    else:
+        try:
+            rows = json.load(fp)
+        except ValueError as e:
+            error("Invalid JSON in mapping file: {0}".format(e))
+        if not isinstance(rows, list) or not all(
+                isinstance(x, dict) for x in rows):
+            error("Expected a JSON list of objects in mapping file")
+    return [_normalize_entry(row, i) for i, row in enumerate(rows, 1)]
+
+
+def write_entries(fp, entries, file_format):
+    fields = FIELDS[:-1]
+    if file_format == "csv":
+        writer = csv.DictWriter(fp, fields, lineterminator="\n")
+        writer.writeheader()
+        for entry in entries:
+            writer.writerow(dict((key, _encode(entry[key])) for key in fields))
+    else:
+        json.dump([dict((key, entry[key]) for key in fields)
+                   for entry in entries],
+                  fp, indent=2, sort_keys=True, separators=(",", ": "))
+        fp.write("\n")
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return value
+
+
+def _normalize_entry(row, entry_number):
+    unknown_fields = set(row) - set(FIELDS)
+    if unknown_fields:
+        error("Unknown field(s) in mapping file entry {0}: {1}".format(
+            entry_number, ", ".join(sorted(unknown_fields))))
+    entry = {}
+    for field in FIELDS:
+        value = row.get(field)
+        if isinstance(value, bool):
+            value = u"true" if value else u"false"
+        elif isinstance(value, str):
+            value = value.decode("utf-8").strip()
+        elif value is not None:
+            value = unicode(value).strip()
+        if value == "":
+            value = None
+        entry[field] = value
+    if entry["delete"] is None:
+        entry["delete"] = "false"
+    for field in BOOLEAN_FIELDS:
+        entry[field] = (entry[field] or "").lower()
+        if entry[field] not in ["true", "false"] and not (
+                field == "triggers_katt2" and entry["delete"] == "true"):
+            error("Field {0} in mapping file entry {1} should be true or"
+                  " false".format(field, entry_number))
+    entry["delete"] = entry["delete"] == "true"
+    if entry["delete"]:
+        if entry["id"] is None:
+            error("Mapping file entry {0} is marked for deletion but has no"
+                  " id".format(entry_number))
+    else:
+        for field in REQUIRED_FIELDS:
+            if entry[field] is None:
+                error("Missing field {0} in mapping file entry {1}".format(
+                    field, entry_number))
+    return entry
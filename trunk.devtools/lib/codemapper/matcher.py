@@ -0,0 +1,87 @@
+ANYBRANCH = "ANYBRANCH"
+
+
+class _TrieNode:
+    def __init__(self):
+        self.children = {}
+        self.anybranch = None
+        self.terminals = []
+        self.tails = []
+
+
+class MappingMatcher:
+    """
+    Answers "which mappings match this patternish path" in one pass per path.
+
+    Mapping patterns are split into path segments and stored in a prefix trie
+    where literal segments are plain children and an ANYBRANCH segment is a
+    special child consuming either "trunk" or "branches/NAME". The rest of a
+    pattern from the first segment containing a wildcard is kept as a "tail"
+    on the node reached so far and is verified with the mapping's regexp (or
+    trivially, when the rest of the pattern is just "*").
+
+    Parameters:
+      mappings_and_regexps -- List of (mapping, regexp) as returned by
+                              create_mapping_regexps.
+    """
+
+    def __init__(self, mappings_and_regexps):
+        self._root = _TrieNode()
+        for mapping, regexp in mappings_and_regexps:
+            self._add(mapping, regexp)
+
+    def match(self, patternish_path):
+        """Return all mappings whose pattern matches patternish_path."""
+        return list(self._iter_matches(patternish_path))
+
+    def matches_any(self, patternish_path):
+        """Return whether at least one mapping matches patternish_path."""
+        for _ in self._iter_matches(patternish_path):
+            return True
+        return False
+
+    #
+    # Internals
+    #
+
+    def _add(self, mapping, regexp):
+        node = self._root
+        segments = mapping["pattern"].split("/")
+        for i, segment in enumerate(segments):
+            if segment == ANYBRANCH:
+                if node.anybranch is None:
+                    node.anybranch = _TrieNode()
+                node = node.anybranch
+            elif "*" in segment or ANYBRANCH in segment:
+                match_all = "/".join(segments[i:]) == "*"
+                node.tails.append((mapping, regexp, match_all))
+                return
+            else:
+                node = node.children.setdefault(segment, _TrieNode())
+        node.terminals.append(mapping)
+
+    def _iter_matches(self, patternish_path):
+        segments = patternish_path.split("/")
+        num_segments = len(segments)
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if i < num_segments:
+                for mapping, regexp, match_all in node.tails:
+                    if match_all or regexp.match(patternish_path):
+                        yield mapping
+            else:
+                for mapping in node.terminals:
+                    yield mapping
+                continue
+            segment = segments[i]
+            child = node.children.get(segment)
+            if child is not None:
+                stack.append((child, i + 1))
+            if node.anybranch is not None:
+                if segment == "trunk":
+                    stack.append((node.anybranch, i + 1))
+                elif (segment == "branches"
+                      and i + 1 < num_segments
+                      and segments[i + 1]):
+                    stack.append((node.anybranch, i + 2))
@@ -1,8 +1,14 @@
 from common import error
+from httppool import ConnectionPool, DEFAULT_POOL_SIZE
+from httppool import KeepAliveHTTPHandler, KeepAliveHTTPSHandler
 import json
+from base64 import b64encode
+from multiprocessing.pool import ThreadPool
+from sys import stderr
+from time import ctime
 from urllib2 import (
-    build_opener, HTTPBasicAuthHandler, HTTPError, quote, Request)
-from httplib import CONFLICT, NOT_FOUND, UNAUTHORIZED
+    build_opener, HTTPBasicAuthHandler, HTTPError, quote, Request, URLError)
+from httplib import CONFLICT, NOT_FOUND, NOT_MODIFIED, UNAUTHORIZED
 
 
 class ResourceConflict(Exception):
@@ -26,8 +32,8 @@ class PasswordManager:
 
 
 class AuthenticatedRequest(Request):
-    def __init__(self, method, url, data):
-        headers = {}
+    def __init__(self, method, url, data, headers=None):
+        headers = dict(headers or {})
         if data is not None:
             data = json.dumps(data)
             headers["Content-Type"] = "application/json"
@@ -38,60 +44,215 @@ class AuthenticatedRequest(Request):
         return self._method
 
 
+# Upper bound on how long to wait for a bulk operation. Waiting with a timeout
+# (instead of none) keeps the main thread responsive to KeyboardInterrupt.
+BULK_TIMEOUT = 24 * 60 * 60  # Seconds
+
+
 class ServerApi:
-    def __init__(self, api_url, username_provider):
+    def __init__(self, api_url, username_provider, snapshot_cache=None,
+                 pool_size=DEFAULT_POOL_SIZE):
         self._api_url = api_url
         self._username_provider = username_provider
+        self._snapshot_cache = snapshot_cache
+        self._snapshots = {}
+        self._pool_size = pool_size
+        self._authorization = None
         auth_handler = HTTPBasicAuthHandler(PasswordManager(username_provider))
-        self._opener = build_opener(auth_handler)
+        connection_pool = ConnectionPool(pool_size)
+        self._opener = build_opener(auth_handler,
+                                    KeepAliveHTTPHandler(connection_pool),
+                                    KeepAliveHTTPSHandler(connection_pool))
 
     def add_mapping(self, pattern, group_id, triggers_katt2):
+        self._invalidate_snapshots()
         return self._request("POST",
                              "mappings",
                              {"group_id": group_id,
                               "pattern": pattern,
                               "triggers_katt2": triggers_katt2})
 
+    def add_mappings(self, mappings):
+        self._invalidate_snapshots()
+        return self._fan_out(
+            lambda x: self._request("POST", "mappings", x), mappings)
+
     def delete_mapping(self, mapping_id):
+        self._invalidate_snapshots()
         self._request("DELETE", "mappings/{0}".format(mapping_id))
 
+    def delete_mappings(self, mapping_ids):
+        self._invalidate_snapshots()
+        self._fan_out(
+            lambda x: self._request("DELETE", "mappings/{0}".format(x)),
+            mapping_ids)
+
     def get_mappings(self):
-        return self._request("GET", "mappings")
+        return [dict(x) for x in self._get_snapshot("mappings")]
 
     def get_mappings_by_group(self, group_id):
+        if self._has_snapshot("mappings"):
+            return [dict(x) for x in self._get_snapshot("mappings")
+                    if x["group_id"] == group_id]
         return self._request("GET", "mappings/by-group/{0}".format(group_id))
 
     def get_mapping_by_id(self, mapping_id):
+        mapping = self._find_in_snapshot("mappings", "id", mapping_id)
+        if mapping is not None:
+            return mapping
         return self._request("GET", "mappings/{0}".format(mapping_id))
 
     def update_mapping(self, mapping):
+        self._invalidate_snapshots()
         self._request("PUT", "mappings/{0}".format(mapping["id"]), mapping)
 
+    def update_mappings(self, mappings):
+        self._invalidate_snapshots()
+        self._fan_out(
+            lambda x: self._request("PUT", "mappings/{0}".format(x["id"]), x),
+            mappings)
+
     def add_group(self, name):
+        self._invalidate_snapshots()
         return self._request("POST", "groups", {"name": name})
 
     def delete_group(self, group_id):
+        self._invalidate_snapshots()
         self._request("DELETE", "groups/{0}".format(group_id))
 
     def get_groups(self):
-        return self._request("GET", "groups")
+        return [dict(x) for x in self._get_snapshot("groups")]
 
     def get_group_by_id(self, group_id):
+        group = self._find_in_snapshot("groups", "id", group_id)
+        if group is not None:
+            return group
         return self._request("GET", "groups/{0}".format(group_id))
 
     def get_group_by_name(self, name):
+        group = self._find_in_snapshot("groups", "name", name)
+        if group is not None:
+            return group
         return self._request("GET", "groups/by-name/{0}".format(quote(name)))
 
     def update_group(self, group):
+        self._invalidate_snapshots()
         self._request("PUT", "groups/{0}".format(group["id"]), group)
 
     #
     # Internals
     #
 
+    def _fan_out(self, function, items):
+        """
+        Call function for each item using at most as many concurrent requests
+        as there are connections in the pool. If any call raises an exception,
+        one of the exceptions is raised when all calls have finished.
+        """
+        if not items:
+            return []
+        # Make sure that the user is asked for the username (if needed) before
+        # starting any threads.
+        self._get_authorization()
+        pool = ThreadPool(min(self._pool_size, len(items)))
+        try:
+            return pool.map_async(function, items, 1).get(BULK_TIMEOUT)
+        finally:
+            pool.terminate()
+
+    def _find_in_snapshot(self, name, key, value):
+        # Single items are only looked up in a snapshot that already exists
+        # since fetching a whole collection for one item could be slower than
+        # asking the server for the item. Items missing from the snapshot are
+        # asked for since the snapshot may be stale when the server is down.
+        if not self._has_snapshot(name):
+            return None
+        for item in self._get_snapshot(name):
+            if item[key] == value:
+                return dict(item)
+        return None
+
+    def _get_snapshot(self, name):
+        if name in self._snapshots:
+            return self._snapshots[name]
+
+        if self._snapshot_cache is None:
+            validators, cached_data = {}, None
+        else:
+            validators, cached_data = self._snapshot_cache.load(name)
+        headers = {}
+        if cached_data is not None:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        request = AuthenticatedRequest("GET", self._api_url + name, None,
+                                       headers)
+        try:
+            response = self._opener.open(request)
+            data = json.loads(response.read())
+            if self._snapshot_cache is not None:
+                self._snapshot_cache.store(
+                    name,
+                    {"etag": response.info().getheader("ETag"),
+                     "last_modified":
+                         response.info().getheader("Last-Modified")},
+                    data)
+        except HTTPError as e:
+            if e.code == NOT_MODIFIED and cached_data is not None:
+                data = cached_data
+            else:
+                self._handle_http_error(e)
+        except URLError as e:
+            if cached_data is None:
+                raise
+            cached_time = ctime(self._snapshot_cache.get_mtime(name))
+            stderr.write(
+                "codemapper: warning: could not reach the server ({0}), using"
+                " {1} cached at {2}\n".format(e.reason, name, cached_time))
+            data = cached_data
+
+        self._snapshots[name] = data
+        return data
+
+    def _get_authorization(self):
+        if self._authorization is None:
+            username = self._username_provider.get_username()
+            self._authorization = "Basic " + b64encode(username + ":")
+        return self._authorization
+
+    def _handle_http_error(self, e):
+        if e.code == NOT_FOUND:
+            raise ResourceNotFound
+        elif e.code == CONFLICT:
+            raise ResourceConflict
+        elif e.code == UNAUTHORIZED:
+            username = self._username_provider.get_username()
+            error("No such username: {0}".format(username))
+        else:
+            error("Unrecognized server response: {0} ({1})".format(e.code,
+                                                                   e.msg))
+
+    def _has_snapshot(self, name):
+        return (name in self._snapshots
+                or (self._snapshot_cache is not None
+                    and self._snapshot_cache.exists(name)))
+
+    def _invalidate_snapshots(self):
+        self._snapshots.clear()
+        if self._snapshot_cache is not None:
+            self._snapshot_cache.invalidate()
+
     def _request(self, method, path, data=None):
         url = self._api_url + path
         request = AuthenticatedRequest(method, url, data)
+        if method != "GET":
+            # Modifications always require authentication, so avoid a 401
+            # round trip (and the non-thread-safe retry logic in
+            # HTTPBasicAuthHandler) by authenticating up front.
+            request.add_unredirected_header("Authorization",
+                                            self._get_authorization())
         try:
             response = self._opener.open(request)
             data = response.read()
@@ -100,13 +261,4 @@ class ServerApi:
             else:
                 return None
         except HTTPError as e:
-            if e.code == NOT_FOUND:
-                raise ResourceNotFound
-            elif e.code == CONFLICT:
-                raise ResourceConflict
-            elif e.code == UNAUTHORIZED:
-                username = self._username_provider.get_username()
-                error("No such username: {0}".format(username))
-            else:
-                error("Unrecognized server response: {0} ({1})".format(e.code,
-                                                                       e.msg))
+            self._handle_http_error(e)
@@ -0,0 +1,67 @@
+import json
+
+from hashlib import md5
+from os import listdir, makedirs, remove, rename
+from os.path import getmtime, isdir, join
+
+
+class SnapshotCache:
+    """
+    On-disk cache of collections (mappings, groups) fetched from the
+    codemapping server.
+
+    Each snapshot is stored together with the HTTP validators (ETag and
+    Last-Modified) it was served with so that it can be revalidated with a
+    conditional GET. Snapshots are kept per API URL.
+    """
+
+    def __init__(self, cache_dir, api_url):
+        self._cache_dir = cache_dir
+        self._prefix = md5(api_url).hexdigest()[:12] + "-"
+
+    def exists(self, name):
+        try:
+            getmtime(self._path(name))
+            return True
+        except OSError:
+            return False
+
+    def get_mtime(self, name):
+        return getmtime(self._path(name))
+
+    def invalidate(self):
+        try:
+            filenames = listdir(self._cache_dir)
+        except OSError:
+            return
+        for filename in filenames:
+            if filename.startswith(self._prefix):
+                try:
+                    remove(join(self._cache_dir, filename))
+                except OSError:
+                    pass
+
+    def load(self, name):
+        """Return (validators, data), or ({}, None) if nothing is cached."""
+        try:
+            with open(self._path(name)) as fp:
+                snapshot = json.load(fp)
+            return snapshot["validators"], snapshot["data"]
+        except (IOError, ValueError, KeyError, TypeError):
+            return {}, None
+
+    def store(self, name, validators, data):
+        path = self._path(name)
+        tmp_path = path + ".tmp"
+        try:
+            if not isdir(self._cache_dir):
+                makedirs(self._cache_dir)
+            with open(tmp_path, "w") as fp:
+                json.dump({"validators": validators, "data": data}, fp)
+            rename(tmp_path, path)
+        except (IOError, OSError):
+            # The cache is only an optimization.
+            pass
+
+    def _path(self, name):
+        return join(self._cache_dir, self._prefix + name + ".json")
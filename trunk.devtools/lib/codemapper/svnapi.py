@@ -1,12 +1,23 @@
 import re
+import xml.etree.ElementTree as ElementTree
 
 from collections import namedtuple
-from os.path import isdir
+from os.path import isdir, normpath, relpath
 from subprocess import Popen, PIPE
+from urllib import unquote
+
+from wcindex import WcFileIndex
 
 SvnWcInfo = namedtuple("SvnWcInfo", "url repository project path_in_wc")
 
 SVN_CLIENT = "/usr/bin/svn"
+# Maximum number of targets to pass to a single svn command.
+SVN_MAX_TARGETS = 500
+# wc-status items of paths that are not versioned in the working copy itself
+# or whose file is not (or no longer) there.
+SVN_UNVERSIONED_ITEMS = frozenset(
+    ["external", "ignored", "none", "unversioned", "deleted", "missing",
+     "obstructed"])
 SVN_URL_RE = """(?x)
     (?P<repo>[^/]+)
     /
@@ -33,9 +44,34 @@ def get_url_from_svn_info(url_or_path):
     return m.group("value")
 
 
+def parse_wc_status_files(status_xml_fp, wc_root):
+    """
+    Return the versioned files relative to wc_root listed in the output of
+    "svn status -v --xml WC_ROOT" read from status_xml_fp. Raises
+    ElementTree.ParseError if the output is malformed.
+    """
+    result = []
+    for _, element in ElementTree.iterparse(status_xml_fp):
+        if element.tag != "entry":
+            continue
+        status = element.find("wc-status")
+        path = element.get("path").encode("utf-8")
+        if (status is not None
+                and status.get("item") not in SVN_UNVERSIONED_ITEMS
+                and path != wc_root
+                and not isdir(path)):
+            result.append(relpath(path, wc_root))
+        element.clear()
+    return result
+
+
 class SvnApi:
-    def __init__(self, base_url):
+    def __init__(self, base_url, wc_index_dir=None):
         self._base_url = base_url
+        if wc_index_dir is None:
+            self._wc_index = None
+        else:
+            self._wc_index = WcFileIndex(wc_index_dir, self._list_wc_files)
 
     def get_base_url(self):
         return self._base_url
@@ -55,6 +91,10 @@ class SvnApi:
             return None
 
     def get_wc_files_under_path(self, path):
+        if self._wc_index is not None:
+            result = self._wc_index.get_files_under_path(path)
+            if result is not None:
+                return result
         result = []
         _, output = run_svn("status", "-v", "--ignore-externals", path)
         for line in output.splitlines():
@@ -65,5 +105,69 @@ class SvnApi:
                     result.append(path)
         return result
 
+    def get_wc_urls(self, paths):
+        """
+        Return a dict mapping each of paths that is known to SVN to its URL,
+        using one "svn info" call per SVN_MAX_TARGETS paths.
+        """
+        paths = list(paths)
+        result = {}
+        for i in range(0, len(paths), SVN_MAX_TARGETS):
+            targets = paths[i:i + SVN_MAX_TARGETS]
+            wanted = dict((normpath(x), x) for x in targets)
+            # svn info exits with an error if any target is unknown but still
+            # prints information about the known ones.
+            _, output = run_svn("info", "--xml", *targets)
+            try:
+                root = ElementTree.fromstring(output)
+            except ElementTree.ParseError:
+                continue
+            for entry in root.iter("entry"):
+                path = normpath(entry.get("path").encode("utf-8"))
+                url_node = entry.find("url")
+                if path in wanted and url_node is not None:
+                    result[wanted[path]] = url_node.text.encode("utf-8")
+        return result
+
     def path_exists_in_repo(self, url):
         return get_url_from_svn_info(url) is not None
+
+    def get_existing_urls(self, urls):
+        """
+        Return the subset of urls that exist in the repository, using one
+        "svn info" call per SVN_MAX_TARGETS URLs.
+        """
+        wanted = dict((unquote(url).rstrip("/"), url) for url in urls)
+        targets = sorted(set(urls))
+        result = set()
+        for i in range(0, len(targets), SVN_MAX_TARGETS):
+            # svn info exits with an error if any target is missing but still
+            # prints information about the ones that exist.
+            _, output = run_svn(
+                "info", "--xml", *targets[i:i + SVN_MAX_TARGETS])
+            try:
+                root = ElementTree.fromstring(output)
+            except ElementTree.ParseError:
+                continue
+            for url_node in root.iter("url"):
+                url = unquote(url_node.text.encode("utf-8")).rstrip("/")
+                if url in wanted:
+                    result.add(wanted[url])
+        return result
+
+    #
+    # Internals
+    #
+
+    def _list_wc_files(self, wc_root):
+        """Return versioned files relative to wc_root, or None on failure."""
+        p = Popen([SVN_CLIENT, "status", "-v", "--xml", "--ignore-externals",
+                   wc_root],
+                  stdout=PIPE, stderr=PIPE)
+        try:
+            result = parse_wc_status_files(p.stdout, wc_root)
+        except ElementTree.ParseError:
+            result = None
+        if p.wait() != 0:
+            return None
+        return result
@@ -0,0 +1,105 @@
+#!/usr/bin/env python2
+
+# Compares MappingMatcher with trying every mapping regexp against every path,
+# which is what find-orphans and map used to do. Not run as part of the unit
+# tests since the naive variant takes a long time on the full data set.
+#
+# Usage: benchmark_matcher.py [NUM_PATHS [NUM_MAPPINGS [NAIVE_SAMPLE_SIZE]]]
+
+import random
+import sys
+
+from os.path import dirname
+from time import time
+
+sys.path.insert(0, dirname(__file__) + "/..")
+from commandexecutor import create_mapping_regexps
+from matcher import MappingMatcher
+
+
+def create_synthetic_paths(rng, num_paths):
+    projects = ["project{0}".format(i) for i in range(50)]
+    branches = ["trunk"] + ["branches/DEV_{0}".format(i) for i in range(5)]
+    paths = []
+    for i in range(num_paths):
+        depth = rng.randint(1, 5)
+        dirs = ["dir{0}".format(rng.randint(0, 20)) for _ in range(depth)]
+        paths.append("dev:{0}/{1}/{2}/file{3}.cpp".format(
+            rng.choice(projects), rng.choice(branches), "/".join(dirs), i))
+    return paths
+
+
+def create_synthetic_mappings(rng, paths, num_mappings):
+    mappings = []
+    for i in range(num_mappings):
+        path = rng.choice(paths)
+        repo_project, _, rest = path.partition("/")
+        if rest.startswith("branches/"):
+            rest = rest.split("/", 2)[2]
+        else:
+            rest = rest.split("/", 1)[1]
+        dirs = rest.split("/")[:-1]
+        dirs = dirs[:rng.randint(min(1, len(dirs)), len(dirs))]
+        kind = rng.randint(0, 9)
+        if kind == 0:
+            pattern = "{0}/*/{1}".format(repo_project, rest.split("/")[-1])
+        elif kind == 1:
+            pattern = "{0}/ANYBRANCH/{1}".format(repo_project, rest)
+        else:
+            pattern = "/".join(
+                [repo_project, "ANYBRANCH"] + dirs + ["*"])
+        mappings.append({"id": str(i), "pattern": pattern})
+    return mappings
+
+
+def naive_matches(mappings_and_regexps, path):
+    return [mapping for mapping, regexp in mappings_and_regexps
+            if regexp.match(path)]
+
+
+def main():
+    num_paths = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    num_mappings = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    sample_size = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    rng = random.Random(4711)
+    paths = create_synthetic_paths(rng, num_paths)
+    mappings = create_synthetic_mappings(rng, paths, num_mappings)
+    mappings_and_regexps = create_mapping_regexps(mappings)
+
+    start = time()
+    matcher = MappingMatcher(mappings_and_regexps)
+    build_time = time() - start
+
+    start = time()
+    num_orphans = sum(1 for path in paths if not matcher.matches_any(path))
+    orphans_time = time() - start
+
+    start = time()
+    num_matches = sum(len(matcher.match(path)) for path in paths)
+    map_time = time() - start
+
+    sample = rng.sample(paths, min(sample_size, len(paths)))
+    start = time()
+    for path in sample:
+        naive_matches(mappings_and_regexps, path)
+    naive_time = (time() - start) * len(paths) / len(sample)
+
+    for path in sample:
+        expected = sorted(x["id"] for x in
+                          naive_matches(mappings_and_regexps, path))
+        actual = sorted(x["id"] for x in matcher.match(path))
+        assert actual == expected, path
+
+    print "{0} paths, {1} mappings".format(len(paths), len(mappings))
+    print "  build matcher:          {0:8.2f} s".format(build_time)
+    print "  find orphans (matcher): {0:8.2f} s ({1} orphans)".format(
+        orphans_time, num_orphans)
+    print "  map all (matcher):      {0:8.2f} s ({1} matches)".format(
+        map_time, num_matches)
+    print "  map all (naive, est.):  {0:8.2f} s (from {1} sampled paths)" \
+        .format(naive_time, len(sample))
+
+
+if __name__ == "__main__":
+    main()
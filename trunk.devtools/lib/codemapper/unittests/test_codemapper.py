@@ -1,20 +1,32 @@
 #!/usr/bin/env python2
 
+import json
 import sys
 
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from StringIO import StringIO
+from mimetools import Message
+from urllib import addinfourl
+from urllib2 import build_opener, HTTPError, URLError
 from os import chdir, getcwd, makedirs
 from os.path import dirname, isdir, join
 from shutil import rmtree
 from tempfile import mkdtemp
+from threading import Thread
 from unittest import TestCase, main
 
 sys.path.insert(0, dirname(__file__) + "/..")
-from commandexecutor import arity, CommandExecutor
+from commandexecutor import (arity, CommandExecutor, create_mapping_regexps,
+                             is_pattern_under)
 from common import ExecutionError, UsageError
+from httppool import ConnectionPool, KeepAliveHTTPHandler
 from main import SVN_BASE_URL
-from serverapi import ResourceConflict, ResourceNotFound
-from svnapi import SvnApi, SvnWcInfo
+from mappingfile import get_format, read_entries
+from matcher import MappingMatcher
+from serverapi import ResourceConflict, ResourceNotFound, ServerApi
+from snapshotcache import SnapshotCache
+from svnapi import parse_wc_status_files, SvnApi, SvnWcInfo
+from wcindex import WcFileIndex
 
 
 def create_empty_file(path):
@@ -43,12 +55,21 @@ class FakeServerApi:
         self._mappings[mapping["id"]] = mapping
         return mapping
 
+    def add_mappings(self, mappings):
+        return [self.add_mapping(x["pattern"], x["group_id"],
+                                 x["triggers_katt2"])
+                for x in mappings]
+
     def delete_group(self, group_id):
         mappings = self.get_mappings_by_group(group_id)
         if mappings:
             raise ResourceConflict
         del self._groups[group_id]
 
+    def delete_mappings(self, mapping_ids):
+        for mapping_id in mapping_ids:
+            del self._mappings[mapping_id]
+
     def get_groups(self):
         return self._groups.values()
 
@@ -75,15 +96,30 @@ class FakeServerApi:
     def update_mapping(self, mapping):
         self._mappings[mapping["id"]] = mapping
 
+    def update_mappings(self, mappings):
+        for mapping in mappings:
+            self.update_mapping(mapping)
+
 
 class FakeSvnApi(SvnApi):
     def __init__(self, paths=None):
         SvnApi.__init__(self, SVN_BASE_URL)
         self._path_map = paths
+        self.get_existing_urls_calls = 0
+        self.get_wc_urls_calls = 0
+
+    def get_existing_urls(self, urls):
+        self.get_existing_urls_calls += 1
+        return set(x for x in urls if self.path_exists_in_repo(x))
 
     def get_wc_files_under_path(self, path):
         return self._path_map.get(path, [])
 
+    def get_wc_urls(self, paths):
+        self.get_wc_urls_calls += 1
+        return dict((x, self.get_wc_path_info(x).url) for x in paths
+                    if self.get_wc_path_info(x) is not None)
+
     def get_wc_path_info(self, path):
         if path == "does/not/exist":
             return None
@@ -256,6 +292,98 @@ class TestCommandExecutor(FixtureWithDummyData):
         self.assertEqual(self._stdout.getvalue(), expected_stdout)
 
 
+class TestMappingFile(FixtureWithDummyData):
+    def _write(self, filename, content):
+        with open(filename, "w") as fp:
+            fp.write(content)
+
+    def _changes(self, filename):
+        return self._command_executor._compute_mapping_changes(
+            read_entries(open(filename), get_format(filename)))
+
+    def test_export_and_read_back(self):
+        for filename in ["mappings.json", "mappings.csv"]:
+            self._command_executor.cmd_export(filename)
+            with open(filename) as fp:
+                entries = read_entries(fp, get_format(filename))
+            self.assertEqual(
+                [(x["id"], x["pattern"], x["group"], x["triggers_katt2"])
+                 for x in entries],
+                [("471", "dev:basking shark", "sage", "false"),
+                 ("8", "dev:monkey", "basil", "false"),
+                 ("50", "stuff:sloth", "basil", "false")])
+            self.assertEqual(self._changes(filename), ([], [], []))
+
+    def test_export_to_stdout(self):
+        self._command_executor.cmd_export()
+        exported = json.loads(self._stdout.getvalue())
+        self.assertEqual(len(exported), 3)
+        self.assertEqual(exported[0]["group"], "sage")
+
+    def test_changes_are_computed_and_verified_in_one_batch(self):
+        self._write("mappings.csv", """\
+id,pattern,group,triggers_katt2,delete
+8,dev:monkey,basil,true,
+50,,,,true
+,dev:basking shark,sage,false,
+,project/foo/*,sage,false,
+,dev:project/bar,basil,true,
+""")
+        additions, updates, deletions = self._changes("mappings.csv")
+        self.assertEqual(
+            sorted((x["pattern"], x["group_id"]) for x in additions),
+            [("dev:project/bar", "17"), ("dev:project/foo/*", "18")])
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0][1]["id"], "8")
+        self.assertEqual(updates[0][1]["triggers_katt2"], "true")
+        self.assertEqual([x["id"] for x in deletions], ["50"])
+        self.assertEqual(self._svn.get_existing_urls_calls, 1)
+
+    def test_applying_changes(self):
+        self._write("mappings.json", json.dumps([
+            {"id": "471", "pattern": "dev:shark", "group": "basil",
+             "triggers_katt2": False},
+            {"id": "8", "delete": True},
+            {"pattern": "dev:parrot", "group": "sage",
+             "triggers_katt2": True},
+        ]))
+        self._command_executor._apply_mapping_changes(
+            *self._changes("mappings.json"))
+        mappings = sorted((x["pattern"], x["group_id"], x["triggers_katt2"])
+                          for x in self._server.get_mappings())
+        self.assertEqual(mappings, [("dev:parrot", "18", "true"),
+                                    ("dev:shark", "17", "false"),
+                                    ("stuff:sloth", "17", "false")])
+
+    def test_unknown_group_should_fail(self):
+        self._write("mappings.json", json.dumps([
+            {"pattern": "dev:x", "group": "parsley",
+             "triggers_katt2": "false"}]))
+        with self.assertRaises(ExecutionError) as context:
+            self._changes("mappings.json")
+        self.assertTrue("parsley" in context.exception.message)
+
+    def test_unknown_mapping_id_should_fail(self):
+        self._write("mappings.json", json.dumps([{"id": "4711",
+                                                  "delete": True}]))
+        self.assertRaises(ExecutionError, self._changes, "mappings.json")
+
+    def test_nonexisting_patterns_are_reported_together(self):
+        self._write("mappings.json", json.dumps([
+            {"pattern": "dev:does/not/exist/a", "group": "basil",
+             "triggers_katt2": "false"},
+            {"pattern": "dev:does/not/exist/b", "group": "basil",
+             "triggers_katt2": "false"}]))
+        with self.assertRaises(ExecutionError) as context:
+            self._changes("mappings.json")
+        self.assertTrue("exist/a" in context.exception.message)
+        self.assertTrue("exist/b" in context.exception.message)
+
+    def test_missing_field_should_fail(self):
+        self._write("mappings.json", json.dumps([{"pattern": "dev:x"}]))
+        self.assertRaises(ExecutionError, self._changes, "mappings.json")
+
+
 class TestPatternGuessing(FixtureWithDummyData):
     def setUp(self):
         FixtureWithDummyData.setUp(self)
@@ -449,6 +577,87 @@ fie/file
         self.assertEqual(self._stdout.getvalue(), expected_stdout)
 
 
+class TestAnalyze(FixtureBase):
+    def setUp(self, id_type=str):
+        groups = [
+            {"id": "1", "name": "basil"},
+            {"id": "2", "name": "sage"},
+        ]
+        patterns_and_groups = [
+            ("dev:project/ANYBRANCH/foo/*", "1"),
+            ("dev:project/ANYBRANCH/foo/bar/*", "1"),
+            ("dev:project/ANYBRANCH/foo/bar/*", "2"),
+            ("dev:project/ANYBRANCH/fum/*", "2"),
+            ("other:project/ANYBRANCH/*", "2"),
+        ]
+        mappings = [{"id": id_type(i),
+                     "group_id": group_id,
+                     "pattern": pattern,
+                     "triggers_katt2": "false"}
+                    for i, (pattern, group_id)
+                    in enumerate(patterns_and_groups, 1)]
+        paths = {".": ["foo/file", "foo/bar/file", "fie/file"],
+                 "foo": ["foo/file", "foo/bar/file"]}
+        FixtureBase.setUp(self, groups, mappings, paths)
+
+    def test_report(self):
+        self._command_executor.cmd_analyze(".", "1")
+        expected_stdout = """\
+Analyzed 3 files under ".".
+
+Matching mappings (number of matched files):
+      2 [id: 1] dev:project/ANYBRANCH/foo/* -> basil
+      1 [id: 2] dev:project/ANYBRANCH/foo/bar/* -> basil
+      1 [id: 3] dev:project/ANYBRANCH/foo/bar/* -> sage
+
+Mappings for dev:project/trunk/* matching no files:
+[id: 4] dev:project/ANYBRANCH/fum/* -> sage
+
+Mappings whose files are all matched by other mappings for the same group:
+[id: 2] dev:project/ANYBRANCH/foo/bar/* -> basil (covered by 1)
+
+Files matched by more than 1 groups:
+foo/bar/file: basil, sage
+"""
+        self.assertEqual(self._stdout.getvalue(), expected_stdout)
+
+    def test_invalid_max_groups(self):
+        self.assertRaises(UsageError, self._command_executor.cmd_analyze,
+                          ".", "many")
+
+    def test_unused_mappings_under_subdirectory(self):
+        self._command_executor.cmd_analyze("foo")
+        self.assertTrue(
+            "Mappings for dev:project/trunk/foo/* matching no files:\n\n"
+            in self._stdout.getvalue())
+
+
+class TestAnalyzeWithIntegerIds(TestAnalyze):
+    def setUp(self):
+        TestAnalyze.setUp(self, int)
+
+
+class TestIsPatternUnder(TestCase):
+    def test_static_prefix_under_path(self):
+        path = "dev:project/trunk/foo"
+        self.assertTrue(is_pattern_under("dev:project/trunk/foo/*", path))
+        self.assertTrue(is_pattern_under("dev:project/ANYBRANCH/foo/b*", path))
+        self.assertTrue(is_pattern_under("dev:project/trunk/foo", path))
+        self.assertTrue(is_pattern_under(
+            "dev:project/ANYBRANCH/fum/*", "dev:project/branches/b"))
+
+    def test_static_prefix_not_under_path(self):
+        path = "dev:project/trunk/foo"
+        self.assertFalse(is_pattern_under("dev:project/ANYBRANCH/*", path))
+        self.assertFalse(is_pattern_under("dev:project/trunk/fo*", path))
+        self.assertFalse(is_pattern_under("dev:project/trunk/fum/*", path))
+        self.assertFalse(is_pattern_under("dev:project/trunk", path))
+        self.assertFalse(is_pattern_under(
+            "dev:project/branches/b/foo/*", path))
+        self.assertFalse(is_pattern_under("other:project/ANYBRANCH/*",
+                                          "dev:project"))
+
+
 class TestDiffMapping(FixtureBase):
     def _get_patternish_paths_from_diff(self, diff):
         diff_fp = StringIO(diff)
@@ -488,6 +697,38 @@ Blah blah, description of patch, etc.
             self._get_patternish_paths_from_diff(diff)
         self.assertTrue("does/not/exist" in context.exception.message)
 
+    def test_paths_are_looked_up_in_one_batch(self):
+        diff = """\
+--- foo/file1.txt
++++ foo/file1.txt
+--- foo/file2.txt
++++ foo/file2.txt
+--- foo/file1.txt
++++ foo/file1.txt
+"""
+        patternish_paths = self._get_patternish_paths_from_diff(diff)
+        self.assertEqual(patternish_paths, set([
+            "dev:project/trunk/foo/file1.txt",
+            "dev:project/trunk/foo/file2.txt",
+        ]))
+        self.assertEqual(self._svn.get_wc_urls_calls, 1)
+
+    def test_trusted_paths_are_not_looked_up(self):
+        self._command_executor = CommandExecutor(
+            self._server, self._svn, self._stdout, trust_paths=True)
+        diff = """\
+--- foo/file1.txt
++++ ./foo/file1.txt
+--- does/not/exist
++++ does/not/exist
+"""
+        patternish_paths = self._get_patternish_paths_from_diff(diff)
+        self.assertEqual(patternish_paths, set([
+            "dev:project/trunk/foo/file1.txt",
+            "dev:project/trunk/does/not/exist",
+        ]))
+        self.assertEqual(self._svn.get_wc_urls_calls, 0)
+
     def test_diff_from_svn_diff_in_wc(self):
         diff = """\
 --- foo/file1.txt      (revision 387960)
@@ -549,6 +790,230 @@ D       foo/file3.txt
         self.assertEqual(patternish_paths, expected_patternish_paths)
 
 
+class TestMappingMatcher(TestCase):
+    PATTERNS = [
+        "dev:project/ANYBRANCH/foo/*",
+        "dev:project/ANYBRANCH/foo/bar/*",
+        "dev:project/ANYBRANCH/foo/file",
+        "dev:project/ANYBRANCH",
+        "dev:project/trunk/fie*",
+        "dev:project/*/file",
+        "dev:*",
+        "dev:project/ANYBRANCH/x*y/ANYBRANCH/z",
+        "other:project/ANYBRANCH/*",
+    ]
+
+    PATHS = [
+        "dev:project/trunk/foo/file",
+        "dev:project/trunk/foo/bar/file",
+        "dev:project/branches/DEV_x/foo/bar/file",
+        "dev:project/branches/foo/file",
+        "dev:project/branches//foo/file",
+        "dev:project/trunk",
+        "dev:project/branches/DEV_x",
+        "dev:project/trunk/foo",
+        "dev:project/trunk/fie/file",
+        "dev:project/trunk/xay/branches/b/z",
+        "dev:project/trunk/xy/trunk/z",
+        "dev:project/tags/foo/file",
+        "other:project/trunk/foo",
+        "dev",
+        "",
+    ]
+
+    def setUp(self):
+        self._mappings = [{"id": str(i), "pattern": pattern}
+                          for i, pattern in enumerate(self.PATTERNS)]
+        self._mappings_and_regexps = create_mapping_regexps(self._mappings)
+        self._matcher = MappingMatcher(self._mappings_and_regexps)
+
+    def test_same_result_as_regexps(self):
+        for path in self.PATHS:
+            expected_ids = sorted(
+                mapping["id"]
+                for mapping, regexp in self._mappings_and_regexps
+                if regexp.match(path))
+            matched_ids = sorted(x["id"] for x in self._matcher.match(path))
+            self.assertEqual(matched_ids, expected_ids, path)
+            self.assertEqual(self._matcher.matches_any(path),
+                             bool(expected_ids), path)
+
+    def test_anybranch_requires_branch_name(self):
+        matcher = MappingMatcher(
+            create_mapping_regexps([self._mappings[0]]))
+        self.assertTrue(matcher.matches_any("dev:project/branches/b/foo/x"))
+        self.assertFalse(matcher.matches_any("dev:project/branches/foo/x"))
+        self.assertFalse(matcher.matches_any("dev:project/branches"))
+
+    def test_no_mappings(self):
+        matcher = MappingMatcher([])
+        self.assertEqual(matcher.match("dev:project/trunk/foo"), [])
+        self.assertFalse(matcher.matches_any("dev:project/trunk/foo"))
+
+
+class FakeUsernameProvider:
+    def get_username(self):
+        return "user"
+
+
+class FakeOpener:
+    def __init__(self, collections):
+        self.collections = collections
+        self.etags = dict((name, "1") for name in collections)
+        self.offline = False
+        self.requests = []
+
+    def open(self, request):
+        url = request.get_full_url()
+        name = url.partition("/api/v1/")[2].partition("/")[0]
+        self.requests.append((request.get_method(), name,
+                              request.get_header("If-none-match")))
+        if self.offline:
+            raise URLError("offline")
+        if request.get_method() != "GET":
+            self.etags[name] = str(int(self.etags[name]) + 1)
+            return addinfourl(StringIO(""), Message(StringIO("")), url, 204)
+        if request.get_header("If-none-match") == self.etags[name]:
+            raise HTTPError(url, 304, "Not Modified", None, None)
+        headers = Message(StringIO("ETag: {0}\r\n".format(self.etags[name])))
+        body = StringIO(json.dumps(self.collections[name]))
+        return addinfourl(body, headers, url, 200)
+
+
+class TestServerApiSnapshots(TestCase):
+    API_URL = "http://server/api/v1/"
+
+    def setUp(self):
+        self._tmpdir = mkdtemp(suffix="test-codemapper", dir="/tmp")
+        self._opener = FakeOpener({
+            "groups": [{"id": "1", "name": "basil"}],
+            "mappings": [{"id": "8", "group_id": "1", "pattern": "dev:x",
+                          "triggers_katt2": "false"}],
+        })
+
+    def tearDown(self):
+        rmtree(self._tmpdir)
+
+    def _create_server(self):
+        server = ServerApi(self.API_URL, FakeUsernameProvider(),
+                           SnapshotCache(self._tmpdir, self.API_URL))
+        server._opener = self._opener
+        return server
+
+    def test_unchanged_snapshot_is_revalidated(self):
+        self.assertEqual(len(self._create_server().get_mappings()), 1)
+        self.assertEqual(len(self._create_server().get_mappings()), 1)
+        self.assertEqual(self._opener.requests,
+                         [("GET", "mappings", None),
+                          ("GET", "mappings", "1")])
+
+    def test_snapshot_is_fetched_once_per_process(self):
+        server = self._create_server()
+        server.get_groups()
+        server.get_groups()
+        self.assertEqual(len(self._opener.requests), 1)
+
+    def test_lookups_are_served_from_snapshot(self):
+        server = self._create_server()
+        server.get_mappings()
+        server.get_groups()
+        self.assertEqual(server.get_mapping_by_id("8")["pattern"], "dev:x")
+        self.assertEqual(server.get_group_by_id("1")["name"], "basil")
+        self.assertEqual(server.get_group_by_name("basil")["id"], "1")
+        self.assertEqual(len(server.get_mappings_by_group("1")), 1)
+        self.assertEqual(len(self._opener.requests), 2)
+
+    def test_cached_snapshot_is_used_when_offline(self):
+        self._create_server().get_groups()
+        self._opener.offline = True
+        self._opener.collections["groups"] = []
+        saved_stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            groups = self._create_server().get_groups()
+        finally:
+            sys.stderr = saved_stderr
+        self.assertEqual(groups, [{"id": "1", "name": "basil"}])
+
+    def test_offline_without_snapshot_fails(self):
+        self._opener.offline = True
+        self.assertRaises(URLError, self._create_server().get_groups)
+
+    def test_modification_invalidates_snapshots(self):
+        server = self._create_server()
+        server.get_mappings()
+        self._opener.collections["mappings"] = []
+        server.delete_mapping("8")
+        self.assertEqual(server.get_mappings(), [])
+        self.assertEqual(self._create_server().get_mappings(), [])
+        self.assertEqual(
+            [x[2] for x in self._opener.requests if x[0] == "GET"],
+            [None, None, "2"])
+
+    def test_bulk_update(self):
+        server = self._create_server()
+        server.get_mappings()
+        mappings = [{"id": str(i), "group_id": "1", "pattern": "dev:x",
+                     "triggers_katt2": "false"} for i in range(10)]
+        server.update_mappings(mappings)
+        self.assertEqual(
+            len([x for x in self._opener.requests if x[0] == "PUT"]), 10)
+        server.get_mappings()
+        self.assertEqual(self._opener.requests[-1], ("GET", "mappings", None))
+
+
+class CountingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.num_connections += 1
+
+    def do_GET(self):
+        body = json.dumps({"path": self.path})
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        self._server = HTTPServer(("127.0.0.1", 0), CountingRequestHandler)
+        self._server.num_connections = 0
+        self._thread = Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        self._url = "http://127.0.0.1:{0}".format(self._server.server_port)
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def test_connection_is_reused(self):
+        pool = ConnectionPool(1)
+        opener = build_opener(KeepAliveHTTPHandler(pool))
+        for i in range(5):
+            response = opener.open("{0}/{1}".format(self._url, i))
+            self.assertEqual(json.loads(response.read()),
+                             {"path": "/{0}".format(i)})
+        pool.close()
+        self.assertEqual(self._server.num_connections, 1)
+
+    def test_closed_connection_is_replaced(self):
+        pool = ConnectionPool(1)
+        opener = build_opener(KeepAliveHTTPHandler(pool))
+        opener.open(self._url + "/a").read()
+        pool.close()
+        self.assertEqual(json.loads(opener.open(self._url + "/b").read()),
+                         {"path": "/b"})
+        pool.close()
+        self.assertEqual(self._server.num_connections, 2)
+
+
 class FixtureWithDummyTriggersKatt2Data(FixtureBase):
     def setUp(self):
         groups = [
@@ -584,5 +1049,91 @@ class TestTriggersKatt2Printing(FixtureWithDummyTriggersKatt2Data):
         self.assertEqual(self._stdout.getvalue(), expected_stdout)
 
 
+class TestWcFileIndex(TestCase):
+    FILES = ["file", "foo/file", "foo/bar/file", "fie/file"]
+
+    def setUp(self):
+        self._saved_cwd = getcwd()
+        self._tmpdir = mkdtemp(suffix="test-codemapper", dir="/tmp")
+        self._cache_dir = join(self._tmpdir, "cache")
+        self._wc_root = join(self._tmpdir, "wc")
+        create_empty_file(join(self._wc_root, ".svn", "wc.db"))
+        for path in self.FILES:
+            create_empty_file(join(self._wc_root, path))
+        chdir(self._wc_root)
+        self._list_calls = []
+
+    def tearDown(self):
+        chdir(self._saved_cwd)
+        rmtree(self._tmpdir)
+
+    def _list_files(self, wc_root):
+        self._list_calls.append(wc_root)
+        return self.FILES
+
+    def _create_index(self):
+        return WcFileIndex(self._cache_dir, self._list_files)
+
+    def test_files_under_path(self):
+        index = self._create_index()
+        self.assertEqual(index.get_files_under_path("."), sorted(self.FILES))
+        self.assertEqual(index.get_files_under_path("foo"),
+                         ["foo/bar/file", "foo/file"])
+        self.assertEqual(index.get_files_under_path("foo/bar/file"),
+                         ["foo/bar/file"])
+        chdir("foo")
+        self.assertEqual(index.get_files_under_path("."),
+                         ["bar/file", "file"])
+        self.assertEqual(len(self._list_calls), 1)
+
+    def test_index_is_reused_from_disk(self):
+        self._create_index().get_files_under_path(".")
+        self.assertEqual(self._create_index().get_files_under_path("fie"),
+                         ["fie/file"])
+        self.assertEqual(self._list_calls, [self._wc_root])
+
+    def test_index_is_rebuilt_when_wc_database_changes(self):
+        self._create_index().get_files_under_path(".")
+        with open(join(self._wc_root, ".svn", "wc.db"), "a") as fp:
+            fp.write("changed")
+        self._create_index().get_files_under_path(".")
+        self.assertEqual(len(self._list_calls), 2)
+
+    def test_path_outside_working_copy(self):
+        self.assertTrue(
+            self._create_index().get_files_under_path(self._tmpdir) is None)
+        self.assertEqual(self._list_calls, [])
+
+
+class TestParseWcStatusFiles(TestCase):
+    STATUS_XML = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<status>
+<target path="/wc">
+%s</target>
+</status>
+"""
+
+    def _entry(self, path, item):
+        return ('<entry path="/wc/%s"><wc-status item="%s" revision="5">'
+                '</wc-status></entry>\n' % (path, item))
+
+    def test_only_present_versioned_files_are_listed(self):
+        entries = "".join([
+            '<entry path="/wc"><wc-status item="normal"/></entry>\n',
+            self._entry("kept", "normal"),
+            self._entry("edited", "modified"),
+            self._entry("new", "added"),
+            self._entry("removed", "deleted"),
+            self._entry("gone", "missing"),
+            self._entry("blocked", "obstructed"),
+            self._entry("junk", "unversioned"),
+            self._entry("ext", "external"),
+        ])
+        self.assertEqual(
+            parse_wc_status_files(StringIO(self.STATUS_XML % entries), "/wc"),
+            ["kept", "edited", "new"])
+
+
 if __name__ == "__main__":
     main()
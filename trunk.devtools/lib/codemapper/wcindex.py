@@ -0,0 +1,125 @@
+import json
+
+from hashlib import md5
+from os import makedirs, rename, stat
+from os.path import abspath, dirname, isdir, join, relpath
+
+
+def find_wc_root(path):
+    """
+    Return the root of the (Subversion 1.7+) working copy that path is in,
+    or None if path is not in such a working copy.
+    """
+    directory = abspath(path)
+    while True:
+        if isdir(join(directory, ".svn")):
+            try:
+                stat(join(directory, ".svn", "wc.db"))
+                return directory
+            except OSError:
+                # Pre-1.7 working copy with .svn in every directory.
+                return None
+        parent = dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+class WcFileIndex:
+    """
+    Index of the versioned files in working copies, kept in memory and on
+    disk per working copy root.
+
+    Every svn operation that changes the set of versioned files (update,
+    switch, add, delete, revert, ...) rewrites the working copy database
+    (.svn/wc.db), so the index is only rebuilt when the modification time or
+    size of that file has changed since the index was built.
+
+    list_files is called with a working copy root and should return the
+    versioned files (not directories) in it, relative to the root, or None if
+    they could not be listed.
+    """
+
+    def __init__(self, cache_dir, list_files):
+        self._cache_dir = cache_dir
+        self._list_files = list_files
+        self._indexes = {}
+
+    def get_files_under_path(self, path):
+        """
+        Return versioned files under path (a file or directory) in the same
+        form as "svn status" prints them, or None if path is not in a
+        Subversion 1.7+ working copy.
+        """
+        wc_root = find_wc_root(path)
+        if wc_root is None:
+            return None
+        prefix = relpath(abspath(path), wc_root)
+        if prefix == ".":
+            prefix = ""
+        files = self._get_index(wc_root)
+        if files is None:
+            return None
+        if prefix in files:
+            return [path]
+
+        result = []
+        if prefix:
+            prefix += "/"
+        for filename in files:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):]
+                result.append(filename if path == "." else
+                              join(path, filename))
+        result.sort()
+        return result
+
+    #
+    # Internals
+    #
+
+    def _cache_path(self, wc_root):
+        return join(self._cache_dir, md5(wc_root).hexdigest() + ".json")
+
+    def _get_index(self, wc_root):
+        st = stat(join(wc_root, ".svn", "wc.db"))
+        stamp = [st.st_mtime, st.st_size]
+
+        if wc_root in self._indexes:
+            index_stamp, files = self._indexes[wc_root]
+            if index_stamp == stamp:
+                return files
+
+        try:
+            with open(self._cache_path(wc_root)) as fp:
+                index = json.load(fp)
+            if index["wc_root"] == wc_root and index["stamp"] == stamp:
+                files = frozenset(x.encode("utf-8") for x in index["files"])
+                self._indexes[wc_root] = (stamp, files)
+                return files
+        except (IOError, ValueError, KeyError, TypeError):
+            pass
+
+        files = self._list_files(wc_root)
+        if files is None:
+            return None
+        files = frozenset(files)
+        self._indexes[wc_root] = (stamp, files)
+        self._store(wc_root, stamp, files)
+        return files
+
+    def _store(self, wc_root, stamp, files):
+        path = self._cache_path(wc_root)
+        tmp_path = path + ".tmp"
+        try:
+            if not isdir(self._cache_dir):
+                makedirs(self._cache_dir)
+            with open(tmp_path, "w") as fp:
+                json.dump({"wc_root": wc_root,
+                           "stamp": stamp,
+                           "files": sorted(files)},
+                          fp)
+            rename(tmp_path, path)
+        except (IOError, OSError):
+            # The index is only an optimization.
+            pass
@@ -1,18 +1,30 @@
+import json
 import optparse
 import os
 import re
 import sys
 
-from os.path import dirname, join, realpath
+from os.path import dirname, expanduser, isdir, join, realpath
 from subprocess import call, Popen, PIPE
 
 sys.path.insert(0, dirname(realpath(__file__)) + '/../pycommon')
 
 from svn_common import SvnAuth, SvnPathInfo, insert_svn_authentication
 from svn_common import verify_branch_argument, get_branch_root
+from svncache import cached_command_output
+
+from diffstream import DiffCommandError, DiffStats, PathFilter
+from diffstream import filter_file_diffs, iter_command_file_diffs
+from paralleldiff import ParallelDiff
 
 REMOTESVN = realpath(join(dirname(__file__), '..', '..', 'bin', 'remotesvn'))
 
+METADATA_CACHE_FILE = expanduser('~/.cache/devtools/branch-metadata.json')
+METADATA_CACHE_ENABLED = True
+# file:// repositories are left out since they may be recreated with
+# different content (e.g. in tests).
+CACHEABLE_URL_RE = r'^(https?|svn(\+\w+)?)://'
+
 cmdline_options = None
 
 
@@ -52,11 +64,67 @@ def pegged_url(url, peg_revision, keep_head=True):
     return '%s@%s' % (url, peg_revision)
 
 
+class BranchMetadataCache:
+    """
+    Ancestry and mergeinfo of branches, keyed by branch URL and the revision
+    in which the branch was created. An entry is only valid as long as the
+    last changed revision of the branch is the one it was stored with, which
+    can be checked with a cheap "svn info" of the branch.
+    """
+
+    def __init__(self, path=METADATA_CACHE_FILE):
+        self._path = path
+
+    def find(self, branch_url, last_changed_revision):
+        """
+        Return (created revision, ancestor, mergeinfo) for branch_url as it
+        was in last_changed_revision, or None if not known.
+        """
+        entries = self._load().get(branch_url, {})
+        for created_revision, entry in entries.items():
+            if entry['last_changed_revision'] == last_changed_revision:
+                ancestor_url, ancestor_revision = entry['ancestor']
+                return (int(created_revision),
+                        (ancestor_url.encode('utf-8'), ancestor_revision),
+                        entry['mergeinfo'].encode('utf-8'))
+        return None
+
+    def store(self, branch_url, created_revision, last_changed_revision,
+              ancestor, mergeinfo):
+        metadata = self._load()
+        metadata.setdefault(branch_url, {})[str(created_revision)] = {
+            'last_changed_revision': last_changed_revision,
+            'ancestor': list(ancestor),
+            'mergeinfo': mergeinfo,
+        }
+        tmp_path = self._path + '.tmp'
+        try:
+            if not isdir(dirname(self._path)):
+                os.makedirs(dirname(self._path))
+            with open(tmp_path, 'w') as fp:
+                json.dump(metadata, fp, indent=4, sort_keys=True)
+            os.rename(tmp_path, self._path)
+        except (IOError, OSError):
+            pass
+
+    def _load(self):
+        try:
+            with open(self._path) as fp:
+                metadata = json.load(fp)
+            if isinstance(metadata, dict):
+                return metadata
+        except (IOError, ValueError):
+            pass
+        return {}
+
+
 class Branch:
     SVN_ADD_RE = r'\s+A %s \(from (?P<src_branch>[^:]+):(?P<src_rev>\d+)\)'
     SVN_DELETE_RE = r'\s+D %s'
+    SVN_LOG_REVISION_RE = r'^r(?P<revision>\d+) \|'
 
-    def __init__(self, path_or_url, base_url=None, svn_auth=None):
+    def __init__(self, path_or_url, base_url=None, svn_auth=None,
+                 metadata_cache=None):
         self._svn_auth = svn_auth
         self._svn_info = SvnPathInfo(path_or_url, self._svn_auth)
 
@@ -69,8 +137,28 @@ class Branch:
         else:
             self.end_revision = 'HEAD'
 
+        self._created_revision = None
+        self._mergeinfo = None
+        self._last_changed_revision = None
+        self._metadata_cache = None
+        if metadata_cache is None and METADATA_CACHE_ENABLED:
+            metadata_cache = BranchMetadataCache()
+        if metadata_cache is not None and re.match(CACHEABLE_URL_RE,
+                                                   self.url):
+            self._metadata_cache = metadata_cache
+            self._last_changed_revision = \
+                self._get_last_changed_revision(path_or_url)
+            metadata = self._metadata_cache.find(self.url,
+                                                 self._last_changed_revision)
+        else:
+            metadata = None
+
         if base_url is None:
-            self.ancestor = self._get_ancestor(self.url, self.end_revision)
+            if metadata is not None:
+                self._created_revision, self.ancestor, self._mergeinfo = \
+                    metadata
+            else:
+                self.ancestor = self._get_ancestor(self.url, self.end_revision)
             verbose('Branch created from: %s@%d' % self.ancestor)
         else:
             base_root_url = get_branch_root(
@@ -80,6 +168,18 @@ class Branch:
                 warning('revision in base url is ignored: @%s'
                         % ignored_revision)
             self.ancestor = base_root_url, None
+            if metadata is not None:
+                # Only the mergeinfo applies with a different ancestor.
+                self._mergeinfo = metadata[2]
+
+    def _get_last_changed_revision(self, path_or_url):
+        branch_info = self._svn_info
+        # Working copies may be out of date, so ask the server unless the
+        # branch root URL itself was given.
+        if '://' not in path_or_url or branch_info.url != self.url:
+            branch_info = SvnPathInfo(pegged_url(self.url, self.end_revision),
+                                      self._svn_auth)
+        return int(branch_info.last_changed_rev)
 
     def _get_ancestor(self, branch_url, ceil_revision):
         svn_log_command = ['svn', 'log',
@@ -88,7 +188,17 @@ class Branch:
                            '-r', '1:%s' % ceil_revision,
                            '%s@%s' % (branch_url, ceil_revision)]
         insert_svn_authentication(svn_log_command, self._svn_auth, 2)
-        first_branch_log_entry = run_command(svn_log_command).split('\n')
+        first_branch_log_entry = cached_command_output(
+            svn_log_command, run_command).split('\n')
+
+        if self._created_revision is None:
+            # The first log entry of the branch itself is its creation.
+            for line in first_branch_log_entry:
+                revision_match = re.match(Branch.SVN_LOG_REVISION_RE, line)
+                if revision_match:
+                    self._created_revision = int(
+                        revision_match.group('revision'))
+                    break
 
         src_branch, src_rev = None, None
         for line in first_branch_log_entry:
@@ -135,13 +245,25 @@ class Branch:
             return '%s/%s' % (self._svn_info.repository_root, path.lstrip('/'))
 
     def get_highest_merged_ancestor_revision(self):
+        ancestor_branch = self.ancestor[0]
+        return get_highest_merged_revision(
+            self._get_mergeinfo(), self._root_relative_path(ancestor_branch))
+
+    def _get_mergeinfo(self):
+        if self._mergeinfo is not None:
+            return self._mergeinfo
         svn_propget_command = ['svn', 'propget', 'svn:mergeinfo',
                                pegged_url(self.url, self.end_revision)]
         insert_svn_authentication(svn_propget_command, self._svn_auth, 3)
-        svn_propget_output = run_command(svn_propget_command)
-        ancestor_branch = self.ancestor[0]
-        return get_highest_merged_revision(
-            svn_propget_output, self._root_relative_path(ancestor_branch))
+        self._mergeinfo = cached_command_output(svn_propget_command,
+                                                run_command)
+        if (self._metadata_cache is not None
+                and self._created_revision is not None
+                and self.ancestor[1] is not None):
+            self._metadata_cache.store(self.url, self._created_revision,
+                                       self._last_changed_revision,
+                                       self.ancestor, self._mergeinfo)
+        return self._mergeinfo
 
 
 def get_highest_merged_revision(svn_propget_mergeinfo_output,
@@ -198,6 +320,26 @@ def get_branch_diff_command(branch_url, base_url=None, use_remotesvn=False,
     return command
 
 
+def iter_branch_diff(branch_url, base_url=None, use_remotesvn=False,
+                     svn_auth=None, directory=None, path_filter=None,
+                     stats=None):
+    """
+    Yield the branch diff as a stream of diffstream.FileDiffs, one per file
+    whose path matches path_filter (a diffstream.PathFilter, all files if
+    None), updating stats (a diffstream.DiffStats) on the way.
+    """
+    diff_command = get_branch_diff_command(branch_url, base_url,
+                                           use_remotesvn, False, svn_auth,
+                                           directory)
+    verbose(' '.join(diff_command))
+    try:
+        for file_diff in iter_command_file_diffs(diff_command, path_filter,
+                                                 stats):
+            yield file_diff
+    except DiffCommandError as e:
+        fail(str(e))
+
+
 BRANCH_ARGUMENT_DESCRIPTION = '''\
 BRANCH[@REV] can be a URL (optionally for a specific revision) or a working
 copy path. The default is ".". If BRANCH refers to a subdirectory, the branch
@@ -263,12 +405,46 @@ def parse_args():
                       help='print additional information')
     parser.add_option('-d', '--directory',
                       help="directory (relative to root) to compare")
+    parser.add_option('-i', '--include',
+                      action='append',
+                      default=[],
+                      metavar='PATTERN',
+                      help=('only include files matching PATTERN (a shell'
+                            ' glob where * also matches /) in the diff; may'
+                            ' be given multiple times'))
+    parser.add_option('-x', '--exclude',
+                      action='append',
+                      default=[],
+                      metavar='PATTERN',
+                      help=('exclude files matching PATTERN from the diff;'
+                            ' may be given multiple times'))
+    parser.add_option('--stat',
+                      action='store_true',
+                      default=False,
+                      help=('print the number of changed files and lines to'
+                            ' stderr after the diff'))
+    parser.add_option('-j', '--parallel',
+                      type='int',
+                      default=1,
+                      metavar='N',
+                      help=('run up to N diffs of top-level directories'
+                            ' concurrently (faster for huge branches)'))
 
     options, positional_args = parser.parse_args()
 
     if len(positional_args) > 1:
         fail('expected at most one positional argument (BRANCH)')
 
+    if options.summarize and (options.include or options.exclude
+                              or options.stat):
+        fail('--summarize cannot be combined with --include, --exclude or'
+             ' --stat')
+
+    if options.parallel < 1:
+        fail('--parallel requires a positive number')
+    if options.parallel > 1 and (options.summarize or options.remotesvn):
+        fail('--parallel cannot be combined with --summarize or --remotesvn')
+
     branch = ('.' if len(positional_args) == 0 else positional_args[0])
     verify_branch_argument(branch)
     return (branch, options)
@@ -285,6 +461,48 @@ def main():
     if cmdline_options.dry_run:
         print ' '.join(diff_command)
         return 0
+    elif (cmdline_options.include or cmdline_options.exclude
+          or cmdline_options.stat or cmdline_options.parallel > 1):
+        return _write_filtered_diff(diff_command, svn_auth)
     else:
         verbose(' '.join(diff_command))
         return call(diff_command)
+
+
+def _write_filtered_diff(diff_command, svn_auth=None):
+    path_filter = PathFilter(cmdline_options.include, cmdline_options.exclude)
+    stats = DiffStats()
+    try:
+        if cmdline_options.parallel > 1:
+            diff_command = _peg_new_url(diff_command, svn_auth)
+            parallel_diff = ParallelDiff(diff_command,
+                                         cmdline_options.parallel, verbose)
+            file_diffs = filter_file_diffs(parallel_diff.iter_lines(),
+                                           path_filter, stats)
+        else:
+            verbose(' '.join(diff_command))
+            file_diffs = iter_command_file_diffs(diff_command, path_filter,
+                                                 stats)
+        for file_diff in file_diffs:
+            sys.stdout.writelines(file_diff.lines)
+    except DiffCommandError as e:
+        fail(str(e))
+    if cmdline_options.stat:
+        sys.stderr.write('%s\n' % stats)
+    return 0
+
+
+def _peg_new_url(diff_command, svn_auth):
+    """
+    Return diff_command with its NEW URL pegged to the current revision if
+    it isn't pegged, so that the several svn commands of a parallel diff all
+    see the same revision even if commits are made meanwhile.
+    """
+    new_url = diff_command[-1]
+    if '@' in new_url.rpartition('/')[2]:
+        return diff_command
+    revision = SvnPathInfo(new_url, svn_auth).revision
+    if revision is None:
+        fail('unable to find the current revision of %s' % new_url)
+    verbose('Diffing %s in revision %s' % (new_url, revision))
+    return diff_command[:-1] + [pegged_url(new_url, revision)]
@@ -0,0 +1,190 @@
+"""
+Streaming processing of unified diffs as produced by "svn diff".
+
+A diff is split into one FileDiff per file (the "Index:" comment lines, the
+"---"/"+++" header and the hunks), so that huge diffs can be filtered,
+summarized and written out file by file without keeping the whole diff in
+memory or in temporary files.
+"""
+
+import re
+from fnmatch import translate
+from subprocess import Popen, PIPE
+
+HUNK_HEADER_RE = (r'^@@ -\d+(,(?P<old_count>\d+))?'
+                  r' \+\d+(,(?P<new_count>\d+))? @@')
+
+
+class DiffCommandError(Exception):
+    pass
+
+
+def _get_header_path(header_line):
+    """E.g. '--- foo/bar.c\t(revision 17)\\n' --> 'foo/bar.c'"""
+    return header_line[4:].rstrip('\n').split('\t')[0]
+
+
+class FileDiff(object):
+    def __init__(self, path):
+        # Path as written in the diff (None for text before the first file).
+        self.path = path
+        # All lines of the section, including line endings.
+        self.lines = []
+        # The lines that are part of the actual diff, i.e. all lines except
+        # comments such as "Index: ..." and property changes.
+        self.diff_lines = []
+        self.added_count = 0
+        self.removed_count = 0
+        self.size = 0
+
+    def has_header(self):
+        return len(self.diff_lines) > 0
+
+    def add_comment_line(self, line):
+        self.lines.append(line)
+        self.size += len(line)
+
+    def add_diff_line(self, line):
+        self.lines.append(line)
+        self.diff_lines.append(line)
+        self.size += len(line)
+
+
+class PathFilter(object):
+    """
+    Include/exclude filter for paths in a diff using shell-style glob
+    patterns, where * also matches /, like filterdiff -i/-x. A path matches
+    if it matches any include pattern (or there are none) and no exclude
+    pattern.
+    """
+
+    def __init__(self, includes=(), excludes=()):
+        self._include_re = self._compile(includes)
+        self._exclude_re = self._compile(excludes)
+
+    def matches(self, path):
+        if path is None:
+            return False
+        if self._include_re is not None and not self._include_re.match(path):
+            return False
+        return self._exclude_re is None or not self._exclude_re.match(path)
+
+    def _compile(self, patterns):
+        if not patterns:
+            return None
+        return re.compile('|'.join('(?:%s)' % translate(pattern)
+                                   for pattern in patterns))
+
+
+class DiffStats(object):
+    def __init__(self):
+        self.file_count = 0
+        self.added_count = 0
+        self.removed_count = 0
+        # Size of the whole diff and of the files that passed the filter.
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def add_read(self, file_diff):
+        self.bytes_read += file_diff.size
+
+    def add_written(self, file_diff):
+        self.file_count += 1
+        self.added_count += file_diff.added_count
+        self.removed_count += file_diff.removed_count
+        self.bytes_written += file_diff.size
+
+    def __str__(self):
+        return ('%d files changed, %d insertions(+), %d deletions(-)'
+                ' (%d of %d bytes)'
+                % (self.file_count, self.added_count, self.removed_count,
+                   self.bytes_written, self.bytes_read))
+
+
+def iter_file_diffs(lines):
+    """Split the diff lines (an iterable) into FileDiffs, one at a time."""
+    current = None
+    # Lines left of the current hunk.
+    old_left = new_left = 0
+    for line in lines:
+        if old_left > 0 or new_left > 0:
+            current.add_diff_line(line)
+            if line.startswith('-'):
+                old_left -= 1
+                current.removed_count += 1
+            elif line.startswith('+'):
+                new_left -= 1
+                current.added_count += 1
+            elif not line.startswith('\\'):
+                old_left -= 1
+                new_left -= 1
+            continue
+
+        if line.startswith('Index: '):
+            if current is not None:
+                yield current
+            current = FileDiff(line[7:].rstrip('\n'))
+            current.add_comment_line(line)
+        elif line.startswith('--- '):
+            # Diffs without "Index:" lines start a new file here.
+            if current is None or current.has_header():
+                if current is not None:
+                    yield current
+                current = FileDiff(_get_header_path(line))
+            current.add_diff_line(line)
+        elif (line.startswith('+++ ') and current is not None
+              and len(current.diff_lines) == 1):
+            current.add_diff_line(line)
+            path = _get_header_path(line)
+            if path != '/dev/null':
+                current.path = path
+        elif line.startswith('@@ ') and current is not None:
+            match = re.match(HUNK_HEADER_RE, line)
+            if match is not None:
+                old_left = int(match.group('old_count') or 1)
+                new_left = int(match.group('new_count') or 1)
+            current.add_diff_line(line)
+        elif line.startswith('\\') and current is not None:
+            # "\ No newline at end of file" after the last line of a hunk
+            current.add_diff_line(line)
+        else:
+            if current is None:
+                current = FileDiff(None)
+            current.add_comment_line(line)
+    if current is not None:
+        yield current
+
+
+def filter_file_diffs(lines, path_filter=None, stats=None):
+    """
+    Yield the FileDiffs of lines whose path matches path_filter (all if
+    None), updating stats (a DiffStats) on the way.
+    """
+    for file_diff in iter_file_diffs(lines):
+        if stats is not None:
+            stats.add_read(file_diff)
+        if path_filter is None or path_filter.matches(file_diff.path):
+            if stats is not None:
+                stats.add_written(file_diff)
+            yield file_diff
+
+
+def iter_command_file_diffs(diff_command, path_filter=None, stats=None):
+    """
+    Run diff_command and yield the FileDiffs of its output as described for
+    filter_file_diffs. Raises DiffCommandError if the command fails.
+    """
+    process = Popen(diff_command, stdout=PIPE)
+    completed = False
+    try:
+        for file_diff in filter_file_diffs(process.stdout, path_filter,
+                                           stats):
+            yield file_diff
+        completed = True
+    finally:
+        if not completed and process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise DiffCommandError('command "%s" failed' % ' '.join(diff_command))
@@ -0,0 +1,194 @@
+"""
+Generation of a large "svn diff OLD NEW" as several concurrent diffs, one
+per top-level directory that differs, plus one for the top-level files.
+
+Each partial diff is written to a temporary file by a worker thread. The
+partial diffs are output in path order (top-level files first, then the
+directories sorted by name) with their paths rewritten to be relative to
+OLD and NEW, so the result reads like a single diff of OLD and NEW.
+"""
+
+import re
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from multiprocessing.pool import ThreadPool
+from subprocess import Popen, PIPE
+from urllib import unquote
+
+from diffstream import DiffCommandError
+
+# Upper bound on how long to wait for a partial diff. Waiting with a timeout
+# (instead of none) keeps the main thread responsive to KeyboardInterrupt.
+PARTIAL_DIFF_TIMEOUT = 24 * 60 * 60  # Seconds
+
+HEADER_LINE_RE = (r'^(?P<prefix>(---|\+\+\+) )(?P<path>[^\t\n]*)'
+                  r'(?P<rest>.*)$')
+PATH_COMMENT_PREFIXES = ['Index: ', 'Property changes on: ']
+
+
+def _split_peg(url):
+    base, _, peg = url.rpartition('@')
+    if not base or '/' in peg:
+        return url, None
+    return base, peg
+
+
+def _join_url(url, path):
+    base, peg = _split_peg(url)
+    joined = '%s/%s' % (base, path)
+    return joined if peg is None else '%s@%s' % (joined, peg)
+
+
+def parse_summary(summary_xml, old_url, new_url):
+    """
+    Return a list of (item, kind, path relative to old_url/new_url) from the
+    output of "svn diff --summarize --xml old_url new_url", where item is
+    e.g. 'added' or 'modified' and kind is 'file' or 'dir'.
+    """
+    prefixes = [_split_peg(url)[0] for url in [old_url, new_url]]
+    changes = []
+    for element in ElementTree.fromstring(summary_xml).getiterator('path'):
+        target = element.text or ''
+        for prefix in prefixes:
+            if target == prefix or target.startswith(prefix + '/'):
+                target = target[len(prefix) + 1:]
+                break
+        changes.append((element.attrib.get('item'),
+                        element.attrib.get('kind'), unquote(target)))
+    return changes
+
+
+def partition_changes(changes):
+    """
+    Return (whether there are changes to top-level files or to the root
+    itself, sorted list of top-level directories with changes), or None if
+    the changes cannot be partitioned since a top-level directory was added
+    or deleted (and therefore cannot be diffed on its own).
+    """
+    has_top_level_changes = False
+    directories = set()
+    for item, kind, path in changes:
+        top, _, rest = path.partition('/')
+        if rest or (top and kind == 'dir'):
+            if not rest and item in ['added', 'deleted']:
+                return None
+            directories.add(top)
+        else:
+            has_top_level_changes = True
+    return has_top_level_changes, sorted(directories)
+
+
+def rewrite_paths(line, directory):
+    """
+    Rewrite a line of a diff of OLD/directory and NEW/directory to read like
+    a line of the diff of OLD and NEW.
+    """
+    for prefix in PATH_COMMENT_PREFIXES:
+        if line.startswith(prefix):
+            path = line[len(prefix):].rstrip('\n')
+            return '%s%s\n' % (prefix, _prefix_path(path, directory))
+    match = re.match(HEADER_LINE_RE, line)
+    if match is None:
+        return line
+    rest = match.group('rest').replace('/%s)' % directory, ')', 1)
+    return '%s%s%s\n' % (match.group('prefix'),
+                         _prefix_path(match.group('path'), directory),
+                         rest)
+
+
+def _prefix_path(path, directory):
+    return directory if path in ['', '.'] else '%s/%s' % (directory, path)
+
+
+class ParallelDiff(object):
+    def __init__(self, diff_command, jobs, verbose=None):
+        """
+        diff_command is a command in the form [svn, ..., 'diff', OLD, NEW]
+        as returned by diff_branch.get_branch_diff_command. verbose is
+        called with a message for each command that is run.
+        """
+        self._diff_command = diff_command
+        self._old_url, self._new_url = diff_command[-2:]
+        self._jobs = jobs
+        self._verbose = verbose or (lambda message: None)
+
+    def iter_lines(self):
+        """
+        Yield the lines of the diff. Raises DiffCommandError if a diff
+        command fails.
+        """
+        summary = self._run(self._diff_command + ['--summarize', '--xml'])
+        partitions = partition_changes(
+            parse_summary(summary, self._old_url, self._new_url))
+        if partitions is None or self._jobs < 2:
+            if partitions is None:
+                self._verbose('Top-level directory added or deleted,'
+                              ' not diffing in parallel')
+            for line in self._iter_command_lines(self._diff_command):
+                yield line
+            return
+
+        has_top_level_changes, directories = partitions
+        partial_diffs = []
+        if has_top_level_changes:
+            partial_diffs.append(
+                (None, self._diff_command[:-2]
+                 + ['--depth', 'files', self._old_url, self._new_url]))
+        for directory in directories:
+            partial_diffs.append(
+                (directory, self._diff_command[:-2]
+                 + [_join_url(self._old_url, directory),
+                    _join_url(self._new_url, directory)]))
+        if not partial_diffs:
+            return
+        for _, command in partial_diffs:
+            self._verbose(' '.join(command))
+
+        pool = ThreadPool(min(self._jobs, len(partial_diffs)))
+        try:
+            results = pool.imap(self._run_to_file,
+                                [command for _, command in partial_diffs])
+            for directory, _ in partial_diffs:
+                with results.next(PARTIAL_DIFF_TIMEOUT) as fp:
+                    for line in fp:
+                        if directory is not None:
+                            line = rewrite_paths(line, directory)
+                        yield line
+        finally:
+            pool.terminate()
+
+    #
+    # Internals
+    #
+
+    def _run(self, command):
+        self._verbose(' '.join(command))
+        process = Popen(command, stdout=PIPE)
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise DiffCommandError('command "%s" failed' % ' '.join(command))
+        return output
+
+    def _run_to_file(self, command):
+        fp = tempfile.TemporaryFile()
+        if Popen(command, stdout=fp).wait() != 0:
+            fp.close()
+            raise DiffCommandError('command "%s" failed' % ' '.join(command))
+        fp.seek(0)
+        return fp
+
+    def _iter_command_lines(self, command):
+        self._verbose(' '.join(command))
+        process = Popen(command, stdout=PIPE)
+        completed = False
+        try:
+            for line in process.stdout:
+                yield line
+            completed = True
+        finally:
+            if not completed and process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise DiffCommandError('command "%s" failed' % ' '.join(command))
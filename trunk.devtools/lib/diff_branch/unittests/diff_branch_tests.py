@@ -6,7 +6,9 @@ import shutil
 import tempfile
 import unittest
 
-from diff_branch import (get_branch_diff_command,
+from diff_branch import (BranchMetadataCache,
+                         _peg_new_url,
+                         get_branch_diff_command,
                          get_highest_merged_revision,
                          pegged_url)
 from os.path import basename, join
@@ -92,6 +94,16 @@ class RepoDependentTests(unittest.TestCase):
         self.assertEqual(right, pegged_url(self._foo_url,
                                            self._foo_created_revision))
 
+    def test_peg_new_url(self):
+        head_revision = create_revision(
+            ['mkdir', '-m', 'Created foo subdir.', join(self._foo_url, 'x')])
+        diff_command = get_branch_diff_command(self._foo_url)
+        self.assertEqual(_peg_new_url(diff_command, None)[-1],
+                         pegged_url(self._foo_url, head_revision))
+        pegged_command = diff_command[:-1] + [
+            pegged_url(self._foo_url, self._foo_created_revision)]
+        self.assertEqual(_peg_new_url(pegged_command, None), pegged_command)
+
     def test_rebased_branch(self):
         new_trunk_subdir = join(self._trunk_url, 'fish')
         trunk_modified_revision = create_revision(
@@ -187,5 +199,44 @@ class BasicTests(unittest.TestCase):
                                                      '/bsg/branches/foo'), 22)
 
 
+class BranchMetadataCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._cache_dir = tempfile.mkdtemp()
+        self._cache = BranchMetadataCache(join(self._cache_dir, 'metadata'))
+
+    def tearDown(self):
+        shutil.rmtree(self._cache_dir)
+
+    def test_missing_entry(self):
+        self.assertEqual(self._cache.find('http://foo/bar/trunk', 5), None)
+
+    def test_stored_entry_is_found_for_same_last_changed_revision(self):
+        self._cache.store('http://foo/bar/branches/baz', 10, 12,
+                          ('http://foo/bar/trunk', 9), '/bar/trunk:11')
+        self.assertEqual(
+            BranchMetadataCache(join(self._cache_dir, 'metadata')).find(
+                'http://foo/bar/branches/baz', 12),
+            (10, ('http://foo/bar/trunk', 9), '/bar/trunk:11'))
+        self.assertEqual(self._cache.find('http://foo/bar/branches/baz', 13),
+                         None)
+        self.assertEqual(self._cache.find('http://foo/bar/branches/qux', 12),
+                         None)
+
+    def test_recreated_branch_has_own_entry(self):
+        self._cache.store('http://foo/bar/branches/baz', 10, 12,
+                          ('http://foo/bar/trunk', 9), '')
+        self._cache.store('http://foo/bar/branches/baz', 20, 20,
+                          ('http://foo/bar/trunk', 19), '')
+        self.assertEqual(
+            self._cache.find('http://foo/bar/branches/baz', 12)[0], 10)
+        self.assertEqual(
+            self._cache.find('http://foo/bar/branches/baz', 20)[0], 20)
+
+    def test_broken_cache_file_is_ignored(self):
+        with open(join(self._cache_dir, 'metadata'), 'w') as fp:
+            fp.write('{')
+        self.assertEqual(self._cache.find('http://foo/bar/trunk', 5), None)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python2
+
+import unittest
+
+from diffstream import DiffStats, PathFilter
+from diffstream import filter_file_diffs, iter_file_diffs
+
+SVN_DIFF = """\
+Index: foo/a.c
+===================================================================
+--- foo/a.c\t(.../trunk)\t(revision 10)
++++ foo/a.c\t(.../branches/b)\t(revision 12)
+@@ -1,3 +1,3 @@
+ one
+--- two
++++ two
+ three
+@@ -10 +10,2 @@
+-ten
++TEN
++eleven
+\\ No newline at end of file
+Index: foo/README
+===================================================================
+--- foo/README\t(nonexistent)
++++ foo/README\t(revision 12)
+@@ -0,0 +1 @@
++hello
+
+Property changes on: foo/README
+___________________________________________________________________
+Added: svn:eol-style
+## -0,0 +1 ##
++native
+Index: bar/b.bin
+===================================================================
+Cannot display: file marked as a binary type.
+svn:mime-type = application/octet-stream
+"""
+
+
+def get_file_diffs(text):
+    return list(iter_file_diffs(text.splitlines(True)))
+
+
+class IterFileDiffsTests(unittest.TestCase):
+    def test_splits_diff_per_file(self):
+        file_diffs = get_file_diffs(SVN_DIFF)
+        self.assertEqual([file_diff.path for file_diff in file_diffs],
+                         ['foo/a.c', 'foo/README', 'bar/b.bin'])
+        self.assertEqual(''.join(''.join(file_diff.lines)
+                                 for file_diff in file_diffs),
+                         SVN_DIFF)
+
+    def test_hunk_lines_looking_like_headers_are_part_of_hunk(self):
+        file_diff = get_file_diffs(SVN_DIFF)[0]
+        self.assertEqual(file_diff.diff_lines[4:6],
+                         ['--- two\n', '+++ two\n'])
+        self.assertEqual(file_diff.added_count, 3)
+        self.assertEqual(file_diff.removed_count, 2)
+
+    def test_comments_are_not_diff_lines(self):
+        file_diffs = get_file_diffs(SVN_DIFF)
+        self.assertEqual(file_diffs[1].diff_lines,
+                         ['--- foo/README\t(nonexistent)\n',
+                          '+++ foo/README\t(revision 12)\n',
+                          '@@ -0,0 +1 @@\n',
+                          '+hello\n'])
+        self.assertEqual(file_diffs[2].diff_lines, [])
+
+    def test_diff_without_index_lines(self):
+        file_diffs = get_file_diffs(
+            '--- a\n+++ a\n@@ -1 +1 @@\n-x\n+y\n'
+            '--- /dev/null\n+++ b\n@@ -0,0 +1 @@\n+z\n')
+        self.assertEqual([file_diff.path for file_diff in file_diffs],
+                         ['a', 'b'])
+
+
+class PathFilterTests(unittest.TestCase):
+    def test_no_patterns_matches_everything(self):
+        self.assertTrue(PathFilter().matches('foo/bar.c'))
+
+    def test_include_and_exclude(self):
+        path_filter = PathFilter(['hal/server/*', 'hal/client/*'],
+                                 ['*README.mmd'])
+        self.assertTrue(path_filter.matches('hal/server/foo/bar.c'))
+        self.assertTrue(path_filter.matches('hal/client/bar.c'))
+        self.assertFalse(path_filter.matches('hal/other/bar.c'))
+        self.assertFalse(path_filter.matches('hal/server/README.mmd'))
+
+    def test_exclude_only(self):
+        path_filter = PathFilter(excludes=['hal/*'])
+        self.assertFalse(path_filter.matches('hal/bar.c'))
+        self.assertTrue(path_filter.matches('platform/hal/bar.c'))
+
+
+class FilterFileDiffsTests(unittest.TestCase):
+    def test_stats(self):
+        stats = DiffStats()
+        file_diffs = list(filter_file_diffs(SVN_DIFF.splitlines(True),
+                                            PathFilter(['foo/*']), stats))
+        self.assertEqual(len(file_diffs), 2)
+        self.assertEqual(stats.file_count, 2)
+        self.assertEqual(stats.added_count, 4)
+        self.assertEqual(stats.removed_count, 2)
+        self.assertEqual(stats.bytes_read, len(SVN_DIFF))
+        self.assertEqual(stats.bytes_written,
+                         sum(file_diff.size for file_diff in file_diffs))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
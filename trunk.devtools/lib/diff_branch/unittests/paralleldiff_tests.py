@@ -0,0 +1,79 @@
+#!/usr/bin/env python2
+
+import unittest
+
+from paralleldiff import parse_summary, partition_changes, rewrite_paths
+
+OLD_URL = 'svn://host/repo/trunk@10'
+NEW_URL = 'svn://host/repo/branches/b'
+
+SUMMARY_XML = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<diff>
+<paths>
+<path item="modified" props="none" kind="file"
+>svn://host/repo/trunk/foo/a%20b.c</path>
+<path item="none" props="modified" kind="dir"
+>svn://host/repo/trunk</path>
+<path item="added" props="none" kind="file"
+>svn://host/repo/branches/b/README</path>
+<path item="none" props="modified" kind="dir"
+>svn://host/repo/trunk/bar</path>
+</paths>
+</diff>
+"""
+
+
+class ParseSummaryTests(unittest.TestCase):
+    def test_paths_are_relative(self):
+        self.assertEqual([('modified', 'file', 'foo/a b.c'),
+                          ('none', 'dir', ''),
+                          ('added', 'file', 'README'),
+                          ('none', 'dir', 'bar')],
+                         parse_summary(SUMMARY_XML, OLD_URL, NEW_URL))
+
+
+class PartitionChangesTests(unittest.TestCase):
+    def test_partition(self):
+        self.assertEqual(
+            (True, ['bar', 'foo']),
+            partition_changes([('modified', 'file', 'foo/x/y.c'),
+                               ('none', 'dir', 'bar'),
+                               ('added', 'file', 'README'),
+                               ('modified', 'file', 'foo/z.c')]))
+
+    def test_only_directories(self):
+        self.assertEqual((False, ['foo']),
+                         partition_changes([('deleted', 'dir', 'foo/x')]))
+
+    def test_added_top_level_directory(self):
+        self.assertEqual(None,
+                         partition_changes([('modified', 'file', 'foo/a'),
+                                            ('added', 'dir', 'bar')]))
+
+
+class RewritePathsTests(unittest.TestCase):
+    def test_index_line(self):
+        self.assertEqual('Index: foo/x/a.c\n',
+                         rewrite_paths('Index: x/a.c\n', 'foo'))
+
+    def test_property_changes_on_directory_itself(self):
+        self.assertEqual('Property changes on: foo\n',
+                         rewrite_paths('Property changes on: .\n', 'foo'))
+
+    def test_header_lines(self):
+        self.assertEqual('--- foo/a.c\t(.../trunk)\t(revision 10)\n',
+                         rewrite_paths('--- a.c\t(.../trunk/foo)'
+                                       '\t(revision 10)\n', 'foo'))
+        self.assertEqual('+++ foo/a.c\t(.../branches/b)\t(revision 12)\n',
+                         rewrite_paths('+++ a.c\t(.../branches/b/foo)'
+                                       '\t(revision 12)\n', 'foo'))
+
+    def test_other_lines_are_unchanged(self):
+        for line in ['@@ -1 +1 @@\n', '-old\n', '+new\n', ' same\n',
+                     '=' * 67 + '\n']:
+            self.assertEqual(line, rewrite_paths(line, 'foo'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,6 @@
 # permission of ARRIS.
 
 import os
-import re
 import sys
 from subprocess import Popen, PIPE, STDOUT
 
@@ -69,29 +68,19 @@ def run_command(command, environment=None):
 def run_interactive_command(command, environment=None):
     process = Popen(command, stdout=PIPE, stderr=STDOUT, env=environment)
 
-    output = ""
+    # os.read returns whatever is available instead of waiting for a full
+    # buffer, so prompts are shown before the command waits for input.
+    chunks = []
     while True:
-        data = process.stdout.read(1)
+        data = os.read(process.stdout.fileno(), 4096)
         if not data:
             break
-        output += data
+        chunks.append(data)
         sys.stdout.write(data)
         sys.stdout.flush()
 
     process.wait()
-    return process.returncode, output
-
-
-def ping_in_millisec(host):
-    command = ["ping", "-c", "1", host]
-    exit_status, output = run_command(command)
-    if exit_status != 0:
-        return None
-    for line in output.split("\n"):
-        match = re.search(r"bytes from.*time=(?P<millisec>[\d.]+) ms$", line)
-        if match:
-            return float(match.group("millisec"))
-    return None
+    return process.returncode, "".join(chunks)
 
 
 def get_working_copy_root_path(working_path):
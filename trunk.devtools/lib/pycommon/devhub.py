@@ -6,9 +6,15 @@
 # permission of ARRIS.
 
 import json
+import os
+import threading
 import urllib
 import urllib2
+from multiprocessing.pool import ThreadPool
+from os.path import dirname, expanduser, isdir
+from time import time
 
+import gitcommon
 from common import ExecutionError
 
 
@@ -16,8 +22,160 @@ API_PARENT_URL = \
     ('https://devhub.arrisi.com/api/devtools/v1/parent_label_name?'
      'repo={repo_name}&label=heads%2F{label_name}')
 
+PARENT_CACHE_FILE = expanduser('~/.cache/devtools/devhub-parents.json')
+PARENT_CACHE_ENABLED = True
+# Cached parents younger than this are used without asking devhub. Older
+# ones are still used, but refreshed in the background.
+PARENT_CACHE_TTL = 24 * 60 * 60  # Seconds
+REQUEST_TIMEOUT = 5  # Seconds
+# Number of parents that prefetch_branch_parents queries concurrently.
+PREFETCH_JOBS = 8
+
+_parent_cache_lock = threading.Lock()
+
+
+class ParentCache(object):
+    """
+    Parents of branches, keyed by repository and branch name. An entry is
+    only valid as long as the merge base of the branch and its parent is the
+    one it was stored with, so that a branch that has been rebased onto
+    another parent is looked up again.
+    """
+
+    def __init__(self, path=None):
+        self._path = path if path is not None else PARENT_CACHE_FILE
+
+    def find(self, repo_name, branch_name):
+        """
+        Return (parent, merge base, time stored) for the branch, or None if
+        not known.
+        """
+        entry = self._load().get(repo_name, {}).get(branch_name)
+        if entry is None:
+            return None
+        return entry['parent'], entry['merge_base'], entry['time']
+
+    def store(self, repo_name, branch_name, parent, merge_base):
+        with _parent_cache_lock:
+            parents = self._load()
+            parents.setdefault(repo_name, {})[branch_name] = {
+                'parent': parent,
+                'merge_base': merge_base,
+                'time': time(),
+            }
+            tmp_path = '{0}.{1}.tmp'.format(self._path, os.getpid())
+            try:
+                if not isdir(dirname(self._path)):
+                    os.makedirs(dirname(self._path))
+                with open(tmp_path, 'w') as fp:
+                    json.dump(parents, fp, indent=4, sort_keys=True)
+                os.rename(tmp_path, self._path)
+            except (IOError, OSError):
+                pass
+
+    def _load(self):
+        try:
+            with open(self._path) as fp:
+                parents = json.load(fp)
+            if isinstance(parents, dict):
+                return parents
+        except (IOError, ValueError):
+            pass
+        return {}
+
 
 def get_branch_parent(repo_name, branch_name, verbose=False):
+    """
+    Return the parent of branch_name in repo_name according to devhub, or
+    None if it has no parent. A cached parent is returned without waiting
+    for devhub; if it's older than PARENT_CACHE_TTL, it's refreshed in the
+    background.
+    """
+    if not PARENT_CACHE_ENABLED:
+        return _query_branch_parent(repo_name, branch_name, verbose)
+
+    cache = ParentCache()
+    cached = cache.find(repo_name, branch_name)
+    if cached is not None:
+        parent, merge_base, stored_time = cached
+        if merge_base == _get_merge_base(branch_name, parent):
+            if verbose:
+                print 'Cached parent of {0}: {1}'.format(branch_name, parent)
+            if time() - stored_time > PARENT_CACHE_TTL:
+                refresh = threading.Thread(
+                    target=_refresh_branch_parent,
+                    args=(cache, repo_name, branch_name))
+                # Don't make the tool wait for devhub when exiting; the
+                # refresh is retried next time if it doesn't finish.
+                refresh.daemon = True
+                refresh.start()
+            return parent
+
+    return _refresh_branch_parent(cache, repo_name, branch_name, verbose,
+                                  raise_errors=True)
+
+
+def prefetch_branch_parents(repo_name, branch_names, jobs=PREFETCH_JOBS):
+    """
+    Query devhub for the parents of branch_names, jobs at a time, and store
+    them in the cache. Yield (branch name, parent, None) or (branch name,
+    None, exception) for each branch in order.
+    """
+    if not branch_names:
+        return
+    cache = ParentCache()
+
+    def refresh(branch_name):
+        try:
+            return _refresh_branch_parent(cache, repo_name, branch_name,
+                                          raise_errors=True), None
+        except ExecutionError as e:
+            return None, e
+
+    pool = ThreadPool(min(jobs, len(branch_names)))
+    try:
+        results = pool.imap(refresh, branch_names)
+        for branch_name in branch_names:
+            # Each query times out after REQUEST_TIMEOUT.
+            parent, ex = results.next(REQUEST_TIMEOUT * len(branch_names))
+            yield branch_name, parent, ex
+    finally:
+        pool.terminate()
+
+
+#
+# Internals
+#
+
+def _refresh_branch_parent(cache, repo_name, branch_name, verbose=False,
+                           raise_errors=False):
+    try:
+        parent = _query_branch_parent(repo_name, branch_name, verbose)
+    except ExecutionError:
+        if raise_errors:
+            raise
+        return None
+    cache.store(repo_name, branch_name, parent,
+                _get_merge_base(branch_name, parent))
+    return parent
+
+
+def _get_merge_base(branch_name, parent):
+    """
+    Return the merge base of the pushed branch and parent in the current
+    repository, or None if either isn't available locally.
+    """
+    if parent is None:
+        return None
+    if not parent.startswith('tags/'):
+        parent = 'origin/{0}'.format(parent)
+    try:
+        return gitcommon.merge_base(parent, 'origin/{0}'.format(branch_name))
+    except ExecutionError:
+        return None
+
+
+def _query_branch_parent(repo_name, branch_name, verbose=False):
     # Expected responses from API
     #  - "heads/<branch>"
     #  - "tags/<tag>"
@@ -32,7 +190,8 @@ def get_branch_parent(repo_name, branch_name, verbose=False):
 
     try:
         request = urllib2.Request(url, None)
-        response = json.loads(urllib2.urlopen(request).read())
+        response = json.loads(
+            urllib2.urlopen(request, timeout=REQUEST_TIMEOUT).read())
         if verbose:
             print 'HTTP Response (json decoded): {0}'.format(response)
 
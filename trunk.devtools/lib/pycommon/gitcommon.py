@@ -5,16 +5,36 @@
 # published or used, in whole or in part, without the express prior written
 # permission of ARRIS.
 
+"""
+Access to the git repository of the current directory.
+
+Revisions are resolved by a single "git cat-file --batch-check" process
+that is kept running, instead of one "git rev-parse" process each.
+Repository metadata that can't change while a tool runs (top level, current
+branch, configuration, client version) is only read once per process.
+"""
+
+import atexit
+import os
 import re
 import sys
 
 from collections import namedtuple
 from os.path import dirname, realpath
+from subprocess import Popen, PIPE
 
 sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
 
 from common import ExecutionError, run_command
 
+# Resolve revisions with a persistent "git cat-file --batch-check" process.
+GIT_BATCH_ENABLED = True
+
+BATCH_CHECK_RE = re.compile(r'^(?P<name>[0-9a-f]{40,64}) \w+ \d+$')
+
+_memoized_values = {}
+_revision_resolver = None
+
 
 class Warning(Exception):
     pass
@@ -27,7 +47,34 @@ def is_inside_work_tree():
 
 
 def rev_parse(refname):
-    cmd = ['git', 'rev-parse', refname]
+    object_name = None
+    resolver = _get_revision_resolver()
+    if resolver is not None:
+        object_name = resolver.resolve(refname)
+    else:
+        rc, output = run_command(['git', 'rev-parse', refname])
+        if rc == 0:
+            object_name = output.strip()
+
+    if object_name is None:
+        err = ('Failed to run command "git rev-parse {0}"'.format(refname))
+        raise ExecutionError(err)
+
+    return object_name
+
+
+def get_local_branches():
+    cmd = ['git', 'for-each-ref', '--format=%(refname:short)', 'refs/heads']
+    rc, output = run_command(cmd)
+    if rc != 0:
+        err = ('Failed to run command "{0}"'.format(' '.join(cmd)))
+        raise ExecutionError(err)
+
+    return output.splitlines()
+
+
+def merge_base(commit_a, commit_b):
+    cmd = ['git', 'merge-base', commit_a, commit_b]
     rc, output = run_command(cmd)
     if rc != 0:
         err = ('Failed to run command "{0}"'.format(' '.join(cmd)))
@@ -36,6 +83,111 @@ def rev_parse(refname):
     return output.strip()
 
 
+def get_changed_paths(old_commit, new_commit):
+    """
+    Return the paths of the files that differ between old_commit and
+    new_commit, listing both the old and new path of renamed files.
+    """
+    cmd = ['git', 'diff-tree', '-r', '--name-only', '--no-renames',
+           old_commit, new_commit]
+    rc, output = run_command(cmd)
+    if rc != 0:
+        err = ('Failed to run command "{0}"'.format(' '.join(cmd)))
+        raise ExecutionError(err)
+
+    return output.splitlines()
+
+
+def _memoized(function):
+    """
+    Decorator for a function without arguments whose value is computed once
+    per process (unless it raises an exception).
+    """
+    def wrapper():
+        if function not in _memoized_values:
+            _memoized_values[function] = function()
+        return _memoized_values[function]
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+
+def reset():
+    """
+    Forget memoized values and stop the revision resolver, e.g. after
+    changing directory to another repository.
+    """
+    global _revision_resolver
+    _memoized_values.clear()
+    if _revision_resolver is not None:
+        _revision_resolver.close()
+        _revision_resolver = None
+
+
+def _get_revision_resolver():
+    """Return the shared _RevisionResolver, or None if it's unavailable."""
+    global _revision_resolver
+    if not GIT_BATCH_ENABLED:
+        return None
+    if _revision_resolver is None:
+        try:
+            _revision_resolver = _RevisionResolver()
+        except OSError:
+            return None
+    return _revision_resolver
+
+
+class _RevisionResolver(object):
+    def __init__(self):
+        self._process = Popen(['git', 'cat-file', '--batch-check'],
+                              stdin=PIPE, stdout=PIPE,
+                              stderr=open(os.devnull, 'w'))
+        atexit.register(self.close)
+
+    def resolve(self, revision):
+        """
+        Return the object name of revision (anything "git rev-parse"
+        accepts as a revision), or None if there is no such object.
+        """
+        if not revision or '\n' in revision or self._process is None:
+            return None
+        try:
+            self._process.stdin.write(revision + '\n')
+            self._process.stdin.flush()
+            line = self._process.stdout.readline()
+        except IOError:
+            line = ''
+        # The output is "<input> missing" for unknown revisions.
+        match = BATCH_CHECK_RE.match(line.rstrip('\n'))
+        return match.group('name') if match else None
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
+
+
+@_memoized
+def _get_config():
+    """Return a dict with the value of each git configuration variable."""
+    rc, output = run_command(['git', 'config', '--list', '-z'])
+    config = {}
+    if rc == 0:
+        for entry in output.split('\0'):
+            key, _, value = entry.partition('\n')
+            if key:
+                # Like "git config --get", use the last value.
+                config[key] = value
+    return config
+
+
+def get_config(key):
+    """Return the value of the git configuration variable key, or None."""
+    return _get_config().get(key)
+
+
+@_memoized
 def get_git_client_version():
     cmd = ['git', '--version']
     rc, output = run_command(cmd)
@@ -52,6 +204,7 @@ def get_git_client_version():
     return version
 
 
+@_memoized
 def get_repo_branch_name():
     cmd = ['git', 'rev-parse', '--abbrev-ref', 'HEAD']
     rc, branch = run_command(cmd)
@@ -61,20 +214,13 @@ def get_repo_branch_name():
     return branch.strip()
 
 
+@_memoized
 def get_repo_name():
     repo = None
-    url = None
-
-    cmd = ['git', 'config', '--get', 'remote.origin.pushurl']
-    rc, output = run_command(cmd)
-    if rc == 0:
-        url = output.strip()
+    url = get_config('remote.origin.pushurl')
 
     if url is None:
-        cmd = ['git', 'config', '--get', 'remote.origin.url']
-        rc, output = run_command(cmd)
-        if rc == 0:
-            url = output.strip()
+        url = get_config('remote.origin.url')
 
     if url is not None:
         match = re.search(r'^(ssh://|).+@[^(/|:)]+(/|:)(?P<repo>.+)$', url)
@@ -85,6 +231,7 @@ def get_repo_name():
     return repo
 
 
+@_memoized
 def get_repo_top_level():
     cmd = ['git', 'rev-parse', '--show-toplevel']
     rc, toplevel = run_command(cmd)
@@ -1,25 +1,49 @@
 import os
 from os.path import dirname, join, realpath
-from common import error, run_command, ping_in_millisec
+from common import error, run_command
+from svnbindings import disable_backend, get_backend
+from svnbindings import SessionError, SvnQueryError, UnsupportedCommand
+from svncache import cached_command_output
+from svntransport import TransportSelector
 
 REMOTESVN = realpath(join(dirname(__file__), '..', '..', 'bin', 'remotesvn'))
 
 REMOTESVN_ENABLED = False
+# Run supported read-only queries in-process with the Subversion Python
+# bindings (if installed) instead of starting an svn process per query.
+SVN_BINDINGS_ENABLED = True
 SVN_AUTH = None
 
-PING_HOST = "svn.arrisi.com"
-PING_THRESHOLD_MILLISEC = 40
+# Subcommands to run with remotesvn when it's enabled. remotesvn only
+# supports diff (besides merge and commit, which the tools don't run).
+REMOTESVN_SUBCOMMANDS = ['diff']
 
 
 def run_svn_command(svn_command, svn_auth=None):
     global REMOTESVN_ENABLED
     global SVN_AUTH
-    if REMOTESVN_ENABLED and svn_command[1] == 'diff':
+    if REMOTESVN_ENABLED and svn_command[1] in REMOTESVN_SUBCOMMANDS:
         svn_command[0] = REMOTESVN
     if svn_auth is None:
         insert_svn_authentication(svn_command, SVN_AUTH, 2)
     else:
         insert_svn_authentication(svn_command, svn_auth, 2)
+    return cached_command_output(svn_command, _run_svn_command)
+
+
+def _run_svn_command(svn_command):
+    backend = get_backend() if SVN_BINDINGS_ENABLED else None
+    if backend is not None and svn_command[0] == 'svn':
+        try:
+            return backend.run(svn_command)
+        except UnsupportedCommand:
+            pass
+        except SessionError:
+            # svn may still get access, e.g. by prompting for a password or
+            # certificate; don't try in-process again.
+            disable_backend()
+        except SvnQueryError:
+            error('command "%s" failed' % ' '.join(svn_command))
     error_code, output = run_command(svn_command)
     if error_code != 0:
         error('command "%s" failed' % ' '.join(svn_command))
@@ -46,7 +70,8 @@ class SvnPathInfo:
 
     # Public properties are derived from these keys (e.g. Repository Root -->
     # self.repository_root). NOTE: some keys may be absent for some paths/URLs.
-    KEYS = ['Repository Root', 'Revision', 'URL', 'Node Kind']
+    KEYS = ['Repository Root', 'Revision', 'URL', 'Node Kind',
+            'Last Changed Rev']
     KEY_VALUE_SEPARATOR = ': '
 
     def __init__(self, path_or_url, svn_auth=None):
@@ -116,13 +141,14 @@ def verify_branch_argument(branch):
               branch)
 
 
-def should_enable_remotesvn_if_ping_is_slow():
-    ping_ms = ping_in_millisec(PING_HOST)
-    if ping_ms is not None and ping_ms > PING_THRESHOLD_MILLISEC:
+def should_enable_remotesvn(svn_auth=None):
+    auth_args = []
+    insert_svn_authentication(auth_args, svn_auth or SVN_AUTH, 0)
+    if TransportSelector().should_use_remotesvn(auth_args):
         print '''\
-Pinging %s is slow, risk is that running svn commands will take a long time. \
-Enabling remotesvn...
-''' % PING_HOST
+Running svn commands against the server is slow from this network, so \
+remotesvn will be used.
+'''
         return True
     else:
         return False
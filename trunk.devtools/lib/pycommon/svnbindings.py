@@ -0,0 +1,300 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+"""
+In-process backend for read-only svn queries using the Subversion Python
+bindings.
+
+Repository access sessions are kept open (per repository root, user and
+thread) for the lifetime of the process, so repeated queries against the
+same server avoid the process startup, authentication and connection setup
+that each "svn" subprocess pays for.
+
+Only the commands and options that the devtools parse are emulated: "svn
+info URL" (text output) and "svn log --xml URL". Anything else raises
+UnsupportedCommand so that the caller can fall back to running svn. If a
+session can't be opened at all (e.g. authentication or SSL certificate
+problems, which svn may be able to resolve by prompting), SessionError is
+raised and the caller should disable the backend with disable_backend().
+"""
+
+import threading
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    import svn.core
+    import svn.ra
+    BINDINGS_AVAILABLE = True
+except ImportError:
+    BINDINGS_AVAILABLE = False
+
+
+class UnsupportedCommand(Exception):
+    pass
+
+
+class SvnQueryError(Exception):
+    pass
+
+
+class SessionError(Exception):
+    pass
+
+
+NODE_KIND_NAMES = {}
+if BINDINGS_AVAILABLE:
+    NODE_KIND_NAMES = {
+        svn.core.svn_node_file: 'file',
+        svn.core.svn_node_dir: 'directory',
+    }
+
+SUPPORTED_SUBCOMMANDS = frozenset(['info', 'log'])
+
+LOG_FLAGS = frozenset(['--xml', '-v', '--verbose', '--stop-on-copy',
+                       '--non-interactive'])
+LOG_OPTIONS_WITH_VALUE = frozenset(['-r', '--revision', '-l', '--limit',
+                                    '--username', '--password'])
+INFO_FLAGS = frozenset(['--non-interactive'])
+INFO_OPTIONS_WITH_VALUE = frozenset(['-r', '--revision', '--username',
+                                     '--password'])
+
+
+def _parse_command(svn_command, flags, options_with_value):
+    """Return (set of flags, dict of options, list of targets)."""
+    present_flags = set()
+    options = {}
+    targets = []
+    args = iter(svn_command[2:])
+    for arg in args:
+        if arg in flags:
+            present_flags.add(arg)
+        elif arg in options_with_value:
+            value = next(args, None)
+            if value is None:
+                raise UnsupportedCommand
+            options[arg.lstrip('-')[0]] = value
+        elif arg[:2] in ['-r', '-l'] and len(arg) > 2 \
+                and arg[:2] in options_with_value:
+            options[arg[1]] = arg[2:]
+        elif arg.startswith('-'):
+            raise UnsupportedCommand
+        else:
+            targets.append(arg)
+    return present_flags, options, targets
+
+
+def _split_peg(target):
+    if '://' not in target:
+        # Working copy paths are not supported.
+        raise UnsupportedCommand
+    url, _, peg = target.rpartition('@')
+    if not url or '/' in peg:
+        return target, 'HEAD'
+    return url, peg
+
+
+class SvnBindingsBackend(object):
+    def __init__(self):
+        self._local = threading.local()
+        self._config = svn.core.svn_config_get_config(None)
+
+    def run(self, svn_command):
+        """
+        Return the output that svn_command (a list starting with the svn
+        executable) would print. Raises UnsupportedCommand if the command
+        cannot be handled in-process, SessionError if the repository cannot
+        be accessed and SvnQueryError if the query fails.
+        """
+        if len(svn_command) < 2:
+            raise UnsupportedCommand
+        subcommand = svn_command[1]
+        try:
+            if subcommand == 'info':
+                return self._info(svn_command)
+            elif subcommand == 'log':
+                return self._log(svn_command)
+        except svn.core.SubversionException as e:
+            raise SvnQueryError(str(e))
+        raise UnsupportedCommand
+
+    #
+    # Internals
+    #
+
+    def _info(self, svn_command):
+        _, options, targets = _parse_command(
+            svn_command, INFO_FLAGS, INFO_OPTIONS_WITH_VALUE)
+        if len(targets) != 1:
+            raise UnsupportedCommand
+        url, peg = _split_peg(targets[0])
+        session, root, relpath = self._get_session(url, options)
+        peg = self._resolve_revision(session, peg)
+        revision = self._resolve_revision(session, options.get('r', peg))
+        relpath = self._trace_path(session, relpath, peg, revision)
+        dirent = svn.ra.stat(session, relpath, revision)
+        if dirent is None:
+            raise SvnQueryError('%s does not exist in revision %d'
+                                % (url, revision))
+        full_url = '/'.join(
+            [root] + ([svn.core.svn_path_uri_encode(relpath)]
+                      if relpath else []))
+        name = (relpath or root).rpartition('/')[2]
+        lines = [
+            'Path: %s' % name,
+            'URL: %s' % full_url,
+            'Relative URL: ^/%s' % svn.core.svn_path_uri_encode(relpath),
+            'Repository Root: %s' % root,
+            'Repository UUID: %s' % svn.ra.get_uuid2(session),
+            'Revision: %d' % revision,
+            'Node Kind: %s' % NODE_KIND_NAMES.get(dirent.kind, 'none'),
+            'Last Changed Author: %s' % dirent.last_author,
+            'Last Changed Rev: %d' % dirent.created_rev,
+            'Last Changed Date: %s' % svn.core.svn_time_to_human_cstring(
+                dirent.time),
+        ]
+        return '\n'.join(lines) + '\n\n'
+
+    def _log(self, svn_command):
+        flags, options, targets = _parse_command(
+            svn_command, LOG_FLAGS, LOG_OPTIONS_WITH_VALUE)
+        if '--xml' not in flags or len(targets) != 1:
+            raise UnsupportedCommand
+        url, peg = _split_peg(targets[0])
+        session, _, relpath = self._get_session(url, options)
+        peg = self._resolve_revision(session, peg)
+        start, _, end = options.get('r', '%d:1' % peg).partition(':')
+        start = self._resolve_revision(session, start)
+        end = self._resolve_revision(session, end or start)
+        limit = int(options.get('l', 0))
+        relpath = self._trace_path(session, relpath, peg, max(start, end))
+        verbose = '-v' in flags or '--verbose' in flags
+
+        entries = []
+
+        def receiver(log_entry, pool):
+            entries.append(self._format_log_entry(log_entry, verbose))
+
+        svn.ra.get_log2(session, [relpath], start, end, limit, verbose,
+                        '--stop-on-copy' in flags, False,
+                        ['svn:author', 'svn:date', 'svn:log'], receiver)
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<log>\n%s</log>\n'
+                % ''.join(entries))
+
+    def _format_log_entry(self, log_entry, verbose):
+        revprops = log_entry.revprops or {}
+        parts = ['<logentry\n   revision="%d">\n' % log_entry.revision]
+        if 'svn:author' in revprops:
+            parts.append('<author>%s</author>\n'
+                         % escape(revprops['svn:author']))
+        if 'svn:date' in revprops:
+            parts.append('<date>%s</date>\n' % escape(revprops['svn:date']))
+        if verbose and log_entry.changed_paths2:
+            parts.append('<paths>\n')
+            for path in sorted(log_entry.changed_paths2):
+                changed_path = log_entry.changed_paths2[path]
+                attributes = ['kind=%s' % quoteattr(
+                    NODE_KIND_NAMES.get(changed_path.node_kind, ''))]
+                attributes.append('action=%s' % quoteattr(changed_path.action))
+                if changed_path.copyfrom_path:
+                    attributes.append('copyfrom-path=%s' % quoteattr(
+                        changed_path.copyfrom_path))
+                    attributes.append(
+                        'copyfrom-rev="%d"' % changed_path.copyfrom_rev)
+                parts.append('<path\n   %s>%s</path>\n'
+                             % ('\n   '.join(attributes), escape(path)))
+            parts.append('</paths>\n')
+        if 'svn:log' in revprops:
+            parts.append('<msg>%s</msg>\n' % escape(revprops['svn:log']))
+        parts.append('</logentry>\n')
+        return ''.join(parts)
+
+    def _get_session(self, url, options):
+        """Return (session, repository root URL, path relative to root)."""
+        url = svn.core.svn_uri_canonicalize(url)
+        username = options.get('u')
+        password = options.get('p')
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        for (root, session_username), session in sessions.items():
+            if (session_username == username
+                    and (url == root or url.startswith(root + '/'))):
+                break
+        else:
+            try:
+                session = svn.ra.open2(url, self._create_callbacks(
+                    username, password), self._config)
+                root = svn.ra.get_repos_root2(session)
+                svn.ra.reparent(session, root)
+            except svn.core.SubversionException as e:
+                raise SessionError(str(e))
+            sessions[(root, username)] = session
+        relpath = svn.core.svn_path_uri_decode(url[len(root):].lstrip('/'))
+        return session, root, relpath
+
+    def _create_callbacks(self, username, password):
+        providers = [
+            svn.core.svn_auth_get_simple_provider(),
+            svn.core.svn_auth_get_username_provider(),
+            svn.core.svn_auth_get_ssl_server_trust_file_provider(),
+        ]
+        auth_baton = svn.core.svn_auth_open(providers)
+        if username is not None:
+            svn.core.svn_auth_set_parameter(
+                auth_baton, svn.core.SVN_AUTH_PARAM_DEFAULT_USERNAME,
+                username)
+        if password is not None:
+            svn.core.svn_auth_set_parameter(
+                auth_baton, svn.core.SVN_AUTH_PARAM_DEFAULT_PASSWORD,
+                password)
+        callbacks = svn.ra.Callbacks()
+        callbacks.auth_baton = auth_baton
+        return callbacks
+
+    def _resolve_revision(self, session, revision):
+        if isinstance(revision, int):
+            return revision
+        if revision.upper() == 'HEAD':
+            return svn.ra.get_latest_revnum(session)
+        if revision.isdigit():
+            return int(revision)
+        raise UnsupportedCommand
+
+    def _trace_path(self, session, relpath, peg, revision):
+        """Return the path that relpath@peg had in revision."""
+        if revision == peg:
+            return relpath
+        locations = svn.ra.get_locations(session, relpath, peg, [revision])
+        if revision not in locations:
+            raise SvnQueryError('%s@%d does not exist in revision %d'
+                                % (relpath, peg, revision))
+        return locations[revision].lstrip('/')
+
+
+_backend = None
+_backend_disabled = False
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Return the shared SvnBindingsBackend, or None if it's unavailable or
+    has been disabled.
+    """
+    global _backend
+    if not BINDINGS_AVAILABLE or _backend_disabled:
+        return None
+    with _backend_lock:
+        if _backend is None:
+            _backend = SvnBindingsBackend()
+        return _backend
+
+
+def disable_backend():
+    """Make get_backend return None for the rest of the process."""
+    global _backend_disabled
+    _backend_disabled = True
@@ -0,0 +1,239 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+"""
+On-disk cache of output from svn commands whose result cannot change.
+
+A command is only cached if all its targets are URLs pegged to numeric
+revisions and all its operative revisions (-r/-c) are numeric. Commands on
+working copy paths or involving HEAD, BASE, dates etc. always run svn.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from os.path import dirname, expanduser, isdir
+from time import time
+
+CACHE_FILE = expanduser('~/.cache/devtools/svn-cache.sqlite')
+MAX_CACHE_SIZE = 256 * 1024 * 1024  # Bytes of cached output
+# When evicting, remove least recently used entries until the size is below
+# this fraction of MAX_CACHE_SIZE.
+EVICTION_TARGET_RATIO = 0.8
+
+SVN_CACHE_ENABLED = True
+
+CACHEABLE_SUBCOMMANDS = frozenset([
+    'annotate', 'ann', 'blame', 'praise',
+    'cat',
+    'diff', 'di',
+    'info',
+    'list', 'ls',
+    'log',
+    'propget', 'pget', 'pg',
+    'proplist', 'plist', 'pl',
+])
+
+# Options that take a value, as separate argument or (for short options)
+# directly appended.
+OPTIONS_WITH_VALUE = frozenset([
+    '-r', '--revision', '-c', '--change', '-l', '--limit', '--depth',
+    '-x', '--extensions', '--username', '--password', '--config-dir',
+    '--config-option', '--diff-cmd', '--search', '--search-and',
+    '--with-revprop', '--encoding', '--targets',
+])
+# Subcommands whose first non-option argument is a property name.
+PROPERTY_SUBCOMMANDS = frozenset(['propget', 'pget', 'pg'])
+REVISION_OPTIONS = frozenset(['-r', '--revision', '-c', '--change'])
+AUTH_OPTIONS = frozenset(['--username', '--password'])
+
+NUMERIC_REVISION_RANGE_RE = r'^-?\d+(:\d+)?$'
+# file:// repositories are left out since they are fast to access anyway and
+# may be recreated with different content (e.g. in tests).
+PEGGED_URL_RE = r'^(https?|svn(\+\w+)?)://.*@\d+$'
+
+_svn_cache = None
+_svn_cache_lock = threading.Lock()
+
+
+def get_cache_key(svn_command):
+    """
+    Return a cache key for svn_command (a list starting with the svn
+    executable), or None if the output of the command may change over time.
+    Authentication options are not part of the key.
+    """
+    if len(svn_command) < 2 or svn_command[1] not in CACHEABLE_SUBCOMMANDS:
+        return None
+    key = [svn_command[1]]
+    has_target = False
+    expects_property_name = svn_command[1] in PROPERTY_SUBCOMMANDS
+    args = iter(svn_command[2:])
+    for arg in args:
+        if arg in OPTIONS_WITH_VALUE:
+            value = next(args, None)
+            if value is None:
+                return None
+            if arg in AUTH_OPTIONS:
+                continue
+            if (arg in REVISION_OPTIONS
+                    and not re.match(NUMERIC_REVISION_RANGE_RE, value)):
+                return None
+            key += [arg, value]
+        elif arg[:2] in ['-r', '-c'] and len(arg) > 2:
+            if not re.match(NUMERIC_REVISION_RANGE_RE, arg[2:]):
+                return None
+            key.append(arg)
+        elif arg.startswith('-'):
+            key.append(arg)
+        elif expects_property_name:
+            expects_property_name = False
+            key.append(arg)
+        elif re.match(PEGGED_URL_RE, arg):
+            has_target = True
+            key.append(arg)
+        else:
+            # Working copy path, unpegged URL or unknown option value.
+            return None
+    if not has_target:
+        return None
+    return '\0'.join(key)
+
+
+def get_svn_cache():
+    """Return the shared SvnCache, or None if caching is disabled."""
+    global _svn_cache
+    if not SVN_CACHE_ENABLED:
+        return None
+    with _svn_cache_lock:
+        if _svn_cache is None:
+            _svn_cache = SvnCache(CACHE_FILE)
+        return _svn_cache
+
+
+def cached_command_output(svn_command, run_function):
+    """
+    Return run_function(svn_command), which should return the output of the
+    command, or the cached output of an earlier identical command if the
+    output cannot have changed since.
+    """
+    key = get_cache_key(svn_command)
+    cache = get_svn_cache() if key is not None else None
+    if cache is None:
+        return run_function(svn_command)
+    output = cache.get(key)
+    if output is None:
+        output = run_function(svn_command)
+        cache.put(key, output)
+    return output
+
+
+class SvnCache(object):
+    """
+    Size-limited key/value store backed by sqlite. Errors accessing the
+    database are ignored since the cache is only an optimization.
+    """
+
+    def __init__(self, path, max_size=MAX_CACHE_SIZE):
+        self._path = path
+        self._max_size = max_size
+        self._local = threading.local()
+        # Estimate of the cache size, or None if not yet known.
+        self._size = None
+
+    def get(self, key):
+        connection = self._connect()
+        if connection is None:
+            return None
+        try:
+            with connection:
+                row = connection.execute(
+                    'SELECT output FROM entries WHERE key = ?',
+                    (key,)).fetchone()
+                if row is None:
+                    return None
+                connection.execute(
+                    'UPDATE entries SET last_used = ? WHERE key = ?',
+                    (time(), key))
+            return str(row[0])
+        except sqlite3.Error:
+            return None
+
+    def put(self, key, output):
+        connection = self._connect()
+        if connection is None:
+            return
+        try:
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO entries'
+                    ' (key, output, size, last_used) VALUES (?, ?, ?, ?)',
+                    (key, sqlite3.Binary(output), len(output), time()))
+                self._evict(connection, len(output))
+        except sqlite3.Error:
+            pass
+
+    def get_size(self):
+        connection = self._connect()
+        if connection is None:
+            return 0
+        try:
+            return connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    #
+    # Internals
+    #
+
+    def _connect(self):
+        # sqlite connections may not be shared between threads.
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            return connection
+        try:
+            if not isdir(dirname(self._path)):
+                os.makedirs(dirname(self._path))
+            connection = sqlite3.connect(self._path, timeout=10)
+            connection.text_factory = str
+            with connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS entries ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' output BLOB NOT NULL,'
+                    ' size INTEGER NOT NULL,'
+                    ' last_used REAL NOT NULL)')
+                connection.execute(
+                    'CREATE INDEX IF NOT EXISTS entries_last_used'
+                    ' ON entries (last_used)')
+        except (OSError, sqlite3.Error):
+            return None
+        self._local.connection = connection
+        return connection
+
+    def _evict(self, connection, added_size):
+        # Only sum up the sizes (which requires a full table scan) when the
+        # estimate says that the cache may be full.
+        if self._size is not None:
+            self._size += added_size
+            if self._size <= self._max_size:
+                return
+        size = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        self._size = size
+        if size <= self._max_size:
+            return
+        target_size = self._max_size * EVICTION_TARGET_RATIO
+        rows = connection.execute(
+            'SELECT key, size FROM entries ORDER BY last_used').fetchall()
+        for key, entry_size in rows:
+            if size <= target_size:
+                break
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            size -= entry_size
+        self._size = size
@@ -0,0 +1,190 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+"""
+Decides whether heavy svn commands should be run with remotesvn, based on
+measured svn latency and throughput.
+
+The decision is cached per network (the local address used to reach the
+svn server) for DECISION_TTL seconds. All measurements are appended to
+TIMINGS_FILE as JSON lines so that the thresholds can be tuned.
+"""
+
+import json
+import os
+import socket
+from os.path import dirname, expanduser, isdir
+from subprocess import Popen, PIPE
+from time import time
+
+DECISIONS_FILE = expanduser('~/.cache/devtools/svn-transport.json')
+TIMINGS_FILE = expanduser('~/.cache/devtools/svn-transport-timings.log')
+DECISION_TTL = 24 * 60 * 60  # Seconds
+# How long to remember that the server could not be measured (e.g. when off
+# the VPN) before probing again.
+FAILED_PROBE_TTL = 10 * 60  # Seconds
+
+SVN_HOST = 'svn.arrisi.com'
+# A file that is fetched with svn cat to measure throughput: the prebuilt
+# uncrustify binary in devtools, which is large enough for the transfer time
+# to dominate (its last change was r394313). It's pegged so that its content
+# can't change, and the peg keeps working even if the file is later removed.
+# PROBE_SIZE is its size as reported by "svn list -v PROBE_URL".
+PROBE_URL = ('http://%s/dev/devtools/trunk/3pp/uncrustify/'
+             'uncrustify_prebuilt@583377' % SVN_HOST)
+PROBE_SIZE = 588036  # Bytes
+
+# svn info makes a few round trips to the server, so this corresponds to a
+# ping time of roughly 40 ms.
+LATENCY_THRESHOLD_MILLISEC = 150
+THROUGHPUT_THRESHOLD_BYTES_PER_SEC = 1024 * 1024
+
+
+def get_network_id(host=SVN_HOST):
+    """
+    Return an identifier of the network used to reach host, or None if it's
+    unreachable.
+    """
+    try:
+        address = socket.getaddrinfo(host, 80, 0, socket.SOCK_DGRAM)[0][4]
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # Connecting a UDP socket sends nothing but selects the route.
+            sock.connect(address)
+            local_address = sock.getsockname()[0]
+        finally:
+            sock.close()
+    except (socket.error, IndexError):
+        return None
+    # Addresses in the same /24 are considered to be the same network.
+    return local_address.rpartition('.')[0]
+
+
+def _time_command(command):
+    """Return (seconds, output size), or None if the command failed."""
+    start = time()
+    process = Popen(command, stdout=PIPE, stderr=open(os.devnull, 'w'))
+    output, _ = process.communicate()
+    if process.returncode != 0:
+        return None
+    return time() - start, len(output)
+
+
+def measure_svn_timings(extra_args=None, probe_url=PROBE_URL,
+                        probe_size=PROBE_SIZE):
+    """
+    Measure svn latency and throughput against probe_url, a file of
+    probe_size bytes. Returns a dict with the measurements, or None if svn
+    could not reach the server.
+    """
+    extra_args = list(extra_args or [])
+    startup = _time_command(['svn', '--version', '--quiet'])
+    info = _time_command(['svn', 'info', '--xml'] + extra_args + [probe_url])
+    cat = _time_command(['svn', 'cat'] + extra_args + [probe_url])
+    if (startup is None or info is None or cat is None
+            or cat[1] != probe_size):
+        return None
+    startup_time = startup[0]
+    latency = max(info[0] - startup_time, 0)
+    # svn info of the same URL makes the same connection and round trips as
+    # svn cat without transferring the file, so the difference is the time
+    # spent transferring it.
+    transfer_time = max(cat[0] - info[0], 0.001)
+    return {
+        'startup_millisec': int(startup_time * 1000),
+        'latency_millisec': int(latency * 1000),
+        'cat_bytes': cat[1],
+        'cat_millisec': int(cat[0] * 1000),
+        'throughput_bytes_per_sec': int(cat[1] / transfer_time),
+    }
+
+
+def is_remotesvn_faster(timings):
+    return (timings['latency_millisec'] > LATENCY_THRESHOLD_MILLISEC
+            or (timings['throughput_bytes_per_sec']
+                < THROUGHPUT_THRESHOLD_BYTES_PER_SEC))
+
+
+class TransportSelector(object):
+    def __init__(self, decisions_file=DECISIONS_FILE,
+                 timings_file=TIMINGS_FILE, ttl=DECISION_TTL,
+                 measure=measure_svn_timings, get_network=get_network_id,
+                 failed_probe_ttl=FAILED_PROBE_TTL):
+        self._decisions_file = decisions_file
+        self._timings_file = timings_file
+        self._ttl = ttl
+        self._failed_probe_ttl = failed_probe_ttl
+        self._measure = measure
+        self._get_network = get_network
+
+    def should_use_remotesvn(self, extra_args=None):
+        """
+        Return True if remotesvn is expected to be faster than svn on the
+        current network, measuring it if there is no recent decision.
+        """
+        network = self._get_network()
+        if network is None:
+            return False
+        decisions = self._load_decisions()
+        decision = decisions.get(network)
+        if decision is not None:
+            ttl = (self._failed_probe_ttl if decision.get('probe_failed')
+                   else self._ttl)
+            if time() - decision['time'] < ttl:
+                return decision['use_remotesvn']
+
+        timings = self._measure(extra_args)
+        if timings is None:
+            # The server may just be down, so only remember this for a short
+            # while; it saves probing at every start when off the VPN.
+            decisions[network] = {'time': time(), 'use_remotesvn': False,
+                                  'probe_failed': True}
+            self._save_decisions(decisions)
+            return False
+        use_remotesvn = is_remotesvn_faster(timings)
+        decisions[network] = {'time': time(), 'use_remotesvn': use_remotesvn}
+        self._save_decisions(decisions)
+        self._record_timings(network, timings, use_remotesvn)
+        return use_remotesvn
+
+    #
+    # Internals
+    #
+
+    def _load_decisions(self):
+        try:
+            with open(self._decisions_file) as fp:
+                decisions = json.load(fp)
+            if isinstance(decisions, dict):
+                return decisions
+        except (IOError, ValueError):
+            pass
+        return {}
+
+    def _save_decisions(self, decisions):
+        tmp_file = self._decisions_file + '.tmp'
+        try:
+            self._make_parent_dir(self._decisions_file)
+            with open(tmp_file, 'w') as fp:
+                json.dump(decisions, fp, indent=4, sort_keys=True)
+            os.rename(tmp_file, self._decisions_file)
+        except (IOError, OSError):
+            pass
+
+    def _record_timings(self, network, timings, use_remotesvn):
+        entry = dict(timings, time=int(time()), network=network,
+                     use_remotesvn=use_remotesvn)
+        try:
+            self._make_parent_dir(self._timings_file)
+            with open(self._timings_file, 'a') as fp:
+                fp.write(json.dumps(entry, sort_keys=True) + '\n')
+        except (IOError, OSError):
+            pass
+
+    def _make_parent_dir(self, path):
+        if not isdir(dirname(path)):
+            os.makedirs(dirname(path))
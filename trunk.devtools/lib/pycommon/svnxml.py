@@ -0,0 +1,145 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+"""
+Streaming parsing of XML output from svn commands.
+
+Elements are parsed incrementally from the svn process as it writes its
+output and discarded once the caller has seen them, so memory use does not
+grow with the size of the output (e.g. "svn ann --xml" of a huge file).
+When the caller stops iterating early, the svn process is killed instead of
+being waited for.
+"""
+
+import os
+import xml.etree.ElementTree as ElementTree
+from StringIO import StringIO
+from subprocess import Popen, PIPE
+
+import svn_common
+from common import error
+from svnbindings import get_backend, SUPPORTED_SUBCOMMANDS
+from svncache import get_cache_key, get_svn_cache
+
+# Output of a streamed command is only stored in the svn cache if it's at
+# most this large, so that neither recording it nor reading it back from the
+# cache holds a huge output in memory.
+MAX_RECORDED_SIZE = 4 * 1024 * 1024  # Bytes
+
+
+def iter_elements(source, tag):
+    """
+    Yield each tag element in the XML document read from the file-like
+    object source as soon as it has been parsed. Elements nested in a tag
+    element are part of that element and not yielded separately. Each
+    element is cleared after it has been processed, so it must not be used
+    after the next element has been requested.
+    """
+    # Open elements, innermost last.
+    stack = []
+    nesting = 0
+    for event, element in ElementTree.iterparse(source, ('start', 'end')):
+        if event == 'start':
+            stack.append(element)
+            if element.tag == tag:
+                nesting += 1
+            continue
+        stack.pop()
+        if element.tag != tag:
+            continue
+        nesting -= 1
+        if nesting == 0:
+            yield element
+            # Drop the element (and its processed siblings) from the tree.
+            if stack:
+                del stack[-1][:]
+            element.clear()
+
+
+def iter_svn_xml(svn_command, tag, svn_auth=None):
+    """
+    Run svn_command (which should use --xml) and yield its tag elements as
+    described for iter_elements. Output of cacheable commands is taken from
+    or (if fully read and at most MAX_RECORDED_SIZE bytes) stored in the svn
+    cache.
+    """
+    if (svn_common.SVN_BINDINGS_ENABLED
+            and svn_command[1] in SUPPORTED_SUBCOMMANDS
+            and get_backend() is not None):
+        # Runs in-process anyway, so there is nothing to stream.
+        # run_svn_command adds the authentication and uses the cache itself.
+        output = svn_common.run_svn_command(list(svn_command), svn_auth)
+        for element in iter_elements(StringIO(output), tag):
+            yield element
+        return
+
+    if svn_auth is None:
+        svn_auth = svn_common.SVN_AUTH
+    svn_command = list(svn_command)
+    svn_common.insert_svn_authentication(svn_command, svn_auth, 2)
+
+    key = get_cache_key(svn_command)
+    cache = get_svn_cache() if key is not None else None
+    output = cache.get(key) if cache is not None else None
+    if output is not None:
+        for element in iter_elements(StringIO(output), tag):
+            yield element
+        return
+
+    process = Popen(svn_command, stdout=PIPE, stderr=open(os.devnull, 'w'))
+    source = _RecordingReader(process.stdout,
+                              MAX_RECORDED_SIZE if cache is not None else 0)
+    completed = False
+    try:
+        try:
+            for element in iter_elements(source, tag):
+                yield element
+            completed = True
+        except ElementTree.ParseError:
+            pass
+    finally:
+        if not completed:
+            # The caller stopped early or the output was broken.
+            if process.poll() is None:
+                process.kill()
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0 or not completed:
+        error('command "%s" failed' % ' '.join(svn_command))
+    data = source.get_data()
+    if cache is not None and data is not None:
+        cache.put(key, data)
+
+
+class _RecordingReader(object):
+    """
+    File-like wrapper that remembers the data read as long as it's at most
+    max_size bytes in total.
+    """
+
+    def __init__(self, fp, max_size):
+        self._fp = fp
+        self._max_size = max_size
+        self._size = 0
+        self._chunks = [] if max_size > 0 else None
+
+    def read(self, size=-1):
+        data = self._fp.read(size)
+        if self._chunks is not None:
+            self._size += len(data)
+            if self._size > self._max_size:
+                # Too large to keep; stop recording.
+                self._chunks = None
+            else:
+                self._chunks.append(data)
+        return data
+
+    def get_data(self):
+        """Return all data read, or None if it wasn't recorded."""
+        if self._chunks is None:
+            return None
+        return ''.join(self._chunks)
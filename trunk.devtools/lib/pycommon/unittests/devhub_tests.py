@@ -0,0 +1,99 @@
+#!/usr/bin/env python2
+
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import devhub
+from common import ExecutionError
+
+
+class ParentCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._path = join(self._tmpdir, 'cache', 'devhub-parents.json')
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_find_and_store(self):
+        cache = devhub.ParentCache(self._path)
+        self.assertEqual(cache.find('foo/bar', 'feature'), None)
+        cache.store('foo/bar', 'feature', 'master', 'abc')
+        cache.store('foo/bar', 'other', None, None)
+        parent, merge_base, _ = \
+            devhub.ParentCache(self._path).find('foo/bar', 'feature')
+        self.assertEqual((parent, merge_base), ('master', 'abc'))
+        self.assertEqual(cache.find('foo/bar', 'other')[:2], (None, None))
+        self.assertEqual(cache.find('foo/baz', 'feature'), None)
+
+
+class GetBranchParentTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._saved = (devhub.PARENT_CACHE_FILE, devhub.PARENT_CACHE_TTL,
+                       devhub._query_branch_parent, devhub._get_merge_base)
+        devhub.PARENT_CACHE_FILE = join(self._tmpdir, 'devhub-parents.json')
+        devhub._query_branch_parent = self._query_branch_parent
+        devhub._get_merge_base = lambda branch_name, parent: self.merge_base
+        self.parent = 'master'
+        self.merge_base = 'abc'
+        self.queries = []
+
+    def tearDown(self):
+        (devhub.PARENT_CACHE_FILE, devhub.PARENT_CACHE_TTL,
+         devhub._query_branch_parent, devhub._get_merge_base) = self._saved
+        shutil.rmtree(self._tmpdir)
+
+    def _query_branch_parent(self, repo_name, branch_name, verbose=False):
+        self.queries.append(branch_name)
+        if self.parent is ExecutionError:
+            raise ExecutionError('devhub is down')
+        return self.parent
+
+    def test_parent_is_cached(self):
+        self.assertEqual('master', devhub.get_branch_parent('r', 'b'))
+        self.parent = 'other'
+        self.assertEqual('master', devhub.get_branch_parent('r', 'b'))
+        self.assertEqual(['b'], self.queries)
+
+    def test_changed_merge_base_invalidates_entry(self):
+        devhub.get_branch_parent('r', 'b')
+        self.parent = 'other'
+        self.merge_base = 'def'
+        self.assertEqual('other', devhub.get_branch_parent('r', 'b'))
+        self.assertEqual(['b', 'b'], self.queries)
+
+    def test_stale_entry_is_used_while_refreshed(self):
+        devhub.get_branch_parent('r', 'b')
+        devhub.PARENT_CACHE_TTL = -1
+        self.parent = ExecutionError
+        self.assertEqual('master', devhub.get_branch_parent('r', 'b'))
+        self.parent = 'other'
+        self.assertEqual('master', devhub.get_branch_parent('r', 'b'))
+        for thread in devhub.threading.enumerate():
+            if thread is not devhub.threading.current_thread():
+                self.assertTrue(thread.daemon)
+                thread.join()
+        devhub.PARENT_CACHE_TTL = self._saved[1]
+        self.assertEqual('other', devhub.get_branch_parent('r', 'b'))
+
+    def test_errors_are_not_cached(self):
+        self.parent = ExecutionError
+        self.assertRaises(ExecutionError, devhub.get_branch_parent, 'r', 'b')
+        self.parent = None
+        self.assertEqual(None, devhub.get_branch_parent('r', 'b'))
+        self.assertEqual(None, devhub.get_branch_parent('r', 'b'))
+        self.assertEqual(['b', 'b'], self.queries)
+
+    def test_prefetch(self):
+        results = list(devhub.prefetch_branch_parents('r', ['a', 'b', 'c']))
+        self.assertEqual([('a', 'master', None), ('b', 'master', None),
+                          ('c', 'master', None)], results)
+        devhub.get_branch_parent('r', 'c')
+        self.assertEqual(['a', 'b', 'c'], sorted(self.queries))
+
+
+if __name__ == '__main__':
+    unittest.main()
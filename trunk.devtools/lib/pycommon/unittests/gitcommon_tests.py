@@ -0,0 +1,69 @@
+#!/usr/bin/env python2
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import gitcommon
+from common import ExecutionError
+
+
+def _git(*args):
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(('git', '-c', 'user.name=Test',
+                               '-c', 'user.email=test@example.com') + args,
+                              stdout=devnull, stderr=devnull)
+
+
+class GitRepoTests(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmpdir = tempfile.mkdtemp()
+        os.chdir(self._tmpdir)
+        _git('init', '-q')
+        _git('config', 'remote.origin.url', 'git@git.example.com:foo/bar')
+        with open('a', 'w') as fp:
+            fp.write('a\n')
+        _git('add', 'a')
+        _git('commit', '-q', '-m', 'a')
+        _git('mv', 'a', 'b')
+        _git('commit', '-q', '-m', 'b')
+        gitcommon.reset()
+
+    def tearDown(self):
+        gitcommon.reset()
+        gitcommon.GIT_BATCH_ENABLED = True
+        os.chdir(self._cwd)
+        shutil.rmtree(self._tmpdir)
+
+    def test_rev_parse(self):
+        revisions = ['HEAD', 'HEAD~1', 'HEAD^{tree}', 'HEAD:b']
+        resolved = [gitcommon.rev_parse(revision) for revision in revisions]
+        gitcommon.GIT_BATCH_ENABLED = False
+        gitcommon.reset()
+        self.assertEqual(resolved, [gitcommon.rev_parse(revision)
+                                    for revision in revisions])
+
+    def test_rev_parse_of_unknown_revision(self):
+        for revision in ['HEAD~2', 'origin/nonexistent', 'HEAD:a', '']:
+            self.assertRaises(ExecutionError, gitcommon.rev_parse, revision)
+        self.assertEqual(40, len(gitcommon.rev_parse('HEAD')))
+
+    def test_get_changed_paths(self):
+        self.assertEqual(['a', 'b'],
+                         gitcommon.get_changed_paths('HEAD~1', 'HEAD'))
+
+    def test_repo_metadata_is_memoized(self):
+        self.assertEqual('foo/bar', gitcommon.get_repo_name())
+        self.assertEqual(os.path.realpath(self._tmpdir),
+                         gitcommon.get_repo_top_level())
+        _git('config', 'remote.origin.url', 'git@git.example.com:foo/baz')
+        self.assertEqual('foo/bar', gitcommon.get_repo_name())
+        gitcommon.reset()
+        self.assertEqual('foo/baz', gitcommon.get_repo_name())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,10 @@
 
 import unittest
 
+import svn_common
+import svnbindings
 from svn_common import looks_like_branch_url, get_branch_root
+from svnbindings import SessionError
 
 
 class BasicTests(unittest.TestCase):
@@ -38,5 +41,40 @@ class BasicTests(unittest.TestCase):
                          'http://foo/bar/tags/baz')
 
 
+class FakeBackend(object):
+    def __init__(self):
+        self.commands = []
+
+    def run(self, svn_command):
+        self.commands.append(svn_command)
+        raise SessionError('certificate verification failed')
+
+
+class BindingsFallbackTests(unittest.TestCase):
+    def setUp(self):
+        self._saved = (svn_common.get_backend, svn_common.run_command,
+                       svn_common.SVN_BINDINGS_ENABLED,
+                       svnbindings._backend_disabled)
+        self._backend = FakeBackend()
+        svn_common.get_backend = self._get_backend
+        svn_common.run_command = lambda command: (0, 'output')
+        svn_common.SVN_BINDINGS_ENABLED = True
+
+    def tearDown(self):
+        (svn_common.get_backend, svn_common.run_command,
+         svn_common.SVN_BINDINGS_ENABLED,
+         svnbindings._backend_disabled) = self._saved
+
+    def _get_backend(self):
+        return None if svnbindings._backend_disabled else self._backend
+
+    def test_session_error_falls_back_to_svn(self):
+        command = ['svn', 'info', 'http://foo/bar']
+        self.assertEqual(svn_common._run_svn_command(command), 'output')
+        self.assertEqual(svn_common._run_svn_command(command), 'output')
+        self.assertEqual(self._backend.commands, [command])
+        self.assertEqual(svnbindings.get_backend(), None)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
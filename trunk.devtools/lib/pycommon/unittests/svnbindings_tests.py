@@ -0,0 +1,40 @@
+#!/usr/bin/env python2
+
+import unittest
+
+import svnbindings
+from svnbindings import LOG_FLAGS, LOG_OPTIONS_WITH_VALUE
+from svnbindings import UnsupportedCommand, _parse_command, _split_peg
+
+
+class CommandParsingTests(unittest.TestCase):
+    def test_parse_log_command(self):
+        flags, options, targets = _parse_command(
+            ['svn', 'log', '--username', 'u', '--xml', '-v', '-l', '1',
+             '-r1:17', 'http://foo/bar@17'],
+            LOG_FLAGS, LOG_OPTIONS_WITH_VALUE)
+        self.assertEqual(flags, set(['--xml', '-v']))
+        self.assertEqual(options, {'u': 'u', 'l': '1', 'r': '1:17'})
+        self.assertEqual(targets, ['http://foo/bar@17'])
+
+    def test_unknown_option_is_unsupported(self):
+        self.assertRaises(UnsupportedCommand, _parse_command,
+                          ['svn', 'log', '--xml', '--diff', 'http://foo'],
+                          LOG_FLAGS, LOG_OPTIONS_WITH_VALUE)
+
+    def test_split_peg(self):
+        self.assertEqual(_split_peg('http://foo/bar@17'),
+                         ('http://foo/bar', '17'))
+        self.assertEqual(_split_peg('http://foo/bar'),
+                         ('http://foo/bar', 'HEAD'))
+        self.assertEqual(_split_peg('http://u@foo/bar'),
+                         ('http://u@foo/bar', 'HEAD'))
+        self.assertRaises(UnsupportedCommand, _split_peg, 'foo/bar@17')
+
+    def test_no_backend_without_bindings(self):
+        if not svnbindings.BINDINGS_AVAILABLE:
+            self.assertEqual(svnbindings.get_backend(), None)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python2
+
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from svncache import SvnCache, get_cache_key
+
+
+class CacheKeyTests(unittest.TestCase):
+    def test_pegged_commands_are_cacheable(self):
+        for command in [
+                ['svn', 'info', 'http://foo/bar/trunk@17'],
+                ['svn', 'log', '--xml', '-v', '-l', '1', '-r', '1:17',
+                 'http://foo/bar/trunk@17'],
+                ['svn', 'diff', '-c', '17', 'http://foo/bar/trunk@17'],
+                ['svn', 'diff', 'http://foo/a@1', 'http://foo/b@2'],
+                ['svn', 'propget', 'svn:mergeinfo', 'http://foo/bar@3'],
+                ['svn', 'ann', '--xml', '-r17', 'svn+ssh://foo/bar@17']]:
+            self.assertNotEqual(get_cache_key(command), None, command)
+
+    def test_mutable_commands_are_not_cacheable(self):
+        for command in [
+                ['svn', 'info', 'http://foo/bar/trunk'],
+                ['svn', 'info', 'http://foo/bar/trunk@HEAD'],
+                ['svn', 'info', 'foo/bar@17'],
+                ['svn', 'info', 'file:///repo/trunk@17'],
+                ['svn', 'info'],
+                ['svn', 'log', '-r', '1:HEAD', 'http://foo/bar/trunk@17'],
+                ['svn', 'log', '-rHEAD', 'http://foo/bar/trunk@17'],
+                ['svn', 'diff', 'http://foo/a@1', 'http://foo/b'],
+                ['svn', 'status', 'http://foo/bar/trunk@17'],
+                ['svn', 'propget', 'svn:mergeinfo', '.']]:
+            self.assertEqual(get_cache_key(command), None, command)
+
+    def test_authentication_is_not_part_of_key(self):
+        self.assertEqual(
+            get_cache_key(['svn', 'info', '--username', 'u', '--password',
+                           'p', 'http://foo/bar@17']),
+            get_cache_key(['svn', 'info', 'http://foo/bar@17']))
+
+
+class SvnCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._path = join(self._tmpdir, 'cache', 'svn-cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_get_and_put(self):
+        cache = SvnCache(self._path)
+        self.assertEqual(cache.get('key'), None)
+        cache.put('key', 'output\n\0')
+        self.assertEqual(cache.get('key'), 'output\n\0')
+        self.assertEqual(SvnCache(self._path).get('key'), 'output\n\0')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SvnCache(self._path, max_size=30)
+        for key in ['a', 'b', 'c']:
+            cache.put(key, key * 10)
+        cache.get('a')
+        cache.put('d', 'd' * 10)
+        self.assertTrue(cache.get_size() <= 30)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 'a' * 10)
+        self.assertEqual(cache.get('d'), 'd' * 10)
+
+    def test_unusable_cache_file_is_ignored(self):
+        cache = SvnCache(join(self._tmpdir, 'no', 'such', 'dir', 'x'))
+        open(join(self._tmpdir, 'no'), 'w').close()
+        cache.put('key', 'output')
+        self.assertEqual(cache.get('key'), None)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
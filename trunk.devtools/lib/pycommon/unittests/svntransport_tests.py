@@ -0,0 +1,117 @@
+#!/usr/bin/env python2
+
+import json
+import shutil
+import tempfile
+import unittest
+from os.path import exists, join
+
+import svntransport
+from svntransport import TransportSelector, is_remotesvn_faster
+
+FAST_TIMINGS = {'latency_millisec': 20,
+                'throughput_bytes_per_sec': 10 * 1024 * 1024}
+SLOW_TIMINGS = {'latency_millisec': 400,
+                'throughput_bytes_per_sec': 10 * 1024 * 1024}
+
+
+class TransportSelectorTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._decisions_file = join(self._tmpdir, 'cache', 'decisions.json')
+        self._timings_file = join(self._tmpdir, 'cache', 'timings.log')
+        self._measurements = []
+        self._network = '10.0.0'
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _create_selector(self, timings, ttl=60, failed_probe_ttl=10):
+        def measure(extra_args):
+            self._measurements.append(extra_args)
+            return timings
+        return TransportSelector(self._decisions_file, self._timings_file,
+                                 ttl, measure, lambda: self._network,
+                                 failed_probe_ttl)
+
+    def test_decision_from_timings(self):
+        self.assertFalse(is_remotesvn_faster(FAST_TIMINGS))
+        self.assertTrue(is_remotesvn_faster(SLOW_TIMINGS))
+        self.assertTrue(is_remotesvn_faster(
+            {'latency_millisec': 20, 'throughput_bytes_per_sec': 1000}))
+
+    def test_decision_is_cached_per_network(self):
+        self.assertTrue(
+            self._create_selector(SLOW_TIMINGS).should_use_remotesvn())
+        self.assertTrue(
+            self._create_selector(FAST_TIMINGS).should_use_remotesvn())
+        self.assertEqual(len(self._measurements), 1)
+
+        self._network = '192.168.1'
+        self.assertFalse(
+            self._create_selector(FAST_TIMINGS).should_use_remotesvn())
+        self.assertEqual(len(self._measurements), 2)
+
+    def test_expired_decision_is_remeasured(self):
+        self._create_selector(SLOW_TIMINGS, ttl=-1).should_use_remotesvn()
+        self.assertFalse(self._create_selector(
+            FAST_TIMINGS, ttl=-1).should_use_remotesvn())
+        self.assertEqual(len(self._measurements), 2)
+
+    def test_timings_are_recorded(self):
+        self._create_selector(SLOW_TIMINGS).should_use_remotesvn(['-x'])
+        self.assertEqual(self._measurements, [['-x']])
+        with open(self._timings_file) as fp:
+            entries = [json.loads(line) for line in fp]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['latency_millisec'], 400)
+        self.assertEqual(entries[0]['network'], '10.0.0')
+        self.assertTrue(entries[0]['use_remotesvn'])
+
+    def test_failed_measurement_is_cached_briefly(self):
+        self.assertFalse(self._create_selector(None).should_use_remotesvn())
+        self.assertFalse(
+            self._create_selector(SLOW_TIMINGS).should_use_remotesvn())
+        self.assertEqual(len(self._measurements), 1)
+        self.assertFalse(exists(self._timings_file))
+
+        self.assertTrue(self._create_selector(
+            SLOW_TIMINGS, failed_probe_ttl=-1).should_use_remotesvn())
+        self.assertEqual(len(self._measurements), 2)
+
+    def test_unreachable_network(self):
+        self._network = None
+        self.assertFalse(
+            self._create_selector(SLOW_TIMINGS).should_use_remotesvn())
+        self.assertEqual(self._measurements, [])
+
+
+class MeasureSvnTimingsTests(unittest.TestCase):
+    TIMES = {'--version': 0.25, 'info': 0.5, 'cat': 1.5}
+
+    def setUp(self):
+        self._saved = svntransport._time_command
+        svntransport._time_command = self._time_command
+        self._cat_size = 2 * 1024 * 1024
+
+    def tearDown(self):
+        svntransport._time_command = self._saved
+
+    def _time_command(self, command):
+        if command[1] == 'cat':
+            return self.TIMES['cat'], self._cat_size
+        return self.TIMES[command[1]], 100
+
+    def test_throughput_of_probe_file(self):
+        timings = svntransport.measure_svn_timings(
+            probe_url='http://svn/file@1', probe_size=self._cat_size)
+        self.assertEqual(timings['latency_millisec'], 250)
+        self.assertEqual(timings['throughput_bytes_per_sec'], self._cat_size)
+
+    def test_unexpected_probe_size(self):
+        self.assertEqual(None, svntransport.measure_svn_timings(
+            probe_url='http://svn/file@1', probe_size=self._cat_size + 1))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python2
+
+import unittest
+from StringIO import StringIO
+
+from common import ExecutionError
+from svnxml import _RecordingReader, iter_elements, iter_svn_xml
+
+BLAME_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<blame>
+<target path="foo.c">
+%s</target>
+</blame>
+'''
+
+LOG_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<log>
+<logentry revision="3">
+<author>a</author>
+<logentry revision="2">
+<author>b</author>
+</logentry>
+</logentry>
+<logentry revision="1">
+<author>c</author>
+</logentry>
+</log>
+'''
+
+
+def blame_xml(line_count):
+    return BLAME_XML % ''.join(
+        '<entry line-number="%d"><commit revision="%d">'
+        '<author>a</author></commit></entry>\n' % (i, i)
+        for i in range(1, line_count + 1))
+
+
+class CountingReader(object):
+    def __init__(self, data):
+        self._fp = StringIO(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._fp.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class IterElementsTests(unittest.TestCase):
+    def test_yields_all_elements(self):
+        revisions = [element.find('commit').get('revision')
+                     for element in iter_elements(StringIO(blame_xml(5)),
+                                                  'entry')]
+        self.assertEqual(revisions, ['1', '2', '3', '4', '5'])
+
+    def test_nested_elements_are_part_of_outer_element(self):
+        entries = []
+        for element in iter_elements(StringIO(LOG_XML), 'logentry'):
+            entries.append(
+                (element.get('revision'),
+                 [child.get('revision')
+                  for child in element.findall('logentry')]))
+        self.assertEqual(entries, [('3', ['2']), ('1', [])])
+
+    def test_stops_reading_when_iteration_stops(self):
+        data = blame_xml(100000)
+        reader = CountingReader(data)
+        for element in iter_elements(reader, 'entry'):
+            if element.get('line-number') == '10':
+                break
+        self.assertTrue(reader.bytes_read < len(data) / 10)
+
+    def test_processed_elements_are_cleared(self):
+        elements = []
+        for element in iter_elements(StringIO(blame_xml(100)), 'entry'):
+            self.assertEqual(len(element), 1)
+            elements.append(element)
+        self.assertEqual(len(elements), 100)
+        for element in elements:
+            self.assertEqual(len(element), 0)
+            self.assertEqual(element.get('line-number'), None)
+
+
+class IterSvnXmlTests(unittest.TestCase):
+    # Commands that are not svn are neither cached nor run in-process.
+
+    def test_yields_elements_of_command_output(self):
+        command = ['printf', '<log><logentry revision="1"/></log>']
+        self.assertEqual(
+            [element.get('revision')
+             for element in iter_svn_xml(command, 'logentry')],
+            ['1'])
+
+    def test_endless_command_is_killed_when_iteration_stops(self):
+        command = ['sh', '-c',
+                   'echo "<blame>"; yes "<entry line-number=\\"1\\"/>"']
+        for element in iter_svn_xml(command, 'entry'):
+            break
+        self.assertEqual(element.tag, 'entry')
+
+    def test_failing_command_raises_error(self):
+        command = ['sh', '-c', 'echo "<log>"; exit 1']
+        self.assertRaises(ExecutionError, list,
+                          iter_svn_xml(command, 'logentry'))
+
+
+class RecordingReaderTests(unittest.TestCase):
+    def test_records_data_up_to_max_size(self):
+        data = blame_xml(10)
+        source = _RecordingReader(StringIO(data), len(data))
+        self.assertEqual(len(list(iter_elements(source, 'entry'))), 10)
+        self.assertEqual(source.get_data(), data)
+
+    def test_stops_recording_above_max_size(self):
+        data = blame_xml(10)
+        source = _RecordingReader(StringIO(data), len(data) - 1)
+        self.assertEqual(len(list(iter_elements(source, 'entry'))), 10)
+        self.assertEqual(source.get_data(), None)
+        self.assertEqual(_RecordingReader(StringIO(data), 0).get_data(), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,9 @@
 import hashlib
 import re
 
+HEADER_RE = re.compile(r'^(?P<keep>(\+\+\+|---)[^\t]+).*'
+                       r'\((nonexistent|revision \d+)\)$')
+
 
 def from_diff(path):
     # Return a hash which does not depend on the current HEAD revision
@@ -15,8 +18,7 @@ def from_diff(path):
     lines = None
     with open(path, "r") as f:
         for line in f:
-            m = re.search(r'^(?P<keep>(\+\+\+|---)[^\t]+).*' +
-                          r'\((nonexistent|revision \d+)\)$', line)
+            m = HEADER_RE.search(line)
             if m:
                 new_line = m.group("keep") + "\n"
                 if new_line.startswith("---"):
@@ -35,6 +37,52 @@ def from_diff(path):
     return md5sum.hexdigest()
 
 
+class DiffChecksum(object):
+    """
+    Incremental version of from_diff for a diff that is fed line by line.
+    from_diff hashes the file sections sorted by their "---" lines, which
+    can only be done incrementally if the sections come in that order, so
+    hexdigest returns None if they don't.
+    """
+
+    def __init__(self):
+        self._md5sum = hashlib.md5()
+        self._last_key = None
+        self._in_order = True
+
+    def update(self, line):
+        # Only header lines can match HEADER_RE.
+        m = HEADER_RE.search(line) if line[:3] in ["---", "+++"] else None
+        if m:
+            line = m.group("keep") + "\n"
+            if line.startswith("---"):
+                if self._last_key is not None and line <= self._last_key:
+                    self._in_order = False
+                self._last_key = line
+            elif self._last_key is None:
+                self._in_order = False
+        elif self._last_key is None:
+            # Not a diff that from_diff accepts.
+            self._in_order = False
+        self._md5sum.update(line)
+
+    def hexdigest(self):
+        return self._md5sum.hexdigest() if self._in_order else None
+
+
+class GitDiffChecksum(object):
+    """Incremental version of from_git_diff."""
+
+    def __init__(self):
+        self._md5sum = hashlib.md5()
+
+    def update(self, line):
+        self._md5sum.update(line)
+
+    def hexdigest(self):
+        return self._md5sum.hexdigest()
+
+
 def from_git_diff(path):
     md5sum = hashlib.md5()
     with open(path, "r") as fd:
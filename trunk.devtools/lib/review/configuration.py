@@ -193,6 +193,8 @@ class ReviewConfigurationFile(ReviewConfiguration):
 
 
 STATE_DIFF_CHECKSUMS = "diff-checksums"
+# Optional: not written until a diff source has been recorded.
+STATE_DIFF_SOURCES = "diff-sources"
 STATE_UNCOMMITTED = "uncommitted"
 STATE_UNPUSHED = "unpushed"
 STATE_VERSION = "version"
@@ -227,6 +229,9 @@ class ReviewState:
                 error("unsupported state file version, please use a newer"
                       " version of devtools.")
 
+            if type(state.get(STATE_DIFF_SOURCES, {})) != dict:
+                error("malformed state file")
+
         except (ValueError, KeyError):
             error("malformed state file")
 
@@ -241,10 +246,23 @@ class ReviewState:
 
     def set_checksum(self, review_id, checksum):
         self._state[STATE_DIFF_CHECKSUMS][review_id] = checksum
+        # The recorded source (if any) is for the previous checksum.
+        self._state.get(STATE_DIFF_SOURCES, {}).pop(review_id, None)
 
     def get_checksum(self, review_id):
         return self._state[STATE_DIFF_CHECKSUMS].get(review_id)
 
+    def set_diff_source(self, review_id, source):
+        """
+        Record what the diff with the current checksum of review_id was
+        generated from (see diffsource.new_source).
+        """
+        assert review_id in self._state[STATE_DIFF_CHECKSUMS]
+        self._state.setdefault(STATE_DIFF_SOURCES, {})[review_id] = source
+
+    def get_diff_source(self, review_id):
+        return self._state.get(STATE_DIFF_SOURCES, {}).get(review_id)
+
     def set_branch_parent(self, parent):
         assert type(parent) in [unicode, str] or parent is None
         self._state[STATE_BRANCH_PARENT] = parent
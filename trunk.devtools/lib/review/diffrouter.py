@@ -0,0 +1,205 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+"""
+Splitting of a diff into one filtered diff per review in a single pass.
+
+The diff (from svn or git) is split into file sections once, and each
+section is written to every review whose filter matches its path. The
+include and exclude patterns of a review are compiled into one regexp each
+(see diffstream.PathFilter) that is only matched against the path of each
+section, not against every line. Header rewriting and checksumming are done
+on the way, so no review output needs to be read back.
+"""
+
+import hashlib
+import re
+import shlex
+
+from diffstream import DiffStats, FileDiff, PathFilter, iter_file_diffs
+
+import checksum
+from common import error
+
+GIT_HEADER_PREFIX = 'diff --git '
+GIT_HEADER_RE = re.compile(
+    r'diff --git a/(?P<path_a>[\S]+) b/(?P<path_b>[\S]+)')
+
+# filterdiff options that parse_filter_args understands, mapped to whether
+# they add include (True) or exclude (False) patterns.
+INCLUDE_OPTIONS = {'-i': True, '--include': True,
+                   '-x': False, '--exclude': False}
+INCLUDE_FILE_OPTIONS = {'-I': True, '--include-from-file': True,
+                        '-X': False, '--exclude-from-file': False}
+
+
+def parse_filter_args(filter_args):
+    """
+    Return a diffstream.PathFilter for filter_args (filterdiff arguments),
+    or None if filter_args use filterdiff features other than include and
+    exclude patterns.
+    """
+    patterns = {True: [], False: []}
+    args = shlex.split(filter_args)
+    while args:
+        arg = args.pop(0)
+        if arg == '--clean':
+            continue
+        elif arg.startswith('--'):
+            option, _, value = arg.partition('=')
+        else:
+            option, value = arg[:2], arg[2:]
+        if (option not in INCLUDE_OPTIONS
+                and option not in INCLUDE_FILE_OPTIONS):
+            return None
+        if not value:
+            if not args:
+                return None
+            value = args.pop(0)
+        if option in INCLUDE_OPTIONS:
+            patterns[INCLUDE_OPTIONS[option]].append(value)
+        else:
+            try:
+                with open(value) as fp:
+                    patterns[INCLUDE_FILE_OPTIONS[option]].extend(
+                        line.rstrip('\n') for line in fp if line.strip())
+            except IOError:
+                return None
+    return PathFilter(patterns[True], patterns[False])
+
+
+def parse_git_filter_args(filter_args):
+    """
+    Return a filter for filter_args, which is a sequence of "-i PATTERN" and
+    "-x PATTERN". Unlike filterdiff, nothing is included if there is no -i.
+    """
+    args = shlex.split(filter_args)
+    if len(args) % 2 != 0:
+        error('Bad number of diff filter argumets in config! '
+              'Check arguments: {0}'.format(filter_args))
+    includes = []
+    excludes = []
+    for path_action, pattern in zip(args[::2], args[1::2]):
+        if path_action == '-i':
+            includes.append(pattern)
+        elif path_action == '-x':
+            excludes.append(pattern)
+        else:
+            error('Bad path action "{0}" detected in config.'
+                  ' Expecting "-i" or "-x"'
+                  .format(path_action))
+    if not includes:
+        return _NoPathFilter()
+    return PathFilter(includes, excludes)
+
+
+class _NoPathFilter(object):
+    def matches(self, path):
+        return False
+
+
+class DiffRoute(object):
+    def __init__(self, path_filter, output_fp, rewrite_headers=None,
+                 diff_checksum=None):
+        """
+        Route matching file sections to output_fp (a named file object).
+        rewrite_headers, if given, is called with the "---" and "+++" lines
+        of each file section and returns a pair of lines to use instead.
+        diff_checksum is updated with each line written; the default is a
+        checksum.DiffChecksum.
+        """
+        self.path_filter = path_filter
+        self.stats = DiffStats()
+        # (path, added line count, removed line count) of routed files.
+        self.files = []
+        # MD5 hex digest of the (rewritten) section of each routed file.
+        self.file_digests = {}
+        self._output_fp = output_fp
+        self._rewrite_headers = rewrite_headers
+        self._checksum = (diff_checksum if diff_checksum is not None
+                          else checksum.DiffChecksum())
+
+    def add(self, file_diff):
+        lines = file_diff.diff_lines
+        if (self._rewrite_headers is not None and len(lines) >= 2
+                and lines[0].startswith('---')
+                and lines[1].startswith('+++')):
+            lines = (list(self._rewrite_headers(lines[0], lines[1]))
+                     + lines[2:])
+        file_md5sum = hashlib.md5()
+        for line in lines:
+            self._checksum.update(line)
+            file_md5sum.update(line)
+        self._output_fp.writelines(lines)
+        self.file_digests[file_diff.path] = file_md5sum.hexdigest()
+        self.stats.add_written(file_diff)
+        self.files.append((file_diff.path, file_diff.added_count,
+                           file_diff.removed_count))
+
+    def close(self):
+        self._output_fp.close()
+
+    def get_checksum(self):
+        """
+        Return the checksum of the output (which must be closed). A
+        checksum.DiffChecksum that can't be computed incrementally is
+        computed with checksum.from_diff instead.
+        """
+        hexdigest = self._checksum.hexdigest()
+        if hexdigest is None:
+            hexdigest = checksum.from_diff(self._output_fp.name)
+        return hexdigest
+
+
+def route_file_diffs(file_diffs, routes):
+    """
+    Write each diffstream.FileDiff in file_diffs to all routes whose filter
+    matches its path.
+    """
+    for file_diff in file_diffs:
+        for route in routes:
+            route.stats.add_read(file_diff)
+            if route.path_filter.matches(file_diff.path):
+                route.add(file_diff)
+
+
+def route_svn_diff(lines, routes):
+    """
+    Route the file sections of the svn diff lines (an iterable). Comment
+    lines are dropped, as are sections without diff lines (e.g. only
+    property changes or binary files), like filterdiff --clean does.
+    """
+    route_file_diffs((file_diff for file_diff in iter_file_diffs(lines)
+                      if file_diff.has_header()), routes)
+
+
+def route_git_diff(lines, routes):
+    """
+    Route the file sections of the git diff lines (an iterable). Lines
+    before the first section are dropped.
+    """
+    route_file_diffs(iter_git_file_diffs(lines), routes)
+
+
+def iter_git_file_diffs(lines):
+    """
+    Split git diff lines into FileDiffs, where the path is the "a/" path of
+    each "diff --git" line and all lines of a section are diff lines. Line
+    counts are not computed.
+    """
+    current = None
+    for line in lines:
+        if line.startswith(GIT_HEADER_PREFIX):
+            match = GIT_HEADER_RE.match(line)
+            if match:
+                if current is not None:
+                    yield current
+                current = FileDiff(match.group('path_a'))
+        if current is not None:
+            current.add_diff_line(line)
+    if current is not None:
+        yield current
@@ -0,0 +1,97 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+"""
+Records of what the last posted diff of a review was generated from, so
+that reviews whose diff can't have changed since are found without
+generating any diff.
+
+A source records the base of the branch diff (e.g. the pegged ancestor URL
+or the merge base commit), the revision of the branch, the filter arguments
+of the review and the digest of each file section in the posted diff. If
+the base and filter arguments are the same and no file matching the filter
+has changed on the branch since the recorded revision, the diff is the same
+as the one posted.
+"""
+
+SOURCE_BASE = 'base'
+SOURCE_REVISION = 'revision'
+SOURCE_FILTER = 'filter'
+SOURCE_FILES = 'files'
+
+
+def new_source(base, revision, filter_args, file_digests=None):
+    """
+    Return a source to record with ReviewState.set_diff_source. file_digests
+    maps the path of each file in the diff to the digest of its section
+    (see diffrouter.DiffRoute.file_digests), or is None if not known.
+    """
+    return {SOURCE_BASE: base,
+            SOURCE_REVISION: revision,
+            SOURCE_FILTER: filter_args,
+            SOURCE_FILES: file_digests}
+
+
+def find_unchanged_reviews(reviews, review_state, base, revision,
+                           get_changed_paths, parse_filter_args):
+    """
+    Return the reviews whose diff from base to revision would be the same as
+    the last one posted, according to the sources in review_state.
+
+    get_changed_paths(old_revision) returns the paths of the files changed
+    on the branch between old_revision and revision, or None if unknown. It
+    is called once per distinct recorded revision. parse_filter_args returns
+    an object with a matches(path) method for the filter arguments of a
+    review, or None if any changed path may affect the diff.
+    """
+    changed_paths = {}
+    unchanged_reviews = []
+    for review in reviews:
+        if (review.review_id is None
+                or review_state.get_checksum(review.review_id) is None):
+            continue
+        source = review_state.get_diff_source(review.review_id)
+        if (source is None or source[SOURCE_BASE] != base
+                or source[SOURCE_FILTER] != review.filter_args):
+            continue
+        old_revision = source[SOURCE_REVISION]
+        if old_revision != revision:
+            if old_revision not in changed_paths:
+                changed_paths[old_revision] = get_changed_paths(old_revision)
+            paths = changed_paths[old_revision]
+            if paths is None:
+                continue
+            if paths:
+                path_filter = parse_filter_args(review.filter_args)
+                if path_filter is None or any(path_filter.matches(path)
+                                              for path in paths):
+                    continue
+        unchanged_reviews.append(review)
+    return unchanged_reviews
+
+
+def update_revision(review_state, review_id, revision):
+    """
+    Record that the diff of review_id is still the same at revision.
+    """
+    source = dict(review_state.get_diff_source(review_id))
+    source[SOURCE_REVISION] = revision
+    review_state.set_diff_source(review_id, source)
+
+
+def changed_files(source, file_digests):
+    """
+    Return the sorted paths of the files whose section differs between the
+    diff recorded in source (which may be None) and file_digests, or None if
+    either is unknown.
+    """
+    if source is None or source[SOURCE_FILES] is None or file_digests is None:
+        return None
+    old_digests = source[SOURCE_FILES]
+    return sorted(path
+                  for path in set(old_digests) | set(file_digests)
+                  if old_digests.get(path) != file_digests.get(path))
@@ -7,6 +7,8 @@
 
 import optparse
 
+from post_review import DEFAULT_JOBS
+
 
 def parse_options(usage):
     parser = optparse.OptionParser(usage=usage, prog='review')
@@ -55,6 +57,11 @@ def parse_options(usage):
                       action='count',
                       help=('print extra process information. For more'
                             ' verbose output, supply -vv or -vvv'))
+    parser.add_option('-j', '--jobs',
+                      default=DEFAULT_JOBS,
+                      type='int',
+                      help=('number of reviews to post concurrently'
+                            ' (default: %default)'))
 
     debug_opts = optparse.OptionGroup(parser,
                                       'Debug Options',
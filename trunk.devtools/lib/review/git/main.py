@@ -10,7 +10,6 @@
 from __future__ import print_function
 
 import collections
-import fnmatch
 import os
 import re
 import shlex
@@ -18,9 +17,11 @@ import subprocess
 import sys
 import tempfile
 
+from itertools import izip
 from os.path import dirname, realpath, isfile
 
 sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../diff_branch')
 sys.path.insert(0, dirname(realpath(__file__)) + '/..')
 
 from common import error, ExecutionError
@@ -29,11 +30,14 @@ from common import prompt_user
 
 import checksum
 import devhub
+import diffrouter
+import diffsource
 import gitcommon
 import refname
 from configuration import ReviewFileSet
 from git import cmdline
-from post_review import SubmittedReviewError, post_review
+from post_review import ReviewBoardSession, ReviewPost
+from post_review import SubmittedReviewError, post_reviews
 
 options = None
 args = None
@@ -136,6 +140,9 @@ def main(usage):
 
 
 def _check_for_mutually_exclusive_options():
+    if options.jobs < 1:
+        usage_error('--jobs must be at least 1')
+
     if options.unpushed:
         if options.parent is not None:
             usage_error(
@@ -240,65 +247,46 @@ def _generate_diff(diff_command):
     return diff_file.name
 
 
-def _generate_filtered_diff(diff_file, filter_args):
-    _verbose('filter_args: {0}'.format(filter_args))
-    _verbose('shlex.split(filter_args): {0}'
-             .format(shlex.split(filter_args)), 2)
-
-    arg_list = shlex.split(filter_args)
-
-    if len(arg_list) % 2 != 0:
-        error('Bad number of diff filter argumets in config! '
-              'Check arguments: {0}'.format(filter_args))
-
-    include_paths = []
-    exclude_paths = []
-
-    for i, path_action in enumerate(arg_list[::2]):
-        if path_action == '-i':
-            include_paths.append(arg_list[2 * i + 1])
-        elif path_action == '-x':
-            exclude_paths.append(arg_list[2 * i + 1])
-        else:
-            error('Bad path action "{0}" detected in config.'
-                  ' Expecting "-i" or "-x"'
-                  .format(path_action))
-
-    filtered_diff_file = tempfile.NamedTemporaryFile(delete=False)
-    cleanup_files.append(filtered_diff_file.name)
+def _generate_filtered_diffs(diff_file, reviews):
+    """
+    Return a dict with the filtered diff file of each review, a dict with
+    the checksum of each of those diffs and a dict with the digest of each
+    file section in them, from a single pass over diff_file.
+    """
+    filtered_diff_files = {}
+    routes = {}
+    for review in reviews:
+        _verbose('filter_args: {0}'.format(review.filter_args))
+        _verbose('shlex.split(filter_args): {0}'
+                 .format(shlex.split(review.filter_args)), 2)
+        filtered_diff_file = tempfile.NamedTemporaryFile(delete=False)
+        cleanup_files.append(filtered_diff_file.name)
+        filtered_diff_files[review] = filtered_diff_file.name
+        routes[review] = diffrouter.DiffRoute(
+            diffrouter.parse_git_filter_args(review.filter_args),
+            filtered_diff_file, diff_checksum=checksum.GitDiffChecksum())
+        _verbose('  Output to: {0}'.format(filtered_diff_file.name))
+
+    if not routes:
+        return filtered_diff_files, {}, {}
 
     _verbose('Filtering diff:')
-    _verbose('  Output to: {0}'.format(filtered_diff_file.name))
-
-    pattern = r'diff --git a/(?P<path_a>[\S]+) b/(?P<path_b>[\S]+)'
-
-    with open(diff_file, 'r') as fp:
-        should_include_segment = False
-
-        for line in fp:
-            match = re.match(pattern, line)
-            if match:
-                path_a = match.group('path_a')
-
-                should_include_segment = False
-                for include_path in include_paths:
-                    if fnmatch.fnmatch(path_a, include_path):
-                        should_include_segment = True
-                        break
-
-                for exclude_path in exclude_paths:
-                    if fnmatch.fnmatch(path_a, exclude_path):
-                        should_include_segment = False
-                        break
-
-                _verbose(
-                    '  New file segment found in diff. Path: {0} Include: {1}'
-                    .format(path_a, should_include_segment), 2)
-
-            if should_include_segment:
-                filtered_diff_file.write(line)
+    try:
+        with open(diff_file, 'r') as fp:
+            diffrouter.route_git_diff(fp, routes.values())
+    finally:
+        for route in routes.values():
+            route.close()
 
-    return filtered_diff_file.name
+    diff_checksums = {}
+    file_digests = {}
+    for review in reviews:
+        diff_checksums[review] = routes[review].get_checksum()
+        file_digests[review] = routes[review].file_digests
+        for path, _, _ in routes[review].files:
+            _verbose('  File in diff for {0}: {1}'
+                     .format(review.filter_args, path), 2)
+    return filtered_diff_files, diff_checksums, file_digests
 
 
 def _get_bug_reference(text):
@@ -329,23 +317,44 @@ def _get_diff(parent, unpushed):
 
         return options.diff
 
+    cmd, _, _ = _get_diff_command(parent, unpushed)
+    return _generate_diff(cmd)
+
+
+def _get_diff_command(parent, unpushed):
+    """
+    Return the command for the diff of the branch against parent, the merge
+    base it is a diff from and the commit it is a diff to.
+    """
     if (not unpushed
             and not options.pushed
             and _do_unpushed_commits_exist()):
         usage_error(WORKING_COPY_HAS_UNPUSHED_COMMITS)
 
     if unpushed:
-        branch = ''
+        branch = 'HEAD'
     else:
         branch = 'origin/{0}'.format(repo.branch_name)
+    head = gitcommon.rev_parse(branch)
+    base = gitcommon.merge_base(parent, head)
+    _verbose('Diff from {0} to {1}'.format(base, head), 2)
 
     cmd = ['git',
            'diff',
-           '{0}...{1}'.format(parent, branch),
+           '{0}...{1}'.format(parent, head),
            '--full-index',
            '--no-color']
 
-    return _generate_diff(cmd)
+    return cmd, base, head
+
+
+def _get_changed_paths(old_commit, new_commit):
+    try:
+        return gitcommon.get_changed_paths(old_commit, new_commit)
+    except ExecutionError as e:
+        # E.g. the old commit is gone after a forced push.
+        _verbose(str(e), 2)
+        return None
 
 
 def _get_branch_parent(unpushed, query_user=False):
@@ -460,18 +469,39 @@ def _post_reviews_in_config(review_file_set):
     if unpushed:
         print('Diff will be generated from unpushed changes.')
 
-    diff_file = _get_diff(review_state.get_branch_parent(), unpushed)
+    # The source of a diff of commits is known up front, so reviews whose
+    # diff can't have changed need no diff to be generated.
+    diff_base = diff_head = None
+    unchanged_reviews = []
+    if options.diff is not None:
+        diff_file = _get_diff(review_state.get_branch_parent(), unpushed)
+    else:
+        diff_command, diff_base, diff_head = _get_diff_command(
+            review_state.get_branch_parent(), unpushed)
+        unchanged_reviews = diffsource.find_unchanged_reviews(
+            review_config, review_state, diff_base, diff_head,
+            lambda old_commit: _get_changed_paths(old_commit, diff_head),
+            diffrouter.parse_git_filter_args)
+        diff_file = None
+        if len(unchanged_reviews) < len(review_config):
+            diff_file = _generate_diff(diff_command)
 
     try:
-        filtered_diff_files = {}
-        for review in review_config:
-            filtered_diff_files[review] = \
-                _generate_filtered_diff(diff_file, review.filter_args)
+        reviews_to_check = [review for review in review_config
+                            if review not in unchanged_reviews]
+        filtered_diff_files, diff_checksums, file_digests = \
+            _generate_filtered_diffs(diff_file, reviews_to_check)
+        diff_sources = {}
+        if diff_head is not None:
+            for review in reviews_to_check:
+                diff_sources[review] = diffsource.new_source(
+                    diff_base, diff_head, review.filter_args,
+                    file_digests[review])
 
         # Only post the review if the diff has changed.
         reviews_to_post = []
-        for review in review_config:
-            diff_checksum = checksum.from_git_diff(filtered_diff_files[review])
+        for review in reviews_to_check:
+            diff_checksum = diff_checksums[review]
             prev_diff_checksum = review_state.get_checksum(review.review_id)
             _verbose('Prev diff checksum: {0}'.format(prev_diff_checksum), 2)
             _verbose('Current diff checksum: {0}'.format(diff_checksum), 2)
@@ -479,6 +509,9 @@ def _post_reviews_in_config(review_file_set):
             if (prev_diff_checksum is None or
                     diff_checksum != prev_diff_checksum):
                 reviews_to_post.append(review)
+                _verbose_changed_files(
+                    review, review_state.get_diff_source(review.review_id),
+                    file_digests[review])
 
         # Print which reviews that have not changed, hence will not be updated.
         for review in review_config:
@@ -490,57 +523,57 @@ def _post_reviews_in_config(review_file_set):
         if options.dry_run:
             return
 
+        # Record that the unchanged diffs are still the same at this commit.
+        for review in unchanged_reviews:
+            diffsource.update_revision(review_state, review.review_id,
+                                       diff_head)
+        for review in reviews_to_check:
+            if review not in reviews_to_post:
+                review_state.set_checksum(review.review_id,
+                                          diff_checksums[review])
+                _record_diff_source(review_state, review, diff_sources)
+
+        review_posts = []
         for review in reviews_to_post:
-            review_args = []
-            review_args.extend(['--branch', repo.branch_name])
-
-            if options.rb_server_url is not None:
-                review_args.extend(['--server', options.rb_server_url])
-            if options.rb_username is not None:
-                review_args.extend(['--username', options.rb_username])
-            if options.rb_password is not None:
-                review_args.extend(['--password', options.rb_password])
-
-            if options.verbose > 2:
-                review_args.append('--debug')
-
-            review_args.extend(['--repository-url', repo.url])
-
+            bug_reference = None
             if review.review_id is None:
                 should_save_config = True
                 # Set the bugs field in Review Board when creating new
                 # requests, not updating since that would risk replacing the
                 # information the user has put there.
                 bug_reference = _get_bug_reference(repo.branch_name)
-                if bug_reference:
-                    review_args.extend(['--bugs-closed', bug_reference])
-            else:
-                review_args.extend(['-r', review.review_id])
-
-            review_args.extend(
-                ['--diff-filename', filtered_diff_files[review]])
-
-            try:
-                if options.skip_post_review:
-                    review.review_id = '0'
-                    _warning('--skip-post-review set,'
-                             ' review will not be posted')
-                else:
-                    review.review_id = post_review(
-                        review_args, options.verbose)
-            except SubmittedReviewError:
+            review_posts.append(ReviewPost(
+                filtered_diff_files[review], repo.url,
+                review_id=review.review_id, branch=repo.branch_name,
+                bugs_closed=bug_reference))
+
+        if options.skip_post_review:
+            for _ in reviews_to_post:
+                _warning('--skip-post-review set, review will not be posted')
+            results = [('0', None)] * len(reviews_to_post)
+        elif review_posts:
+            session = ReviewBoardSession(options.rb_server_url,
+                                         options.rb_username,
+                                         options.rb_password, repo.url,
+                                         options.verbose > 2)
+            results = post_reviews(session, review_posts, options.jobs)
+        else:
+            results = []
+        for review, (review_id, ex) in izip(reviews_to_post, results):
+            if isinstance(ex, SubmittedReviewError):
                 print('If you do not want to post this review, comment out or'
                       ' remove the corresponding line from the config.')
                 continue
-            except Exception as ex:
+            elif ex is not None:
                 delete_temp_files = False
                 print('Error:', ex, file=sys.stderr)
                 continue
+            review.review_id = review_id
 
             # Save the diff checksum for a posting that went without errors.
-            review_state.set_checksum(
-                review.review_id,
-                checksum.from_git_diff(filtered_diff_files[review]))
+            review_state.set_checksum(review.review_id,
+                                      diff_checksums[review])
+            _record_diff_source(review_state, review, diff_sources)
 
     except Exception:
         delete_temp_files = False
@@ -553,6 +586,11 @@ def _post_reviews_in_config(review_file_set):
             review_state.save()
 
 
+def _record_diff_source(review_state, review, diff_sources):
+    if review in diff_sources:
+        review_state.set_diff_source(review.review_id, diff_sources[review])
+
+
 def _query_api_for_branch_parent():
     try:
         return devhub.get_branch_parent(repo.name,
@@ -659,5 +697,14 @@ def _verbose(message, level=1):
         print(message)
 
 
+def _verbose_changed_files(review, source, file_digests):
+    paths = diffsource.changed_files(source, file_digests)
+    if paths is not None:
+        _verbose('Files changed since the previous update of review {0}:'
+                 .format(review.review_id))
+        for path in paths:
+            _verbose('  {0}'.format(path))
+
+
 def _warning(message):
     print('Warning: {0}'.format(message))
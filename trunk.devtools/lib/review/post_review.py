@@ -5,10 +5,13 @@
 # published or used, in whole or in part, without the express prior written
 # permission of ARRIS.
 
-import os
+import getpass
+import logging
 import re
-from common import error, run_interactive_command
-from os.path import dirname, isfile, join, realpath
+import sys
+from common import error, run_command
+from multiprocessing.pool import ThreadPool
+from os.path import dirname, isdir, join, realpath
 
 
 class SubmittedReviewError(Exception):
@@ -24,73 +27,247 @@ RBTOOLS_COMPONENT = join(dirname(realpath(__file__)),
 SIX_COMPONENT = join(dirname(realpath(__file__)),
                      '../..', '3pp', 'six')
 
-POST_REVIEW = join(RBTOOLS_COMPONENT, 'rbtools', 'commands', 'main.py')
-
-if not isfile(POST_REVIEW):
-    error('Unable to find main.py at %s' % POST_REVIEW)
-
-# Print informative error messages early if modules required by RBTools
-# aren't available.
-try:
-    import pkg_resources
-    pkg_resources  # Avoid pyflakes warning
-except ImportError:
-    error("Python module pkg_resources is missing - please install"
-          " the package python-setuptools")
-try:
-    import argparse
-    argparse  # Avoid pyflakes warning
-except ImportError:
-    error("Python module argparse is missing. If you're running CentOS you"
-          " could try installing the package python-argparse. If not, you'll"
-          " need Python 2.7.x.")
-
-
-def post_review(post_review_arguments, verbose=False):
-    # The -u flag is for unbuffered output. This is needed for displaying
-    # available data from stdout of the process up until an input action.
-    post_review_command = ["python2", "-u", POST_REVIEW, "post"]
-
-    # Provide some defaults that suit us
-    if '--disable-proxy' not in post_review_arguments:
-        post_review_arguments.append('--disable-proxy')
-    if verbose:
-        post_review_arguments.append('--debug')
-    post_review_command.extend(post_review_arguments)
-
-    environment = os.environ
-    environment['LC_ALL'] = 'POSIX'
-    # Setup PYTHONPATH before calling RBTools. If RBTools was properly
-    # installed, these directories would be the standard 'site-packages'
-    # directory.
-    new_python_path = [RBTOOLS_COMPONENT, SIX_COMPONENT]
-    if 'PYTHONPATH' in environment:
-        new_python_path.append(environment['PYTHONPATH'])
-    environment['PYTHONPATH'] = ":".join(new_python_path)
-
-    print
-    print "**"
-    print "Posting review:"
-    if verbose:
-        print "  Command: %s" % " ".join(post_review_command)
-
-    print "================="
-    exit_status, output = \
-        run_interactive_command(post_review_command, environment)
-    print "================="
-
-    if exit_status == 0:
-        return _parse_review_id(output)
-    elif "marked as submitted" in output:
-        raise SubmittedReviewError()
-    else:
-        error("Failed to post review - did you enter the correct username and"
-              " password?")
-
-
-def _parse_review_id(text):
-    for line in text.split("\n"):
-        match = re.search("https?://.*/(?P<id>\d+)/$", line)
-        if match:
-            return match.group("id")
-    error("Could not read review id from rbtools output.")
+# Default number of reviews that post_reviews posts concurrently.
+DEFAULT_JOBS = 4
+# Upper bound on how long to wait for a single post. Waiting with a timeout
+# (instead of none) keeps the main thread responsive to KeyboardInterrupt.
+POST_TIMEOUT = 60 * 60  # Seconds
+# Number of times the user may enter credentials before giving up.
+LOGIN_ATTEMPTS = 3
+
+if not isdir(join(RBTOOLS_COMPONENT, 'rbtools')):
+    error('Unable to find RBTools at %s' % RBTOOLS_COMPONENT)
+
+
+def _import_rbtools():
+    """
+    Import the RBTools API. This is done when it's first needed instead of
+    when this module is imported, since it takes longer than the rest of the
+    startup of the review tools, which often have nothing to post.
+    """
+    global Capabilities, RBClient, APIError, AuthorizationError
+    global ServerInterfaceError, load_config
+
+    # Print informative error messages early if modules required by RBTools
+    # aren't available.
+    try:
+        import pkg_resources
+        pkg_resources  # Avoid pyflakes warning
+    except ImportError:
+        error("Python module pkg_resources is missing - please install"
+              " the package python-setuptools")
+    try:
+        import argparse
+        argparse  # Avoid pyflakes warning
+    except ImportError:
+        error("Python module argparse is missing. If you're running CentOS"
+              " you could try installing the package python-argparse. If"
+              " not, you'll need Python 2.7.x.")
+
+    # If RBTools was properly installed, these directories would be the
+    # standard 'site-packages' directory.
+    if RBTOOLS_COMPONENT not in sys.path:
+        sys.path.insert(0, SIX_COMPONENT)
+        sys.path.insert(0, RBTOOLS_COMPONENT)
+
+    from rbtools.api.capabilities import Capabilities
+    from rbtools.api.client import RBClient
+    from rbtools.api.errors import APIError, AuthorizationError
+    from rbtools.api.errors import ServerInterfaceError
+    from rbtools.utils.filesystem import load_config
+
+
+class ReviewPost(object):
+    def __init__(self, diff_filename, repository_url, review_id=None,
+                 branch=None, base_dir=None, bugs_closed=None):
+        """
+        A diff to post to a new review request (review_id None) or to
+        update the review request review_id with. base_dir is the path in
+        the repository that the paths in the diff are relative to.
+        """
+        self.diff_filename = diff_filename
+        self.repository_url = repository_url
+        self.review_id = review_id
+        self.branch = branch
+        self.base_dir = base_dir
+        self.bugs_closed = bugs_closed
+
+
+class PostResult(object):
+    def __init__(self, review_id, url):
+        self.review_id = review_id
+        self.url = url
+
+    def __str__(self):
+        return ("Review request #%s posted.\n\n%s\n%sdiff/"
+                % (self.review_id, self.url, self.url))
+
+
+class ReviewBoardSession(object):
+    def __init__(self, server_url=None, username=None, password=None,
+                 repository_url=None, verbose=False):
+        """
+        A logged in session with a Review Board server. If server_url is
+        None, the server is looked up like RBTools does, in .reviewboardrc
+        files, the reviewboard.url git setting and the reviewboard:url
+        property of repository_url. The user is asked for credentials (if
+        needed) here, so that posting can be done without interaction.
+        """
+        _import_rbtools()
+        if verbose:
+            logging.basicConfig(level=logging.DEBUG)
+        if server_url is None:
+            server_url = _find_server_url(repository_url)
+        if "://" not in server_url:
+            server_url = "http://" + server_url
+        self._client = RBClient(server_url, username=username,
+                                password=password, disable_proxy=True,
+                                allow_caching=False)
+        try:
+            self._root = self._client.get_root()
+            self._login(username, password)
+            self._supports_commit_ids = self._get_capabilities(
+            ).has_capability('review_requests', 'commit_ids')
+        except (APIError, ServerInterfaceError) as ex:
+            error("Could not connect to the Review Board server at %s: %s"
+                  % (server_url, ex))
+
+    def post(self, review_post):
+        """
+        Post review_post (a ReviewPost) and return a PostResult. Raises
+        SubmittedReviewError if the review request is marked as submitted.
+        """
+        try:
+            with open(review_post.diff_filename, "rb") as fp:
+                diff = fp.read()
+        except IOError as ex:
+            error("Unable to open diff: %s" % ex)
+        if len(diff) == 0:
+            error("There don't seem to be any diffs!")
+        try:
+            return self._post(review_post, diff)
+        except (APIError, ServerInterfaceError) as ex:
+            error("Failed to post review: %s" % ex)
+
+    #
+    # Internals
+    #
+
+    def _login(self, username, password):
+        session = self._root.get_session(expand='user')
+        if session.authenticated:
+            return
+        if username is not None and password is not None:
+            self._client.login(username, password)
+            return
+        print "Please log in to the Review Board server at %s." % (
+            self._client.domain)
+        for _ in range(LOGIN_ATTEMPTS):
+            sys.stderr.write("Username: ")
+            self._client.login(raw_input(), getpass.getpass("Password: "))
+            try:
+                session.get_self()
+                return
+            except AuthorizationError:
+                print >> sys.stderr, ("The username or password was"
+                                      " incorrect.")
+        error("Unable to log in to Review Board.")
+
+    def _get_capabilities(self):
+        if 'capabilities' in self._root:
+            # Review Board 2.0+ provides capabilities in the root resource.
+            return Capabilities(self._root.capabilities)
+        info = self._root.get_info()
+        return Capabilities(info.capabilities if 'capabilities' in info
+                            else {})
+
+    def _post(self, review_post, diff):
+        try:
+            self._root.get_diff_validation().validate_diff(
+                review_post.repository_url, diff,
+                base_dir=review_post.base_dir)
+        except AttributeError:
+            # The server doesn't have a diff validation resource.
+            pass
+
+        if review_post.review_id is not None:
+            review_request = self._root.get_review_request(
+                review_request_id=review_post.review_id,
+                only_fields='absolute_url,bugs_closed,id,status',
+                only_links='diffs,draft')
+            if review_request.status == 'submitted':
+                raise SubmittedReviewError(
+                    "Review request %s is marked as submitted"
+                    % review_post.review_id)
+        else:
+            # The keys must be bytes, see RBTools bug 3753.
+            review_request = self._root.get_review_requests(
+                only_fields='', only_links='create').create(
+                    **{b'repository': review_post.repository_url})
+
+        review_request.get_diffs(only_fields='').upload_diff(
+            diff, base_dir=review_post.base_dir)
+
+        draft = review_request.get_draft(only_fields='commit_id')
+        update_fields = {}
+        if review_post.branch:
+            update_fields['branch'] = review_post.branch
+        if review_post.bugs_closed:
+            # Append to the existing list of bugs.
+            bugs = (set(re.split('[, ]+', review_post.bugs_closed.strip(', ')))
+                    | set(review_request.bugs_closed))
+            update_fields['bugs_closed'] = ','.join(bugs)
+        if self._supports_commit_ids and draft.commit_id is not None:
+            update_fields['commit_id'] = ''
+        if update_fields:
+            draft.update(**update_fields)
+
+        return PostResult(str(review_request.id), review_request.absolute_url)
+
+
+def post_reviews(session, review_posts, jobs=DEFAULT_JOBS):
+    """
+    Post several ReviewPosts over session, up to jobs at a time, and yield
+    (review ID, None) or (None, exception) for each of them in order. The
+    result of each post is printed in order.
+    """
+    if not review_posts:
+        return
+    pool = ThreadPool(min(jobs, len(review_posts)))
+    try:
+        results = pool.imap(lambda review_post: _post(session, review_post),
+                            review_posts)
+        for _ in review_posts:
+            result, ex = results.next(POST_TIMEOUT)
+            print
+            print "**"
+            if ex is None:
+                print result
+                yield result.review_id, None
+            else:
+                if isinstance(ex, SubmittedReviewError):
+                    print ex
+                yield None, ex
+    finally:
+        pool.terminate()
+
+
+def _post(session, review_post):
+    try:
+        return session.post(review_post), None
+    except Exception as ex:
+        return None, ex
+
+
+def _find_server_url(repository_url):
+    server_url = load_config().get('REVIEWBOARD_URL')
+    if server_url:
+        return server_url
+    commands = [["git", "config", "--get", "reviewboard.url"]]
+    if repository_url is not None:
+        commands.append(["svn", "propget", "reviewboard:url", repository_url])
+    for command in commands:
+        exit_status, output = run_command(command)
+        if exit_status == 0 and output.strip():
+            return output.strip()
+    error("Unable to find a Review Board server, please use --rb-server-url.")
@@ -7,6 +7,8 @@
 
 import optparse
 
+from post_review import DEFAULT_JOBS
+
 
 def parse_options(usage):
     parser = optparse.OptionParser(usage=usage, prog='review')
@@ -65,4 +67,9 @@ def parse_options(usage):
                       default=False,
                       action='store_true',
                       help="print extra process information")
+    parser.add_option('-j', '--jobs',
+                      default=DEFAULT_JOBS,
+                      type='int',
+                      help=("number of reviews to post concurrently"
+                            " (default: %default)"))
     return parser.parse_args()
@@ -12,6 +12,7 @@ import subprocess
 import sys
 import tempfile
 
+from itertools import izip
 from os.path import dirname, realpath, relpath, isfile, commonprefix, isdir
 from os.path import normpath
 
@@ -20,6 +21,7 @@ sys.path.insert(0, dirname(realpath(__file__)) + '/../../diff_branch')
 sys.path.insert(0, dirname(realpath(__file__)) + '/..')
 
 import diff_branch
+import paralleldiff
 import svn_common
 from common import error, ExecutionError
 from common import usage_error, UsageError
@@ -29,8 +31,11 @@ from common import get_working_copy_root_path
 
 import checksum
 import cmdline
+import diffrouter
+import diffsource
 from configuration import ReviewFileSet, OPTION_UNCOMMITTED
-from post_review import post_review, SubmittedReviewError
+from post_review import post_reviews, ReviewBoardSession, ReviewPost
+from post_review import SubmittedReviewError
 
 
 options = None
@@ -52,6 +57,8 @@ def main(usage):
 
         if options.dry_run:
             options.verbose = True
+        if options.jobs < 1:
+            usage_error("--jobs must be at least 1")
 
         if not _exists_on_path("filterdiff"):
             error("filterdiff not found in PATH. Please install patchutils:"
@@ -97,7 +104,7 @@ def _exists_on_path(bin_name):
 def _execute():
     if not options.remotesvn:
         options.remotesvn = \
-            svn_common.should_enable_remotesvn_if_ping_is_slow()
+            svn_common.should_enable_remotesvn(_get_svn_auth())
 
     if len(args) > 0:
         if len(args) != 1:
@@ -280,25 +287,52 @@ def _post_reviews_in_config(review_file_set):
     uncommitted = review_state.get_uncommitted()
     if uncommitted:
         _verbose("Diff will be generated from uncommitted changes")
-    diff_file, repository_root, branch, diff_base_path, reorg_needed = \
-        _get_diff(uncommitted)
+
+    # The source of a diff of committed changes is known up front, so
+    # reviews whose diff can't have changed need no diff to be generated.
+    diff_base = diff_revision = None
+    unchanged_reviews = []
+    if uncommitted or options.diff is not None:
+        diff_file, repository_root, branch, diff_base_path, reorg_needed = \
+            _get_diff(uncommitted)
+    else:
+        diff_command, repository_root, branch, diff_base_path, svn_info = \
+            _get_branch_diff_command()
+        diff_base = diff_command[-2]
+        diff_revision = svn_info.last_changed_rev
+        unchanged_reviews = diffsource.find_unchanged_reviews(
+            review_config, review_state, diff_base, diff_revision,
+            lambda old_revision: _get_changed_paths(
+                svn_info.url, old_revision, diff_revision),
+            diffrouter.parse_filter_args)
+        reorg_needed = True
+        diff_file = None
+        if len(unchanged_reviews) < len(review_config):
+            diff_file = _generate_diff(diff_command)
 
     try:
-        filtered_diff_files = {}
-        for review in review_config:
-            filtered_diff_files[review] = \
-                _generate_filtered_diff(diff_file, review.filter_args)
-            if reorg_needed:
-                _rewrite_diff_headers(filtered_diff_files[review])
+        reviews_to_check = [review for review in review_config
+                            if review not in unchanged_reviews]
+        filtered_diff_files, diff_checksums, file_digests = \
+            _generate_filtered_diffs(diff_file, reviews_to_check,
+                                     reorg_needed)
+        diff_sources = {}
+        if diff_revision is not None:
+            for review in reviews_to_check:
+                diff_sources[review] = diffsource.new_source(
+                    diff_base, diff_revision, review.filter_args,
+                    file_digests[review])
 
         # Only post the review if the diff has changed.
         reviews_to_post = []
-        for review in review_config:
-            diff_checksum = checksum.from_diff(filtered_diff_files[review])
+        for review in reviews_to_check:
             prev_diff_checksum = review_state.get_checksum(review.review_id)
             if (prev_diff_checksum is None
-                    or diff_checksum != prev_diff_checksum):
+                    or diff_checksums[review] != prev_diff_checksum):
                 reviews_to_post.append(review)
+                _verbose_changed_files(
+                    review, review_state.get_diff_source(review.review_id),
+                    file_digests[review])
 
         # Print which reviews that have not changed, hence will not be updated.
         for review in review_config:
@@ -310,53 +344,52 @@ def _post_reviews_in_config(review_file_set):
         if options.dry_run:
             return
 
+        # Record that the unchanged diffs are still the same at this revision.
+        for review in unchanged_reviews:
+            diffsource.update_revision(review_state, review.review_id,
+                                       diff_revision)
+        for review in reviews_to_check:
+            if review not in reviews_to_post:
+                review_state.set_checksum(review.review_id,
+                                          diff_checksums[review])
+                _record_diff_source(review_state, review, diff_sources)
+
+        review_posts = []
         for review in reviews_to_post:
-            review_args = []
-            review_args.extend(['--repository-url', repository_root])
-            review_args.extend(['--branch', branch])
-            review_args.extend(['--basedir', diff_base_path])
-
-            if options.rb_server_url is not None:
-                review_args.extend(['--server', options.rb_server_url])
-            if options.rb_username is not None:
-                review_args.extend(['--username', options.rb_username])
-            if options.rb_password is not None:
-                review_args.extend(['--password', options.rb_password])
-
-            if options.svn_username is not None:
-                review_args.extend(['--svn-username', options.svn_username])
-            if options.svn_password is not None:
-                review_args.extend(['--svn-password', options.svn_password])
-
+            bug_reference = None
             if review.review_id is None:
                 should_save_config = True
                 # Set the bugs field in Review Board when creating new
                 # requests, not updating since that would risk replacing the
                 # information the user has put there.
                 bug_reference = _get_bug_reference(branch)
-                if bug_reference:
-                    review_args.extend(['--bugs-closed', bug_reference])
-            else:
-                review_args.extend(['-r', review.review_id])
+            review_posts.append(ReviewPost(
+                filtered_diff_files[review], repository_root,
+                review_id=review.review_id, branch=branch,
+                base_dir=diff_base_path, bugs_closed=bug_reference))
 
-            review_args.extend(
-                ['--diff-filename', filtered_diff_files[review]])
-
-            try:
-                review.review_id = post_review(review_args, options.verbose)
-            except SubmittedReviewError:
+        if not review_posts:
+            return
+        session = ReviewBoardSession(options.rb_server_url,
+                                     options.rb_username,
+                                     options.rb_password, repository_root,
+                                     options.verbose)
+        results = post_reviews(session, review_posts, options.jobs)
+        for review, (review_id, ex) in izip(reviews_to_post, results):
+            if isinstance(ex, SubmittedReviewError):
                 print ("If you do not want to post this review, comment out or"
                        " remove the corresponding line from the config.")
                 continue
-            except Exception as ex:
+            elif ex is not None:
                 delete_temp_files = False
                 print >> sys.stderr, "Error: %s" % ex
                 continue
+            review.review_id = review_id
 
             # Save the diff checksum for a posting that went without errors.
-            review_state.set_checksum(
-                review.review_id,
-                checksum.from_diff(filtered_diff_files[review]))
+            review_state.set_checksum(review.review_id,
+                                      diff_checksums[review])
+            _record_diff_source(review_state, review, diff_sources)
 
     except Exception:
         delete_temp_files = False
@@ -369,6 +402,20 @@ def _post_reviews_in_config(review_file_set):
             review_state.save()
 
 
+def _record_diff_source(review_state, review, diff_sources):
+    if review in diff_sources:
+        review_state.set_diff_source(review.review_id, diff_sources[review])
+
+
+def _verbose_changed_files(review, source, file_digests):
+    paths = diffsource.changed_files(source, file_digests)
+    if paths is not None:
+        _verbose("Files changed since the previous update of review %s:"
+                 % review.review_id)
+        for path in paths:
+            _verbose("  %s" % path)
+
+
 def _get_diff(uncommitted):
     if uncommitted and options.diff is not None:
         print ("Warning: option --diff is ignored when running in uncommitted"
@@ -422,21 +469,60 @@ def _get_diff(uncommitted):
         return diff_file, repository_root, branch, diff_base_path, False
 
     else:
-        diff_command = diff_branch.get_branch_diff_command(
-            "." if options.branch_url is None else options.branch_url,
-            options.base_url, options.remotesvn, False, _get_svn_auth())
-
+        diff_command, repository_root, branch, diff_base_path, _ = \
+            _get_branch_diff_command()
         diff_file = _generate_diff(diff_command)
-        base_url, branch_url = diff_command[-2:]
-
-        svn_info = svn_common.SvnPathInfo(branch_url, _get_svn_auth())
-        repository_root = svn_info.repository_root
-        branch = branch_url[len(repository_root):]
-        diff_base_path = _get_base_path(branch_url, base_url)
 
         return diff_file, repository_root, branch, diff_base_path, True
 
 
+def _get_branch_diff_command():
+    """
+    Return the command for the diff of the committed changes on the branch,
+    the repository root, the branch, the diff base path and the branch's
+    svn info.
+    """
+    diff_command = diff_branch.get_branch_diff_command(
+        "." if options.branch_url is None else options.branch_url,
+        options.base_url, options.remotesvn, False, _get_svn_auth())
+    base_url, branch_url = diff_command[-2:]
+
+    svn_info = svn_common.SvnPathInfo(branch_url, _get_svn_auth())
+    repository_root = svn_info.repository_root
+    branch = branch_url[len(repository_root):]
+    diff_base_path = _get_base_path(branch_url, base_url)
+
+    return diff_command, repository_root, branch, diff_base_path, svn_info
+
+
+def _get_changed_paths(branch_url, old_revision, new_revision):
+    """
+    Return the paths (relative to branch_url) of the files changed on the
+    branch between old_revision and new_revision, or None if they can't be
+    listed.
+    """
+    old_url = "%s@%s" % (branch_url, old_revision)
+    new_url = "%s@%s" % (branch_url, new_revision)
+    command = ["svn", "diff", "--summarize", "--xml", old_url, new_url]
+    _verbose("Listing changes since revision %s:" % old_revision)
+    _verbose("  %s" % " ".join(command))
+    svn_common.insert_svn_authentication(command, _get_svn_auth(), 2)
+
+    exit_code, output = run_command(command)
+    if exit_code != 0:
+        return None
+    paths = []
+    for item, kind, path in paralleldiff.parse_summary(output, old_url,
+                                                       new_url):
+        if kind == "dir":
+            # The files of a deleted directory are not listed.
+            if item == "deleted":
+                return None
+            continue
+        paths.append(path)
+    return paths
+
+
 def _get_base_path(branch_url, base_url=None):
     if base_url is None:
         branch = diff_branch.Branch(branch_url, base_url, _get_svn_auth())
@@ -483,6 +569,65 @@ def _generate_path_stripped_diff(diff_file, strip_count):
     return new_diff_file.name
 
 
+def _generate_filtered_diffs(diff_file, reviews, reorg_needed):
+    """
+    Return a dict with the filtered diff file of each review, a dict with
+    the checksum of each of those diffs and a dict with the digest of each
+    file section in them (None for unknown). Reviews whose filter only
+    includes and excludes paths are served by a single pass over diff_file,
+    the others by filterdiff.
+    """
+    rewrite_headers = _mangle_path_lines if reorg_needed else None
+    filtered_diff_files = {}
+    diff_checksums = {}
+    file_digests = {}
+    routes = {}
+    for review in reviews:
+        path_filter = diffrouter.parse_filter_args(review.filter_args)
+        if path_filter is None:
+            filtered_diff_files[review] = \
+                _generate_filtered_diff(diff_file, review.filter_args)
+            if reorg_needed:
+                _rewrite_diff_headers(filtered_diff_files[review])
+            diff_checksums[review] = \
+                checksum.from_diff(filtered_diff_files[review])
+            file_digests[review] = None
+            continue
+
+        filtered_diff_file = tempfile.NamedTemporaryFile(delete=False)
+        cleanup_files.append(filtered_diff_file.name)
+        filtered_diff_files[review] = filtered_diff_file.name
+        routes[review] = diffrouter.DiffRoute(path_filter, filtered_diff_file,
+                                              rewrite_headers)
+        _verbose("Filtering diff with %s to %s"
+                 % (review.filter_args, filtered_diff_file.name))
+
+    if routes:
+        _verbose("Splitting diff %s" % diff_file)
+        try:
+            with open(diff_file) as fp:
+                diffrouter.route_svn_diff(fp, routes.values())
+        finally:
+            for route in routes.values():
+                route.close()
+        for review in reviews:
+            if review in routes:
+                diff_checksums[review] = routes[review].get_checksum()
+                file_digests[review] = routes[review].file_digests
+                _verbose_route_stats(review, routes[review])
+
+    return filtered_diff_files, diff_checksums, file_digests
+
+
+def _verbose_route_stats(review, route):
+    _verbose("")
+    _verbose("Files in diff for %s:" % review.filter_args)
+    for path, added_count, removed_count in route.files:
+        _verbose("  %s | +%d -%d" % (path, added_count, removed_count))
+    _verbose("  %s" % route.stats)
+    _verbose("")
+
+
 def _generate_filtered_diff(diff_file, filter_args):
     filter_command = ['filterdiff', '--clean']
     filter_command.extend(shlex.split(filter_args))
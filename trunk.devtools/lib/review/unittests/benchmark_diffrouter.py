@@ -0,0 +1,140 @@
+#!/usr/bin/env python2
+
+# Compares routing a git diff to all reviews in one pass (diffrouter) with
+# filtering it once per review, matching every line against a non-compiled
+# header regexp and every header against each glob with fnmatch, which is
+# what review-git used to do. Not run as part of the unit tests since
+# creating and filtering the diff takes a long time.
+#
+# Usage: benchmark_diffrouter.py [SIZE_IN_MB [NUM_REVIEWS]]
+
+import fnmatch
+import os
+import random
+import re
+import shlex
+import sys
+import tempfile
+
+from os.path import dirname
+from time import time
+
+sys.path.insert(0, dirname(__file__) + "/../../pycommon")
+sys.path.insert(0, dirname(__file__) + "/../../diff_branch")
+sys.path.insert(0, dirname(__file__) + "/..")
+import checksum
+import diffrouter
+
+
+def create_synthetic_diff(rng, path, size):
+    components = ["dir{0}".format(i) for i in range(20)]
+    written = 0
+    i = 0
+    with open(path, "w") as fp:
+        while written < size:
+            file_path = "{0}/{1}/file{2}.{3}".format(
+                rng.choice(components), rng.choice(components), i,
+                rng.choice(["c", "h", "py", "txt"]))
+            lines = ["diff --git a/{0} b/{0}\n".format(file_path),
+                     "index 1234567..89abcde 100644\n",
+                     "--- a/{0}\n".format(file_path),
+                     "+++ b/{0}\n".format(file_path),
+                     "@@ -1,40 +1,40 @@\n"]
+            for j in range(40):
+                lines.append("{0}line {1} of {2}\n".format(
+                    rng.choice(" +-"), j, file_path))
+            fp.writelines(lines)
+            written += sum(len(line) for line in lines)
+            i += 1
+    return i
+
+
+def create_filter_args(rng, num_reviews):
+    filter_args = ["-i *"]
+    for _ in range(num_reviews - 1):
+        filter_args.append("-i dir{0}/* -i */dir{1}/* -x *.txt".format(
+            rng.randint(0, 19), rng.randint(0, 19)))
+    return filter_args
+
+
+def naive_filter(diff_file, filter_args, output_path):
+    # review-git's old _generate_filtered_diff, without the verbose output.
+    arg_list = shlex.split(filter_args)
+    exclude_paths = [arg for action, arg in zip(arg_list[::2],
+                                                arg_list[1::2])
+                     if action == "-x"]
+    include_paths = [arg for action, arg in zip(arg_list[::2],
+                                                arg_list[1::2])
+                     if action == "-i"]
+    pattern = r'diff --git a/(?P<path_a>[\S]+) b/(?P<path_b>[\S]+)'
+    with open(diff_file) as fp, open(output_path, "w") as output:
+        should_include_segment = False
+        for line in fp:
+            match = re.match(pattern, line)
+            if match:
+                path_a = match.group("path_a")
+                should_include_segment = False
+                for include_path in include_paths:
+                    if fnmatch.fnmatch(path_a, include_path):
+                        should_include_segment = True
+                        break
+                for exclude_path in exclude_paths:
+                    if fnmatch.fnmatch(path_a, exclude_path):
+                        should_include_segment = False
+                        break
+            if should_include_segment:
+                output.write(line)
+    return checksum.from_git_diff(output_path)
+
+
+def routed_filter(diff_file, filter_args_list, output_paths):
+    routes = [diffrouter.DiffRoute(
+        diffrouter.parse_git_filter_args(filter_args), open(path, "w"),
+        diff_checksum=checksum.GitDiffChecksum())
+        for filter_args, path in zip(filter_args_list, output_paths)]
+    with open(diff_file) as fp:
+        diffrouter.route_git_diff(fp, routes)
+    for route in routes:
+        route.close()
+    return [route.get_checksum() for route in routes]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    num_reviews = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    rng = random.Random(4711)
+    temp_dir = tempfile.mkdtemp()
+    diff_file = os.path.join(temp_dir, "diff")
+    output_paths = [os.path.join(temp_dir, "review{0}".format(i))
+                    for i in range(num_reviews)]
+    try:
+        num_files = create_synthetic_diff(rng, diff_file, size * 1024 * 1024)
+        filter_args_list = create_filter_args(rng, num_reviews)
+
+        start = time()
+        naive_checksums = [naive_filter(diff_file, filter_args, path)
+                           for filter_args, path in zip(filter_args_list,
+                                                        output_paths)]
+        naive_time = time() - start
+
+        start = time()
+        routed_checksums = routed_filter(diff_file, filter_args_list,
+                                         output_paths)
+        routed_time = time() - start
+
+        assert routed_checksums == naive_checksums
+    finally:
+        for path in [diff_file] + output_paths:
+            if os.path.exists(path):
+                os.unlink(path)
+        os.rmdir(temp_dir)
+
+    print "{0} MB diff, {1} files, {2} reviews".format(size, num_files,
+                                                       num_reviews)
+    print "  filter per review (naive): {0:8.2f} s".format(naive_time)
+    print "  route in one pass:         {0:8.2f} s".format(routed_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -255,6 +255,32 @@ class TestReviewState(unittest.TestCase):
         s.set_checksum("12345", "abc123")
         self.assertEqual("abc123", s.get_checksum("12345"))
 
+    def test_set_and_get_diff_source(self):
+        s = ReviewState()
+        s.set_checksum("12345", "abc123")
+        self.assertIsNone(s.get_diff_source("12345"))
+        s.set_diff_source("12345", {"revision": "10"})
+        self.assertEqual({"revision": "10"}, s.get_diff_source("12345"))
+
+        s.set_checksum("12345", "abc456")
+        self.assertIsNone(s.get_diff_source("12345"))
+
+    def test_load_state_with_diff_sources(self):
+        s = ReviewState()
+        state = {'version': 2,
+                 'diff-checksums': {"12345": "abc123"},
+                 'diff-sources': {"12345": {"revision": "10"}},
+                 'uncommitted': False,
+                 'unpushed': False,
+                 'parent': None}
+        s.load(json.dumps(state))
+        self.assertEqual({"revision": "10"}, s.get_diff_source("12345"))
+
+        state['diff-sources'] = []
+        with self.assertRaisesRegexp(ExecutionError,
+                                     "malformed state file"):
+            s.load(json.dumps(state))
+
     def test_set_and_get_uncommitted(self):
         s = ReviewState()
         self.assertFalse(s.get_uncommitted())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python2
+
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+import sys
+from os.path import dirname, realpath
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../diff_branch')
+
+import tempfile
+import unittest
+
+import checksum
+from common import ExecutionError
+from diffrouter import DiffRoute, parse_filter_args, parse_git_filter_args
+from diffrouter import route_git_diff, route_svn_diff
+from svn.main import _mangle_path_lines
+
+SVN_DIFF = """\
+Index: src/b.c
+===================================================================
+--- src/b.c\t(.../trunk)\t(revision 10)
++++ src/b.c\t(.../branches/x)\t(revision 12)
+@@ -1 +1 @@
+-old
++new
+Index: doc/README
+===================================================================
+--- doc/README\t(.../trunk)\t(nonexistent)
++++ doc/README\t(.../branches/x)\t(revision 12)
+@@ -0,0 +1 @@
++hello
+
+Property changes on: doc/README
+___________________________________________________________________
+Added: svn:eol-style
+## -0,0 +1 ##
++native
+Index: src/a.bin
+===================================================================
+Cannot display: file marked as a binary type.
+svn:mime-type = application/octet-stream
+Index: src/a.c
+===================================================================
+--- src/a.c\t(.../trunk)\t(revision 10)
++++ src/a.c\t(.../branches/x)\t(revision 12)
+@@ -1,2 +1 @@
+ same
+-gone
+"""
+
+GIT_DIFF = """\
+preamble
+diff --git a/src/a.c b/src/a.c
+index 1234567..89abcde 100644
+--- a/src/a.c
++++ b/src/a.c
+@@ -1 +1 @@
+-diff --git a/fake b/fake
++new
+diff --git a/doc/README b/doc/README
+new file mode 100644
+index 0000000..1234567
+--- /dev/null
++++ b/doc/README
+@@ -0,0 +1 @@
++hello
+"""
+
+
+class TestParseFilterArgs(unittest.TestCase):
+    def test_include_and_exclude(self):
+        path_filter = parse_filter_args("-i 'src/*' --exclude=*.bin -x*.h")
+        self.assertTrue(path_filter.matches("src/x/a.c"))
+        self.assertFalse(path_filter.matches("src/a.bin"))
+        self.assertFalse(path_filter.matches("src/a.h"))
+        self.assertFalse(path_filter.matches("doc/README"))
+
+    def test_include_file(self):
+        patterns = tempfile.NamedTemporaryFile()
+        patterns.write("doc/*\n\n*.c\n")
+        patterns.flush()
+        path_filter = parse_filter_args("-I %s" % patterns.name)
+        self.assertTrue(path_filter.matches("src/a.c"))
+        self.assertTrue(path_filter.matches("doc/README"))
+        self.assertFalse(path_filter.matches("src/a.h"))
+
+    def test_other_options_are_not_supported(self):
+        self.assertEqual(None, parse_filter_args("-i * --strip 1"))
+        self.assertEqual(None, parse_filter_args("-p1 -i *"))
+        self.assertEqual(None, parse_filter_args("-i"))
+
+
+class TestParseGitFilterArgs(unittest.TestCase):
+    def test_include_and_exclude(self):
+        path_filter = parse_git_filter_args("-i 'src/*' -x *.h")
+        self.assertTrue(path_filter.matches("src/x/a.c"))
+        self.assertFalse(path_filter.matches("src/a.h"))
+        self.assertFalse(path_filter.matches("doc/README"))
+
+    def test_nothing_is_included_without_include_patterns(self):
+        self.assertFalse(parse_git_filter_args("-x *.h").matches("a.c"))
+
+    def test_bad_arguments(self):
+        self.assertRaises(ExecutionError, parse_git_filter_args, "-i")
+        self.assertRaises(ExecutionError, parse_git_filter_args, "-I a")
+
+
+class TestRouteGitDiff(unittest.TestCase):
+    def test_sections_are_routed_to_all_matching_reviews(self):
+        outputs = [tempfile.NamedTemporaryFile() for _ in range(3)]
+        routes = [DiffRoute(parse_git_filter_args(filter_args),
+                            open(output.name, "w"),
+                            diff_checksum=checksum.GitDiffChecksum())
+                  for filter_args, output in zip(["-i *", "-i src/*",
+                                                  "-i * -x src/*"],
+                                                 outputs)]
+        route_git_diff(GIT_DIFF.splitlines(True), routes)
+        for route in routes:
+            route.close()
+
+        readme_start = GIT_DIFF.index("diff --git a/doc")
+        self.assertEqual(GIT_DIFF[len("preamble\n"):], outputs[0].read())
+        self.assertEqual(GIT_DIFF[len("preamble\n"):readme_start],
+                         outputs[1].read())
+        self.assertEqual(GIT_DIFF[readme_start:], outputs[2].read())
+        for route, output in zip(routes, outputs):
+            self.assertEqual(checksum.from_git_diff(output.name),
+                             route.get_checksum())
+        self.assertEqual(['doc/README', 'src/a.c'],
+                         sorted(routes[0].file_digests))
+        self.assertEqual(routes[0].file_digests['src/a.c'],
+                         routes[1].file_digests['src/a.c'])
+
+
+class TestRouteDiff(unittest.TestCase):
+    def _route(self, filter_args, rewrite_headers=None):
+        output = tempfile.NamedTemporaryFile()
+        route = DiffRoute(parse_filter_args(filter_args),
+                          open(output.name, "w"), rewrite_headers)
+        route_svn_diff(SVN_DIFF.splitlines(True), [route])
+        route.close()
+        return route, output
+
+    def test_sections_are_cleaned_and_filtered(self):
+        route, output = self._route("-i 'src/*'")
+        self.assertEqual("""\
+--- src/b.c\t(.../trunk)\t(revision 10)
++++ src/b.c\t(.../branches/x)\t(revision 12)
+@@ -1 +1 @@
+-old
++new
+--- src/a.c\t(.../trunk)\t(revision 10)
++++ src/a.c\t(.../branches/x)\t(revision 12)
+@@ -1,2 +1 @@
+ same
+-gone
+""", output.read())
+        self.assertEqual([("src/b.c", 1, 1), ("src/a.c", 0, 1)], route.files)
+
+    def test_headers_are_rewritten(self):
+        _, output = self._route("-i doc/*", _mangle_path_lines)
+        self.assertEqual("""\
+--- trunk/doc/README\t(revision 0)
++++ trunk/doc/README\t(working copy)
+@@ -0,0 +1 @@
++hello
+""", output.read())
+
+    def test_checksum_matches_from_diff(self):
+        for filter_args in ["-i *", "-i src/b.c -i doc/*", "-x doc/*"]:
+            route, output = self._route(filter_args, _mangle_path_lines)
+            self.assertEqual(checksum.from_diff(output.name),
+                             route.get_checksum())
+
+    def test_checksum_of_sections_out_of_order(self):
+        route, output = self._route("-i src/*")
+        incremental = checksum.DiffChecksum()
+        for line in open(output.name):
+            incremental.update(line)
+        self.assertEqual(None, incremental.hexdigest())
+        self.assertEqual(checksum.from_diff(output.name),
+                         route.get_checksum())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
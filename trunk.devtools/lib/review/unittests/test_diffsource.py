@@ -0,0 +1,93 @@
+#!/usr/bin/env python2
+
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+import sys
+from os.path import dirname, realpath
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../diff_branch')
+
+import unittest
+
+import diffsource
+from configuration import ReviewItem, ReviewState
+from diffrouter import parse_filter_args
+
+BASE = 'http://svn/trunk@10'
+
+
+class TestFindUnchangedReviews(unittest.TestCase):
+    def setUp(self):
+        self.state = ReviewState()
+        self.reviews = [ReviewItem('1', ['-i src/*']),
+                        ReviewItem('2', ['-i doc/*']),
+                        ReviewItem('3', ['-i * --strip 1'])]
+        for review in self.reviews:
+            self.state.set_checksum(review.review_id, 'abc')
+            self.state.set_diff_source(
+                review.review_id,
+                diffsource.new_source(BASE, '20', review.filter_args))
+        self.calls = []
+
+    def _find(self, changed_paths, base=BASE, revision='25'):
+        def get_changed_paths(old_revision):
+            self.calls.append(old_revision)
+            return changed_paths
+        return diffsource.find_unchanged_reviews(
+            self.reviews, self.state, base, revision, get_changed_paths,
+            parse_filter_args)
+
+    def test_same_revision(self):
+        self.assertEqual(self.reviews, self._find(None, revision='20'))
+        self.assertEqual([], self.calls)
+
+    def test_changes_outside_of_filter(self):
+        self.assertEqual(self.reviews[1:2], self._find(['src/a.c']))
+        self.assertEqual(['20'], self.calls)
+
+    def test_no_changes(self):
+        self.assertEqual(self.reviews, self._find([]))
+
+    def test_unknown_changes(self):
+        self.assertEqual([], self._find(None))
+
+    def test_other_base(self):
+        self.assertEqual([], self._find([], base='http://svn/trunk@11'))
+
+    def test_other_filter_or_no_source(self):
+        self.reviews[0] = ReviewItem('1', ['-i src/*', '-x *.h'])
+        self.state.set_checksum('2', 'def')
+        self.assertEqual(self.reviews[2:], self._find([]))
+
+    def test_new_review(self):
+        self.reviews.append(ReviewItem(None, ['-i *']))
+        self.assertEqual(self.reviews[:3], self._find([]))
+
+
+class TestDiffSource(unittest.TestCase):
+    def test_update_revision(self):
+        state = ReviewState()
+        state.set_checksum('1', 'abc')
+        state.set_diff_source('1', diffsource.new_source(BASE, '20', '-i *',
+                                                         {'a': '1'}))
+        diffsource.update_revision(state, '1', '25')
+        self.assertEqual(diffsource.new_source(BASE, '25', '-i *',
+                                               {'a': '1'}),
+                         state.get_diff_source('1'))
+
+    def test_changed_files(self):
+        source = diffsource.new_source(BASE, '20', '-i *',
+                                       {'a': '1', 'b': '2', 'c': '3'})
+        self.assertEqual(['a', 'c', 'd'], diffsource.changed_files(
+            source, {'a': '0', 'b': '2', 'd': '4'}))
+        self.assertEqual(None, diffsource.changed_files(None, {}))
+        self.assertEqual(None, diffsource.changed_files(source, None))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python2
+
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+import sys
+from os.path import dirname, realpath
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+
+import time
+import unittest
+from StringIO import StringIO
+
+from common import error, ExecutionError
+from post_review import PostResult, ReviewPost, SubmittedReviewError
+from post_review import post_reviews
+
+
+class FakeSession(object):
+    def post(self, review_post):
+        # Let later posts finish first.
+        time.sleep(0.01 * (5 - int(review_post.review_id)))
+        if review_post.diff_filename == 'submitted':
+            raise SubmittedReviewError('marked as submitted')
+        elif review_post.diff_filename == 'bad':
+            error('bad diff')
+        return PostResult(review_post.review_id,
+                          'http://rb/r/%s/' % review_post.review_id)
+
+
+class TestPostReviews(unittest.TestCase):
+    def setUp(self):
+        self._stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._stdout
+
+    def test_results_are_in_order(self):
+        review_posts = [ReviewPost('a', 'svn://repo', '1'),
+                        ReviewPost('submitted', 'svn://repo', '2'),
+                        ReviewPost('bad', 'svn://repo', '3'),
+                        ReviewPost('dddd', 'svn://repo', '4')]
+        results = list(post_reviews(FakeSession(), review_posts, jobs=4))
+
+        self.assertEqual([('1', None), ('4', None)],
+                         [results[0], results[3]])
+        self.assertTrue(isinstance(results[1][1], SubmittedReviewError))
+        self.assertTrue(isinstance(results[2][1], ExecutionError))
+        output = sys.stdout.getvalue()
+        self.assertTrue(output.index('http://rb/r/1/diff/')
+                        < output.index('marked as submitted')
+                        < output.index('http://rb/r/4/diff/'))
+
+    def test_no_reviews(self):
+        self.assertEqual([], list(post_reviews(FakeSession(), [])))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
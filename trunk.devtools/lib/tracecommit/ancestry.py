@@ -0,0 +1,177 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+'''
+Copy history of paths, used to find out where a path was copied, moved or
+branched from.
+
+The copy history of a path is extracted from a single "svn log -v" of the
+path, which follows the path through all copies of the path itself and of
+its parent directories (including branch creations). Each history covers
+all names that the path has had, so later questions about any of those
+names at any revision in the history are answered without asking the
+server. Histories of pegged paths cannot change and are kept in CACHE_FILE
+between runs.
+'''
+
+import json
+import os
+import threading
+from os.path import dirname, expanduser, isdir
+from urllib import unquote
+
+from svnxml import iter_svn_xml
+
+CACHE_FILE = expanduser('~/.cache/devtools/tracecommit-ancestry.json')
+# Number of histories to keep in CACHE_FILE; the oldest are dropped first.
+MAX_CACHED_HISTORIES = 1000
+
+
+def extract_copy_events(log_entries, path):
+    '''
+    Return the copy events in the history of path, youngest first, from the
+    logentry elements of "svn log -v --xml" of the path. Each event is a
+    list of [revision, copied path, copyfrom path, copyfrom revision], where
+    the copied path is path (at that time) or one of its parent directories.
+    The oldest event is the addition of the path, with copyfrom path and
+    revision set to None. Log entries older than that are not read.
+    '''
+    events = []
+    for log_entry in log_entries:
+        revision = int(log_entry.attrib['revision'])
+        # The most specific of the paths that were added or replaced.
+        event = None
+        for changed_path in log_entry.getiterator('path'):
+            text = changed_path.text
+            if (changed_path.attrib['action'] not in ['A', 'R']
+                    or not (path == text or path.startswith(text + '/'))):
+                continue
+            if event is None or len(text) > len(event[1]):
+                copyfrom_revision = changed_path.attrib.get('copyfrom-rev')
+                event = [revision, text,
+                         changed_path.attrib.get('copyfrom-path'),
+                         int(copyfrom_revision) if copyfrom_revision
+                         else None]
+        if event is None:
+            continue
+        events.append(event)
+        if event[2] is None:
+            break
+        path = event[2] + path[len(event[1]):]
+    return events
+
+
+class CopyHistory:
+    def __init__(self, path, revision, events):
+        self.path = path
+        self.revision = revision
+        self.events = events
+
+    def find(self, path, revision):
+        '''
+        Return the index of the first event that applies to path@revision,
+        or None if path@revision is not part of this history.
+        '''
+        current_path = self.path
+        youngest_revision = self.revision
+        for i, (event_revision, copied_path, copyfrom_path,
+                copyfrom_revision) in enumerate(self.events):
+            if (current_path == path
+                    and event_revision <= revision <= youngest_revision):
+                return i
+            if copyfrom_path is None:
+                return None
+            current_path = copyfrom_path + current_path[len(copied_path):]
+            youngest_revision = copyfrom_revision
+        return None
+
+    def to_json(self):
+        return {'path': self.path, 'revision': self.revision,
+                'events': self.events}
+
+    @staticmethod
+    def from_json(value):
+        return CopyHistory(value['path'], value['revision'], value['events'])
+
+
+class AncestryResolver:
+    def __init__(self, cache_file=CACHE_FILE):
+        self._cache_file = cache_file
+        self._lock = threading.Lock()
+        # List of (repository root, CopyHistory), oldest first.
+        self._histories = None
+
+    def get_copy_events(self, repository_root, path, revision):
+        '''
+        Return the copy events (as described for extract_copy_events) that
+        apply to path@revision, where path is relative to the repository
+        root.
+        '''
+        path = unquote(path)
+        if not str(revision).isdigit():
+            # The history of HEAD may change, so it's not worth keeping.
+            return extract_copy_events(
+                self._get_log(repository_root, path, revision), path)
+        revision = int(revision)
+        with self._lock:
+            if self._histories is None:
+                self._histories = self._load()
+            for history_root, history in self._histories:
+                index = (history.find(path, revision)
+                         if history_root == repository_root else None)
+                if index is not None:
+                    return history.events[index:]
+
+            history = CopyHistory(path, revision, extract_copy_events(
+                self._get_log(repository_root, path, revision), path))
+            self._histories.append((repository_root, history))
+            self._save()
+            return history.events
+
+    #
+    # Internals
+    #
+
+    def _get_log(self, repository_root, path, revision):
+        return iter_svn_xml(
+            ['svn', 'log', '-v', '--xml', '-r', '%s:1' % revision,
+             '%s%s@%s' % (repository_root, path, revision)], 'logentry')
+
+    def _load(self):
+        try:
+            with open(self._cache_file) as fp:
+                cached = json.load(fp)
+            return [(value['root'], CopyHistory.from_json(value))
+                    for value in cached]
+        except (IOError, ValueError, KeyError, TypeError):
+            return []
+
+    def _save(self):
+        del self._histories[:-MAX_CACHED_HISTORIES]
+        cached = [dict(history.to_json(), root=root)
+                  for root, history in self._histories]
+        tmp_file = self._cache_file + '.tmp'
+        try:
+            if not isdir(dirname(self._cache_file)):
+                os.makedirs(dirname(self._cache_file))
+            with open(tmp_file, 'w') as fp:
+                json.dump(cached, fp)
+            os.rename(tmp_file, self._cache_file)
+        except (IOError, OSError):
+            pass
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = AncestryResolver()
+        return _resolver
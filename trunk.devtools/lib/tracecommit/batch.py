@@ -0,0 +1,179 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+'''
+Non-interactive tracing of many lines at once.
+
+All traces share the log, annotation and file content caches, so lines of
+the same file mostly hit the same svn queries. Independent traces run in a
+thread pool whose size bounds the number of concurrent svn commands, and the
+result of each trace is printed as one JSON object per line.
+'''
+
+import json
+import sys
+from multiprocessing.pool import ThreadPool
+
+import svn_common
+
+from common import error, ExecutionError, usage_error
+
+from commit import SvnPath
+from linehistory import LineTracer
+from memo import Memo
+
+DEFAULT_JOBS = 8
+# Upper bound on how long to wait for a single trace. Waiting with a timeout
+# (instead of none) keeps the main thread responsive to KeyboardInterrupt.
+TRACE_TIMEOUT = 24 * 60 * 60  # Seconds
+
+# Values of the "status" field in the output.
+STATUS_ADDED = 'added'          # The line was added in the revision
+# The line was changed in the revision and tracing further needs a human to
+# decide.
+STATUS_CHANGED = 'changed'
+STATUS_ERROR = 'error'
+
+
+def parse_line_range(text):
+    '''Return the list of line numbers in "N" or "A-B".'''
+    first, dash, last = text.partition('-')
+    if not first.isdigit() or (dash and not last.isdigit()):
+        usage_error("Invalid line range: %s" % text)
+    first = int(first)
+    last = int(last) if dash else first
+    if first < 1 or last < first:
+        usage_error("Invalid line range: %s" % text)
+    return range(first, last + 1)
+
+
+def read_batch_file(path):
+    '''
+    Return a list of (path_or_url, line_no) from a file with lines in the
+    form PATH_OR_URL:N or PATH_OR_URL:A-B. Empty lines and lines starting
+    with # are ignored. "-" reads from standard input.
+    '''
+    traces = []
+    try:
+        fp = sys.stdin if path == '-' else open(path)
+    except IOError as ex:
+        error("Could not read batch file: %s" % ex)
+    try:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path_or_url, _, line_range = line.rpartition(':')
+            if not path_or_url:
+                usage_error("Expected PATH_OR_URL:LINES in batch file: %s"
+                            % line)
+            for line_no in parse_line_range(line_range):
+                traces.append((path_or_url, line_no))
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+    return traces
+
+
+class BatchTracer:
+    def __init__(self, revision=None, jobs=DEFAULT_JOBS,
+                 output_fp=sys.stdout):
+        self._revision = revision
+        self._jobs = jobs
+        self._output_fp = output_fp
+        self._svn_paths = Memo()
+        self._tracers = Memo()
+
+    def run(self, traces):
+        '''
+        Trace each (path_or_url, line_no) in traces and print the results
+        in the same order. Return the number of traces that failed.
+        '''
+        if not traces:
+            return 0
+        failures = 0
+        pool = ThreadPool(min(self._jobs, len(traces)))
+        try:
+            results = pool.imap(self._trace, traces)
+            for _ in traces:
+                result = results.next(TRACE_TIMEOUT)
+                if result['status'] == STATUS_ERROR:
+                    failures += 1
+                self._output_fp.write(json.dumps(result, sort_keys=True)
+                                      + '\n')
+                self._output_fp.flush()
+        finally:
+            pool.terminate()
+        return failures
+
+    #
+    # Internals
+    #
+
+    def _trace(self, trace):
+        path_or_url, line_no = trace
+        result = {'path': path_or_url, 'line': line_no}
+        try:
+            svn_path = self._svn_paths.get(
+                path_or_url, lambda: self._get_svn_path(path_or_url))
+            tracer = self._tracers.get(str(svn_path),
+                                       lambda: LineTracer(svn_path))
+            if self._revision:
+                svn_path = tracer.get_svn_path_at(svn_path, self._revision)
+            log_entry, hops, status = trace_line(tracer, svn_path, line_no)
+            result.update({
+                'revision': log_entry.revision,
+                'author': log_entry.author,
+                'date': log_entry.datetime,
+                'trace': hops,
+                'status': status,
+            })
+        except ExecutionError as ex:
+            result.update({'status': STATUS_ERROR, 'error': str(ex)})
+        except Exception as ex:
+            # An unexpected failure (e.g. malformed svn output) only affects
+            # this line; report it instead of aborting the whole batch.
+            result.update({'status': STATUS_ERROR,
+                           'error': '%s: %s' % (type(ex).__name__, ex)})
+        return result
+
+    def _get_svn_path(self, path_or_url):
+        path_info = svn_common.SvnPathInfo(path_or_url, svn_common.SVN_AUTH)
+        if path_info.node_kind != 'file':
+            error("%s is not a file" % path_or_url)
+        return SvnPath(path_info.repository_root, path_info.url,
+                       path_info.revision)
+
+
+def trace_line(tracer, svn_path, line_no):
+    '''
+    Trace line_no of svn_path back to the commit that added it without
+    asking the user anything. Stop at a commit that changed the line.
+
+    Return (log entry of the last commit, list of "URL@REV:LINE" for each
+    hop, STATUS_ADDED or STATUS_CHANGED).
+    '''
+    hops = []
+    while True:
+        changed_svn_path, changed_line_no, _, log_entry = \
+            tracer.find_change(svn_path, line_no)
+        if changed_line_no is None:
+            hops.append(str(changed_svn_path))
+            return log_entry, hops, STATUS_CHANGED
+        svn_path = changed_svn_path
+        line_no = changed_line_no
+        hops.append('%s:%d' % (svn_path, line_no))
+
+        prev_svn_path, lineno_in_prev_revision, _ = \
+            tracer.find_previous_line(svn_path, line_no, log_entry)
+        if prev_svn_path is None or lineno_in_prev_revision == 0:
+            return log_entry, hops, STATUS_ADDED
+        elif lineno_in_prev_revision is None:
+            return log_entry, hops, STATUS_CHANGED
+        svn_path = prev_svn_path
+        line_no = lineno_in_prev_revision
+        hops.append('%s:%d' % (svn_path, line_no))
@@ -0,0 +1,250 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+'''
+Line history engine for tracecommit.
+
+The whole history of the traced file (following copies and merges) is
+fetched with a single "svn log -v -g" up front. Each hop then needs one
+"svn ann -g" to find the commit that last changed the line (merged commits
+are reported directly, so no mergeinfo digging is needed), and the line is
+mapped between the revisions involved with the linemap module.
+'''
+
+import threading
+from urllib import unquote
+
+from common import error
+from svnxml import iter_svn_xml
+
+from commit import SvnPath, debug
+from linemap import get_line_map
+from memo import Memo
+
+_annotations = Memo()
+
+
+class LogEntry:
+    def __init__(self, node):
+        self.revision = node.attrib['revision']
+        self.author = node.findtext('author')
+        self.datetime = node.findtext('date')
+        # List of (action, path, copyfrom_path, copyfrom_revision)
+        self.changed_paths = []
+        paths_node = node.find('paths')
+        if paths_node is not None:
+            for path_node in paths_node.findall('path'):
+                self.changed_paths.append((
+                    path_node.attrib['action'],
+                    path_node.text,
+                    path_node.attrib.get('copyfrom-path'),
+                    path_node.attrib.get('copyfrom-rev')))
+
+    def get_info(self):
+        return "r%s | %s | %s " % (self.revision, self.author, self.datetime)
+
+    def is_path_newly_added(self, path):
+        path = unquote(path)
+        for action, changed_path, copyfrom_path, _ in self.changed_paths:
+            if (changed_path == path and action == 'A'
+                    and copyfrom_path is None):
+                return True
+        return False
+
+    def get_previous_location(self, path):
+        '''
+        Return (path, revision) of path in the revision before this commit,
+        following copies made by this commit of the path or a parent.
+        '''
+        path = unquote(path)
+        for action, changed_path, copyfrom_path, copyfrom_revision in \
+                sorted(self.changed_paths, key=lambda x: -len(x[1])):
+            if (copyfrom_path is not None
+                    and action in ['A', 'R']
+                    and (path == changed_path
+                         or path.startswith(changed_path + '/'))):
+                return (copyfrom_path + path[len(changed_path):],
+                        copyfrom_revision)
+        return path, str(int(self.revision) - 1)
+
+    def get_copy_source(self, path):
+        '''
+        Return the path that path was copied from in this commit, or None.
+        '''
+        path = unquote(path)
+        for action, changed_path, copyfrom_path, _ in self.changed_paths:
+            if (copyfrom_path is not None
+                    and action in ['A', 'R']
+                    and (path == changed_path
+                         or path.startswith(changed_path + '/'))):
+                return copyfrom_path + path[len(changed_path):]
+        return None
+
+
+class FileHistory:
+    '''
+    Log entries for all revisions in the history of a file, including
+    revisions merged into it.
+    '''
+
+    def __init__(self, svn_path):
+        self._repository_root = svn_path.repository_root
+        self._start_path = unquote(svn_path.root_relative_path())
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Revisions of the file's own line of history, youngest first.
+        self._own_revisions = []
+        for node in iter_svn_xml(
+                ['svn', 'log', '-v', '--xml', '-g', str(svn_path)],
+                'logentry'):
+            self._own_revisions.append(node.attrib['revision'])
+            self._add_entries(node)
+        debug("Fetched %d log entries for %s" % (len(self._entries),
+                                                 svn_path))
+
+    def get_entry(self, revision):
+        with self._lock:
+            if revision not in self._entries:
+                # Not part of the file's history as seen from the start path
+                # (e.g. a revision on a branch the user chose to follow).
+                for node in iter_svn_xml(
+                        ['svn', 'log', '-v', '--xml', '-r', revision,
+                         '%s@%s' % (self._repository_root, revision)],
+                        'logentry'):
+                    self._add_entries(node)
+            if revision not in self._entries:
+                error("Could not find any log entry for revision %s"
+                      % revision)
+            return self._entries[revision]
+
+    def get_path_at(self, revision):
+        '''
+        Return the path that the traced file had in revision, or None if
+        revision is not in the file's own line of history.
+        '''
+        path = self._start_path
+        for own_revision in self._own_revisions:
+            if int(own_revision) <= int(revision):
+                return path
+            copy_source = self._entries[own_revision].get_copy_source(path)
+            if copy_source is not None:
+                path = copy_source
+        return None
+
+    #
+    # Internals
+    #
+
+    def _add_entries(self, node):
+        entry = LogEntry(node)
+        if entry.revision not in self._entries:
+            self._entries[entry.revision] = entry
+        # Merged revisions are nested when using --use-merge-history.
+        for child in node.findall('logentry'):
+            self._add_entries(child)
+
+
+def annotate_line(svn_path, line_no, memoize=True):
+    '''
+    Return (path, revision) of the commit that last changed line_no of
+    svn_path, following merges. path is None unless the change was merged.
+
+    If memoize is true, the annotations of all lines are kept for later
+    calls. Otherwise svn ann is stopped as soon as line_no has been seen.
+    '''
+    key = str(svn_path)
+    if memoize:
+        annotations = _annotations.get(key, lambda: _annotate(key))
+        if 0 < line_no <= len(annotations):
+            return annotations[line_no - 1]
+    else:
+        entries = _iter_annotations(key)
+        try:
+            for entry_line_no, annotation in entries:
+                if entry_line_no == line_no:
+                    return annotation
+        finally:
+            entries.close()
+    error("Could not find line %d in %s" % (line_no, svn_path))
+
+
+def _annotate(url):
+    return [annotation for _, annotation in _iter_annotations(url)]
+
+
+def _iter_annotations(url):
+    '''Yield (line no, (path, revision)) for each line of url.'''
+    for item in iter_svn_xml(['svn', 'ann', '--xml', '-g', url], 'entry'):
+        line_no = int(item.attrib['line-number'])
+        merged = item.find('merged')
+        if merged is not None and merged.find('commit') is not None:
+            yield line_no, (merged.attrib['path'],
+                            merged.find('commit').get('revision'))
+        else:
+            yield line_no, (None, item.find('commit').get('revision'))
+
+
+class LineTracer:
+    '''
+    Traces lines of a file back through its history. memoize_annotations
+    should be true if several lines of the same file revisions may be
+    traced (see annotate_line).
+    '''
+
+    def __init__(self, svn_path, memoize_annotations=True):
+        self._repository_root = svn_path.repository_root
+        self._history = FileHistory(svn_path)
+        self._memoize_annotations = memoize_annotations
+
+    def get_svn_path_at(self, svn_path, revision):
+        '''
+        Return svn_path as it was named in revision, following renames.
+        '''
+        path = (self._history.get_path_at(revision)
+                or unquote(svn_path.root_relative_path()))
+        return SvnPath(self._repository_root, path, revision)
+
+    def find_change(self, svn_path, line_no):
+        '''
+        Find the commit that last changed line_no of svn_path.
+
+        Return (changed_svn_path, changed_line_no, hunk, log_entry) where
+        changed_svn_path is the file in the changing commit and
+        changed_line_no is the line's number there (None if it could not be
+        decided, in which case hunk shows the differences).
+        '''
+        merged_path, revision = annotate_line(svn_path, line_no,
+                                              self._memoize_annotations)
+        if merged_path is not None:
+            path = merged_path
+        else:
+            path = (self._history.get_path_at(revision)
+                    or unquote(svn_path.root_relative_path()))
+        changed_svn_path = SvnPath(self._repository_root, path, revision)
+        debug("The line was last changed in %s" % changed_svn_path)
+        changed_line_no, hunk = get_line_map(
+            changed_svn_path, svn_path).get_old_line(line_no)
+        return (changed_svn_path, changed_line_no, hunk,
+                self._history.get_entry(revision))
+
+    def find_previous_line(self, svn_path, line_no, log_entry):
+        '''
+        Find line_no of svn_path (changed by log_entry) in the revision
+        before the change.
+
+        Return (previous_svn_path, previous_line_no, hunk) where
+        previous_line_no is as described for LineMap.get_old_line.
+        previous_svn_path is None if the file was added by the commit.
+        '''
+        root_relative_path = svn_path.root_relative_path()
+        if log_entry.is_path_newly_added(root_relative_path):
+            return None, 0, None
+        path, revision = log_entry.get_previous_location(root_relative_path)
+        previous_svn_path = SvnPath(self._repository_root, path, revision)
+        previous_line_no, hunk = get_line_map(
+            previous_svn_path, svn_path).get_old_line(line_no)
+        return previous_svn_path, previous_line_no, hunk
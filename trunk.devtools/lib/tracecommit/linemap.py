@@ -0,0 +1,119 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+'''
+Mapping of line numbers between two revisions of a file.
+
+Both revisions are fetched with pegged "svn cat" (which the svn cache can
+serve) and aligned once with difflib. The resulting LineMap answers any line
+lookup in constant time, and both the file contents and the maps are kept
+for the lifetime of the process so that repeated hops over the same
+revisions don't fetch or align anything again.
+'''
+
+import difflib
+
+from common import error
+from svn_common import run_svn_command
+
+from commit import colors, debug
+from memo import Memo
+
+# Values in the new-to-old map for lines that are not in the old file.
+ADDED = 0
+CHANGED = None
+
+_file_lines = Memo()
+_line_maps = Memo()
+
+
+class LineMap:
+    def __init__(self, old_lines, new_lines):
+        self._old_lines = old_lines
+        self._new_lines = new_lines
+        # Index i holds the old line number (1-based) of new line i + 1, or
+        # ADDED/CHANGED.
+        self._new_to_old = [ADDED] * len(new_lines)
+        self._old_to_new = [ADDED] * len(old_lines)
+        # Index i holds the opcode that new line i + 1 is part of.
+        self._new_opcodes = [None] * len(new_lines)
+
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines,
+                                          autojunk=False)
+        for opcode in matcher.get_opcodes():
+            tag, i1, i2, j1, j2 = opcode
+            for j in range(j1, j2):
+                self._new_opcodes[j] = opcode
+            if tag == 'equal':
+                for offset in range(i2 - i1):
+                    self._new_to_old[j1 + offset] = i1 + offset + 1
+                    self._old_to_new[i1 + offset] = j1 + offset + 1
+            elif tag == 'replace':
+                for j in range(j1, j2):
+                    self._new_to_old[j] = CHANGED
+                for i in range(i1, i2):
+                    self._old_to_new[i] = CHANGED
+
+    def get_old_line(self, new_line_no):
+        '''
+        Find out line no of specific line in the old revision.
+        Return: (line no, hunk) where line no is
+                0  - no such line in old revision
+                >0  - the line no in old revision
+                None - cannot decide if the line exists in old revision
+                and hunk is a list of lines showing the change that the line
+                is part of, or None if the line is unchanged.
+        '''
+        if not 0 < new_line_no <= len(self._new_lines):
+            error("Line %d does not exist (the file has %d lines)"
+                  % (new_line_no, len(self._new_lines)))
+        old_line_no = self._new_to_old[new_line_no - 1]
+        if old_line_no:
+            return old_line_no, None
+        return old_line_no, self._format_hunk(new_line_no)
+
+    def get_new_line(self, old_line_no):
+        '''
+        Return the line no in the new revision of a line in the old
+        revision, 0 if it was removed or None if it was changed.
+        '''
+        if not 0 < old_line_no <= len(self._old_lines):
+            return ADDED
+        return self._old_to_new[old_line_no - 1]
+
+    #
+    # Internals
+    #
+
+    def _format_hunk(self, new_line_no):
+        _, i1, i2, j1, j2 = self._new_opcodes[new_line_no - 1]
+        hunk = ['@@ -%d,%d +%d,%d @@' % (i1 + 1, i2 - i1, j1 + 1, j2 - j1)]
+        for i in range(i1, i2):
+            hunk.append(('-' + self._old_lines[i]).ljust(80)
+                        + ' <== Line %d' % (i + 1))
+        for j in range(j1, j2):
+            line = '+' + self._new_lines[j]
+            if j == new_line_no - 1:
+                line = colors.BLUE + line + colors.ENDC
+            hunk.append(line)
+        return hunk
+
+
+def get_file_lines(svn_path):
+    key = str(svn_path)
+    return _file_lines.get(
+        key, lambda: run_svn_command(['svn', 'cat', key]).splitlines())
+
+
+def get_line_map(old_svn_path, new_svn_path):
+    key = (str(old_svn_path), str(new_svn_path))
+
+    def align():
+        debug("Aligning %s with %s" % key)
+        return LineMap(get_file_lines(old_svn_path),
+                       get_file_lines(new_svn_path))
+    return _line_maps.get(key, align)
@@ -5,7 +5,6 @@
 # published or used, in whole or in part, without the express prior written
 # permission of ARRIS.
 
-import copy
 import optparse
 import sys
 
@@ -15,12 +14,14 @@ sys.path.insert(0, dirname(realpath(__file__)) + '/../pycommon')
 
 import svn_common
 
-from common import error, ExecutionError
+from common import ExecutionError
 from common import usage_error, UsageError
 from common import prompt_user
 
+from batch import BatchTracer, DEFAULT_JOBS
+from batch import parse_line_range, read_batch_file
 from commit import SvnPath, get_original_path
-from commit import annotate_commit, diff_revision
+from linehistory import LineTracer
 
 
 options = None
@@ -32,13 +33,27 @@ def main(usage):
     parser, options, args = _get_options(usage)
 
     try:
-        if len(args) == 0:
+        if options.batch:
+            if args:
+                usage_error("No path/URL is expected with option --batch")
+            if options.line or options.lines:
+                usage_error("Option --batch cannot be combined with"
+                            " --line or --lines")
+
+        if len(args) == 0 and not options.batch:
             parser.print_help()
             sys.exit(0)
 
         if len(args) > 1:
             usage_error("Too many arguments.")
 
+        if options.line and options.lines:
+            usage_error("Options --line and --lines cannot be combined")
+
+        if options.jobs < 1:
+            usage_error("Invalid number of jobs specified with option"
+                        " \"--jobs\"")
+
         # validate option --line
         if options.line and not options.line.isdigit():
             usage_error("Invalid line number specified with option \"-l\"")
@@ -51,6 +66,15 @@ def main(usage):
         svn_common.SVN_AUTH = svn_common.SvnAuth(options.svn_username,
                                                  options.svn_password)
 
+        if options.batch or options.lines:
+            if options.batch:
+                traces = read_batch_file(options.batch)
+            else:
+                traces = [(args[0], line_no) for line_no
+                          in parse_line_range(options.lines)]
+            batch_tracer = BatchTracer(options.revision, options.jobs)
+            sys.exit(1 if batch_tracer.run(traces) else 0)
+
         # verify input path
         path_or_url = args[0]
         path_info = svn_common.SvnPathInfo(path_or_url, svn_common.SVN_AUTH)
@@ -63,7 +87,7 @@ def main(usage):
 
         # decide if remotesvn shall be used
         svn_common.REMOTESVN_ENABLED = \
-            svn_common.should_enable_remotesvn_if_ping_is_slow()
+            svn_common.should_enable_remotesvn()
 
         if options.line:
             _execute_line_trace(svn_path, options.revision,
@@ -93,6 +117,23 @@ def _get_options(usage):
     parser.add_option('-l', '--line',
                       default=None,
                       help="line number indicating which line to be traced")
+    parser.add_option('--lines',
+                      default=None,
+                      metavar='A-B',
+                      help=("range of line numbers to trace without asking"
+                            " anything, printing one JSON object per line"))
+    parser.add_option('--batch',
+                      default=None,
+                      metavar='FILE',
+                      help=("trace the lines listed in FILE (one"
+                            " PATH_OR_URL:LINES per line, - for standard"
+                            " input) like --lines"))
+    parser.add_option('-j', '--jobs',
+                      type='int',
+                      default=DEFAULT_JOBS,
+                      metavar='N',
+                      help=("maximum number of concurrent svn commands"
+                            " with --lines and --batch (default: %default)"))
     parser.add_option('-y', '--assume-yes',
                       default=False,
                       action='store_true',
@@ -116,85 +157,51 @@ def _execute_line_trace(svn_path, revision, line_no):
         svn_path.full_url,
         revision if revision else svn_path.revision,
         line_no)
+    # Each hop annotates another revision, so there is nothing to gain from
+    # keeping the annotations of all lines.
+    tracer = LineTracer(svn_path, memoize_annotations=False)
+    if revision:
+        svn_path = tracer.get_svn_path_at(svn_path, revision)
     while True:
-        commit, original_svn_path = annotate_commit(svn_path,
-                                                    revision,
-                                                    line_no)
-        svn_path.set_revision(revision)
-        if original_svn_path is None:
-            error("Cannot find path %s in the revision %s@%s." % (
-                  svn_path.file_path, commit.branch_url,
-                  commit.revision))
-        # Decide the line No. in the annotated revision
-        original_line_no, diff_lines = \
-            diff_revision(original_svn_path, svn_path, line_no)
-        if original_line_no is None:
+        changed_svn_path, changed_line_no, diff_lines, log_entry = \
+            tracer.find_change(svn_path, line_no)
+        if changed_line_no is None:
             # Need user interaction to help decide the line sometimes
-            tmp_diffs = {commit.revision: diff_lines}
-            _, line_no = _select_revision_and_lineno(svn_path.revision,
-                                                     tmp_diffs)
-        else:
-            line_no = original_line_no
-        svn_path = original_svn_path
+            _, changed_line_no = _select_revision_and_lineno(
+                svn_path.revision, {changed_svn_path.revision: diff_lines})
+            if changed_line_no is None:
+                break
+        svn_path = changed_svn_path
+        line_no = changed_line_no
         print "  from %s (line %d)" % (svn_path, line_no)
 
-        revision = None   # not to use it any more
-        lineno_in_merged_revision = None
-        diffs = {}
-        if commit.is_merged():
-            svn_merged_path = commit.get_merged_branch_path()
-            svn_merged_path.set_file_path(svn_path.file_path)
-            lineno_in_merged_revision, diffs_with_merged_revision = \
-                diff_revision(svn_merged_path, svn_path, line_no)
-            if lineno_in_merged_revision > 0:
-                # Found same line in merged revision
-                svn_path = svn_merged_path
-                line_no = lineno_in_merged_revision
-                print "  from %s (line %d)" % (svn_path, line_no)
-                continue
-            elif lineno_in_merged_revision is None:
-                # cannot decide which is the original line in merged revision
-                diffs[svn_merged_path.revision] = diffs_with_merged_revision
-
-        if not commit.is_path_newly_added(svn_path.file_path):
-            prev_revision = str(int(svn_path.revision) - 1)
-            svn_path_prev = copy.copy(svn_path)
-            svn_path_prev.set_revision(prev_revision)
-            lineno_in_prev_revision, diffs_with_prev_revision = \
-                diff_revision(svn_path_prev, svn_path, line_no)
-
-            if lineno_in_prev_revision == 0:
-                # The line is not in previous revision
-                if not commit.is_merged() or lineno_in_merged_revision == 0:
-                    # The line is not in merged revision either
-                    break
-            elif lineno_in_prev_revision > 0:
-                # Found same line in previous revision
-                svn_path = svn_path_prev
-                line_no = lineno_in_prev_revision
-                print "  from %s (line %d)" % (svn_path, line_no)
-                continue
-            else:
-                # Found different content in previous revision
-                diffs[prev_revision] = diffs_with_prev_revision
-
-        if len(diffs) == 0:
-            # The current revision is the final result
+        prev_svn_path, lineno_in_prev_revision, diffs_with_prev_revision = \
+            tracer.find_previous_line(svn_path, line_no, log_entry)
+        if prev_svn_path is None or lineno_in_prev_revision == 0:
+            # The line was added in the current revision
             break
-
-        # Ask user to select which version/line to continue
-        selected_revision, line_no = \
-            _select_revision_and_lineno(svn_path.revision, diffs)
+        elif lineno_in_prev_revision > 0:
+            # Found same line in previous revision
+            svn_path = prev_svn_path
+            line_no = lineno_in_prev_revision
+            print "  from %s (line %d)" % (svn_path, line_no)
+            continue
+
+        # Found different content in previous revision, ask user whether and
+        # from which line to continue
+        selected_revision, selected_line_no = _select_revision_and_lineno(
+            svn_path.revision,
+            {prev_svn_path.revision: diffs_with_prev_revision})
         if selected_revision is None:
             # The user wants to stop the loop
             break
-        svn_path.set_revision(selected_revision)
+        svn_path = prev_svn_path
+        line_no = selected_line_no
         print "  from %s (line %d)" % (svn_path, line_no)
-        continue
 
     print '=' * 58
     print "The revision is:"
-    print commit.get_info()
+    print log_entry.get_info()
 
 
 def _select_revision_and_lineno(revision, diffs):
@@ -0,0 +1,37 @@
+# Copyright (c) 2016 ARRIS Enterprises, Inc. All rights reserved.
+#
+# This program is confidential and proprietary to ARRIS Enterprises, Inc.
+# (ARRIS), and may not be copied, reproduced, modified, disclosed to others,
+# published or used, in whole or in part, without the express prior written
+# permission of ARRIS.
+
+import threading
+
+
+class Memo:
+    '''
+    Thread-safe cache of computed values. Each value is computed once even
+    if several threads ask for it at the same time; the other threads wait
+    for the result instead of running the same svn command again.
+    '''
+
+    def __init__(self):
+        self._values = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._values:
+                    return self._values[key]
+            # If compute raises, the next waiting thread tries again.
+            value = compute()
+            with self._lock:
+                self._values[key] = value
+                self._key_locks.pop(key, None)
+            return value
@@ -0,0 +1,155 @@
+#!/usr/bin/env python2
+
+import shutil
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+from os.path import dirname, join, realpath
+sys.path.insert(0, dirname(realpath(__file__)) + '/..')
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+
+from ancestry import AncestryResolver, CopyHistory, extract_copy_events
+
+ROOT = 'http://svn/repo'
+NEW_PATH = '/proj/branches/b/src/new.c'
+
+# svn log -v --xml of NEW_PATH@30: src/old.c was added on trunk in r10, the
+# branch was created from trunk in r20 and old.c was moved to new.c on the
+# branch in r25.
+LOG_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<log>
+<logentry revision="30">
+<paths>
+<path action="M" kind="file">/proj/branches/b/src/new.c</path>
+</paths>
+</logentry>
+<logentry revision="25">
+<paths>
+<path action="D" kind="file">/proj/branches/b/src/old.c</path>
+<path action="A" kind="file" copyfrom-path="/proj/branches/b/src/old.c"
+   copyfrom-rev="24">/proj/branches/b/src/new.c</path>
+</paths>
+</logentry>
+<logentry revision="20">
+<paths>
+<path action="A" kind="dir">/proj/branches</path>
+<path action="A" kind="dir" copyfrom-path="/proj/trunk"
+   copyfrom-rev="19">/proj/branches/b</path>
+</paths>
+</logentry>
+<logentry revision="12">
+<paths>
+<path action="M" kind="file">/proj/trunk/src/old.c</path>
+</paths>
+</logentry>
+<logentry revision="10">
+<paths>
+<path action="A" kind="file">/proj/trunk/src/old.c</path>
+</paths>
+</logentry>
+<logentry revision="5">
+<paths>
+<path action="A" kind="dir">/proj/trunk</path>
+</paths>
+</logentry>
+</log>
+'''
+
+EVENTS = [
+    [25, NEW_PATH, '/proj/branches/b/src/old.c', 24],
+    [20, '/proj/branches/b', '/proj/trunk', 19],
+    [10, '/proj/trunk/src/old.c', None, None],
+]
+
+
+def log_entries():
+    return ElementTree.fromstring(LOG_XML).findall('logentry')
+
+
+class ExtractCopyEventsTests(unittest.TestCase):
+    def test_copies_moves_and_addition(self):
+        self.assertEqual(extract_copy_events(log_entries(), NEW_PATH), EVENTS)
+
+    def test_entries_before_addition_are_not_read(self):
+        entries = iter(log_entries())
+        extract_copy_events(entries, NEW_PATH)
+        self.assertEqual(next(entries).attrib['revision'], '5')
+
+    def test_path_without_copies(self):
+        self.assertEqual(
+            extract_copy_events(log_entries()[3:], '/proj/trunk/src/old.c'),
+            [[10, '/proj/trunk/src/old.c', None, None]])
+
+
+class CopyHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.history = CopyHistory(NEW_PATH, 30, EVENTS)
+
+    def test_path_after_move(self):
+        self.assertEqual(self.history.find(NEW_PATH, 30), 0)
+        self.assertEqual(self.history.find(NEW_PATH, 25), 0)
+        self.assertEqual(self.history.find(NEW_PATH, 24), None)
+        self.assertEqual(self.history.find(NEW_PATH, 31), None)
+
+    def test_path_on_branch_before_move(self):
+        old_path = '/proj/branches/b/src/old.c'
+        self.assertEqual(self.history.find(old_path, 24), 1)
+        self.assertEqual(self.history.find(old_path, 20), 1)
+        self.assertEqual(self.history.find(old_path, 19), None)
+        self.assertEqual(self.history.find(old_path, 25), None)
+
+    def test_path_before_branch_copy(self):
+        trunk_path = '/proj/trunk/src/old.c'
+        self.assertEqual(self.history.find(trunk_path, 19), 2)
+        self.assertEqual(self.history.find(trunk_path, 10), 2)
+        self.assertEqual(self.history.find(trunk_path, 9), None)
+        self.assertEqual(self.history.find(trunk_path, 20), None)
+
+    def test_unrelated_path(self):
+        self.assertEqual(self.history.find('/proj/trunk/src/new.c', 19), None)
+
+    def test_json(self):
+        history = CopyHistory.from_json(self.history.to_json())
+        self.assertEqual((history.path, history.revision, history.events),
+                         (NEW_PATH, 30, EVENTS))
+
+
+class AncestryResolverTests(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._cache_file = join(self._tmpdir, 'cache', 'ancestry.json')
+        self.logs = []
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _create_resolver(self):
+        resolver = AncestryResolver(self._cache_file)
+        resolver._get_log = self._get_log
+        return resolver
+
+    def _get_log(self, repository_root, path, revision):
+        self.logs.append((path, revision))
+        return log_entries()
+
+    def test_histories_are_reused(self):
+        resolver = self._create_resolver()
+        self.assertEqual(resolver.get_copy_events(ROOT, NEW_PATH, '30'),
+                         EVENTS)
+        self.assertEqual(
+            resolver.get_copy_events(ROOT, '/proj/branches/b/src/old.c', 22),
+            EVENTS[1:])
+        self.assertEqual(self._create_resolver().get_copy_events(
+            ROOT, '/proj/trunk/src/old.c', 15), EVENTS[2:])
+        self.assertEqual(self.logs, [(NEW_PATH, 30)])
+
+    def test_head_is_not_cached(self):
+        resolver = self._create_resolver()
+        resolver.get_copy_events(ROOT, NEW_PATH, 'HEAD')
+        resolver.get_copy_events(ROOT, NEW_PATH, 'HEAD')
+        self.assertEqual(len(self.logs), 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
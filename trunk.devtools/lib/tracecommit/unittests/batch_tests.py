@@ -0,0 +1,180 @@
+#!/usr/bin/env python2
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from StringIO import StringIO
+from os.path import dirname, realpath
+sys.path.insert(0, dirname(realpath(__file__)) + '/..')
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+
+import batch
+from batch import BatchTracer, parse_line_range, read_batch_file, trace_line
+from commit import SvnPath
+from common import ExecutionError, UsageError, error
+
+ROOT = 'http://svn/repo'
+FILE = 'proj/trunk/file.c'
+
+
+def svn_path(revision, path=FILE):
+    return SvnPath(ROOT, path, revision)
+
+
+class FakeLogEntry:
+    def __init__(self, revision):
+        self.revision = revision
+        self.author = 'author%s' % revision
+        self.datetime = 'date%s' % revision
+
+
+class FakeTracer:
+    '''
+    Tracer answering from changes, which maps (svn path, line no) to
+    (revision, changed line no), and previous_lines, which maps (svn path,
+    line no) to (svn path or None, line no) before the change.
+    '''
+
+    def __init__(self, changes, previous_lines):
+        self._changes = changes
+        self._previous_lines = previous_lines
+
+    def find_change(self, path, line_no):
+        revision, changed_line_no = self._changes[(str(path), line_no)]
+        return (svn_path(revision), changed_line_no, None,
+                FakeLogEntry(revision))
+
+    def find_previous_line(self, path, line_no, log_entry):
+        previous_path, previous_line_no = \
+            self._previous_lines[(str(path), line_no)]
+        return previous_path, previous_line_no, None
+
+
+class SlowFakeTracer:
+    '''
+    Tracer that finds each line added in revision 10 + line number, taking
+    longer for earlier lines so that traces finish out of order.
+    '''
+
+    def find_change(self, path, line_no):
+        time.sleep(0.01 * (8 - line_no))
+        revision = str(10 + line_no)
+        return (svn_path(revision, path.root_relative_path()), line_no, None,
+                FakeLogEntry(revision))
+
+    def find_previous_line(self, path, line_no, log_entry):
+        return None, 0, None
+
+
+class ParseTests(unittest.TestCase):
+    def test_parse_line_range(self):
+        self.assertEqual(parse_line_range('5'), [5])
+        self.assertEqual(parse_line_range('5-7'), [5, 6, 7])
+        for text in ['', '0', '-5', '5-', '7-5', 'a', '5-b']:
+            self.assertRaises(UsageError, parse_line_range, text)
+
+    def test_read_batch_file(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                fp.write('# Comment\n\nfoo.c:3\nhttp://svn/a:b.c@5:1-2\n')
+            self.assertEqual(read_batch_file(path),
+                             [('foo.c', 3), ('http://svn/a:b.c@5', 1),
+                              ('http://svn/a:b.c@5', 2)])
+            with open(path, 'w') as fp:
+                fp.write('foo.c\n')
+            self.assertRaises(UsageError, read_batch_file, path)
+        finally:
+            os.remove(path)
+        self.assertRaises(ExecutionError, read_batch_file, path)
+
+
+class TraceLineTests(unittest.TestCase):
+    def test_line_added(self):
+        tracer = FakeTracer(
+            {(str(svn_path('20')), 3): ('15', 2),
+             (str(svn_path('14')), 2): ('10', 2)},
+            {(str(svn_path('15')), 2): (svn_path('14'), 2),
+             (str(svn_path('10')), 2): (None, 0)})
+        log_entry, hops, status = trace_line(tracer, svn_path('20'), 3)
+        self.assertEqual(log_entry.revision, '10')
+        self.assertEqual(hops, ['%s/%s@15:2' % (ROOT, FILE),
+                                '%s/%s@14:2' % (ROOT, FILE),
+                                '%s/%s@10:2' % (ROOT, FILE)])
+        self.assertEqual(status, batch.STATUS_ADDED)
+
+    def test_undecidable_change(self):
+        tracer = FakeTracer({(str(svn_path('20')), 3): ('15', None)}, {})
+        log_entry, hops, status = trace_line(tracer, svn_path('20'), 3)
+        self.assertEqual(log_entry.revision, '15')
+        self.assertEqual(hops, ['%s/%s@15' % (ROOT, FILE)])
+        self.assertEqual(status, batch.STATUS_CHANGED)
+
+    def test_line_changed_in_commit(self):
+        tracer = FakeTracer({(str(svn_path('20')), 3): ('15', 4)},
+                            {(str(svn_path('15')), 4): (svn_path('14'),
+                                                        None)})
+        _, hops, status = trace_line(tracer, svn_path('20'), 3)
+        self.assertEqual(hops, ['%s/%s@15:4' % (ROOT, FILE)])
+        self.assertEqual(status, batch.STATUS_CHANGED)
+
+
+class BatchTracerTests(unittest.TestCase):
+    def setUp(self):
+        self._saved = batch.LineTracer
+        batch.LineTracer = self._create_tracer
+        self._tracers = []
+
+    def tearDown(self):
+        batch.LineTracer = self._saved
+
+    def _create_tracer(self, path):
+        self._tracers.append(str(path))
+        return SlowFakeTracer()
+
+    def _run(self, traces, jobs=4):
+        output_fp = StringIO()
+        tracer = BatchTracer(jobs=jobs, output_fp=output_fp)
+        tracer._get_svn_path = self._get_svn_path
+        failures = tracer.run(traces)
+        return failures, [json.loads(line)
+                          for line in output_fp.getvalue().splitlines()]
+
+    def _get_svn_path(self, path_or_url):
+        if path_or_url == 'missing.c':
+            error('missing.c is not a file')
+        if path_or_url == 'broken.c':
+            raise KeyError('path')
+        return svn_path('20', path_or_url)
+
+    def test_results_are_in_input_order(self):
+        traces = [('proj/trunk/a.c', line_no) for line_no in range(1, 9)]
+        failures, results = self._run(traces)
+        self.assertEqual(failures, 0)
+        self.assertEqual([(x['path'], x['line']) for x in results], traces)
+        self.assertEqual([x['revision'] for x in results],
+                         [str(10 + line_no) for line_no in range(1, 9)])
+        self.assertEqual(results[0]['status'], batch.STATUS_ADDED)
+        self.assertEqual(results[0]['author'], 'author11')
+        self.assertEqual(self._tracers, ['%s/proj/trunk/a.c@20' % ROOT])
+
+    def test_errors_are_reported_per_line(self):
+        failures, results = self._run([('missing.c', 1),
+                                       ('proj/trunk/a.c', 1),
+                                       ('broken.c', 2)])
+        self.assertEqual(failures, 2)
+        self.assertEqual([x['status'] for x in results],
+                         [batch.STATUS_ERROR, batch.STATUS_ADDED,
+                          batch.STATUS_ERROR])
+        self.assertEqual(results[0]['error'], 'missing.c is not a file')
+        self.assertEqual(results[2]['error'], "KeyError: 'path'")
+
+    def test_no_traces(self):
+        self.assertEqual(self._run([]), (0, []))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
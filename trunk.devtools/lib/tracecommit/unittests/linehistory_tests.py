@@ -0,0 +1,198 @@
+#!/usr/bin/env python2
+
+import sys
+import unittest
+from StringIO import StringIO
+from os.path import dirname, realpath
+sys.path.insert(0, dirname(realpath(__file__)) + '/..')
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+
+import linehistory
+from commit import SvnPath
+from common import ExecutionError
+from memo import Memo
+from svnxml import iter_elements
+
+ROOT = 'http://svn/repo'
+
+BLAME_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<blame>
+<target path="file.c">
+<entry line-number="1"><commit revision="3"><author>a</author></commit>
+</entry>
+<entry line-number="2"><commit revision="5"><author>b</author></commit>
+<merged path="/proj/branches/b/file.c"><commit revision="4">
+<author>c</author></commit></merged>
+</entry>
+<entry line-number="3"><commit revision="3"><author>a</author></commit>
+</entry>
+</target>
+</blame>
+'''
+
+# svn log -v -g --xml of /proj/branches/b/src/new.c@30: src/old.c was added
+# on trunk in r10, the branch was created from trunk in r20, old.c was moved
+# to new.c on the branch in r25 and r28 on trunk was merged in r30.
+LOG_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<log>
+<logentry revision="30">
+<author>a</author>
+<date>2016-01-30T00:00:00.000000Z</date>
+<paths>
+<path action="M" kind="file">/proj/branches/b/src/new.c</path>
+</paths>
+<logentry revision="28">
+<author>b</author>
+<date>2016-01-28T00:00:00.000000Z</date>
+<paths>
+<path action="M" kind="file">/proj/trunk/src/old.c</path>
+</paths>
+</logentry>
+</logentry>
+<logentry revision="25">
+<author>a</author>
+<date>2016-01-25T00:00:00.000000Z</date>
+<paths>
+<path action="D" kind="file">/proj/branches/b/src/old.c</path>
+<path action="A" kind="file" copyfrom-path="/proj/branches/b/src/old.c"
+   copyfrom-rev="24">/proj/branches/b/src/new.c</path>
+</paths>
+</logentry>
+<logentry revision="20">
+<author>a</author>
+<date>2016-01-20T00:00:00.000000Z</date>
+<paths>
+<path action="A" kind="dir" copyfrom-path="/proj/trunk"
+   copyfrom-rev="19">/proj/branches/b</path>
+</paths>
+</logentry>
+<logentry revision="10">
+<author>b</author>
+<date>2016-01-10T00:00:00.000000Z</date>
+<paths>
+<path action="A" kind="file">/proj/trunk/src/old.c</path>
+</paths>
+</logentry>
+</log>
+'''
+
+NEW_PATH = '/proj/branches/b/src/new.c'
+BRANCH_OLD_PATH = '/proj/branches/b/src/old.c'
+TRUNK_OLD_PATH = '/proj/trunk/src/old.c'
+
+
+class FakeSvn:
+    '''Replacement for iter_svn_xml that serves fixed XML output.'''
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.commands = []
+        self.elements_read = 0
+        self.completed = 0
+
+    def iter_svn_xml(self, svn_command, tag):
+        self.commands.append(svn_command)
+        for element in iter_elements(StringIO(self.outputs[svn_command[1]]),
+                                     tag):
+            self.elements_read += 1
+            yield element
+        self.completed += 1
+
+
+class FakeSvnTestCase(unittest.TestCase):
+    def setUp(self):
+        self._saved = (linehistory.iter_svn_xml, linehistory._annotations)
+        self.svn = FakeSvn({'ann': BLAME_XML, 'log': LOG_XML})
+        linehistory.iter_svn_xml = self.svn.iter_svn_xml
+        linehistory._annotations = Memo()
+
+    def tearDown(self):
+        linehistory.iter_svn_xml, linehistory._annotations = self._saved
+
+
+class AnnotateLineTests(FakeSvnTestCase):
+    def test_memoized_annotations(self):
+        path = SvnPath(ROOT, 'proj/trunk/file.c', '5')
+        self.assertEqual(linehistory.annotate_line(path, 3), (None, '3'))
+        self.assertEqual(linehistory.annotate_line(path, 2),
+                         ('/proj/branches/b/file.c', '4'))
+        self.assertEqual(len(self.svn.commands), 1)
+        self.assertEqual(self.svn.completed, 1)
+        self.assertRaises(ExecutionError, linehistory.annotate_line, path, 4)
+
+    def test_annotation_stops_at_line(self):
+        path = SvnPath(ROOT, 'proj/trunk/file.c', '5')
+        self.assertEqual(linehistory.annotate_line(path, 2, memoize=False),
+                         ('/proj/branches/b/file.c', '4'))
+        self.assertEqual(self.svn.elements_read, 2)
+        self.assertEqual(self.svn.completed, 0)
+        self.assertRaises(ExecutionError, linehistory.annotate_line, path, 4,
+                          False)
+
+
+class FileHistoryTests(FakeSvnTestCase):
+    def setUp(self):
+        FakeSvnTestCase.setUp(self)
+        self.history = linehistory.FileHistory(
+            SvnPath(ROOT, NEW_PATH.lstrip('/'), '30'))
+
+    def test_path_at_revision(self):
+        for revision, path in [('30', NEW_PATH), ('26', NEW_PATH),
+                               ('25', NEW_PATH), ('24', BRANCH_OLD_PATH),
+                               ('20', BRANCH_OLD_PATH),
+                               ('19', TRUNK_OLD_PATH),
+                               ('10', TRUNK_OLD_PATH), ('9', None)]:
+            self.assertEqual(self.history.get_path_at(revision), path)
+
+    def test_entries(self):
+        entry = self.history.get_entry('30')
+        self.assertEqual((entry.author, entry.datetime),
+                         ('a', '2016-01-30T00:00:00.000000Z'))
+        self.assertEqual(entry.get_info(),
+                         'r30 | a | 2016-01-30T00:00:00.000000Z ')
+        # Merged revisions are part of the history too.
+        self.assertEqual(self.history.get_entry('28').author, 'b')
+        self.assertEqual(len(self.svn.commands), 1)
+        self.assertRaises(ExecutionError, self.history.get_entry, '27')
+        self.assertEqual(len(self.svn.commands), 2)
+
+    def test_previous_location(self):
+        self.assertEqual(
+            self.history.get_entry('30').get_previous_location(NEW_PATH),
+            (NEW_PATH, '29'))
+        # Renamed in the commit
+        self.assertEqual(
+            self.history.get_entry('25').get_previous_location(NEW_PATH),
+            (BRANCH_OLD_PATH, '24'))
+        # Parent directory copied in the commit
+        self.assertEqual(
+            self.history.get_entry('20').get_previous_location(
+                BRANCH_OLD_PATH),
+            (TRUNK_OLD_PATH, '19'))
+
+    def test_copy_source(self):
+        self.assertEqual(
+            self.history.get_entry('25').get_copy_source(NEW_PATH),
+            BRANCH_OLD_PATH)
+        self.assertEqual(
+            self.history.get_entry('30').get_copy_source(NEW_PATH), None)
+
+    def test_newly_added_path(self):
+        self.assertTrue(self.history.get_entry('10').is_path_newly_added(
+            TRUNK_OLD_PATH))
+        # Copies are not new files.
+        self.assertFalse(self.history.get_entry('25').is_path_newly_added(
+            NEW_PATH))
+        self.assertFalse(self.history.get_entry('30').is_path_newly_added(
+            NEW_PATH))
+
+    def test_svn_path_at_revision(self):
+        tracer = linehistory.LineTracer(
+            SvnPath(ROOT, NEW_PATH.lstrip('/'), '30'))
+        svn_path = tracer.get_svn_path_at(
+            SvnPath(ROOT, NEW_PATH.lstrip('/'), '30'), '15')
+        self.assertEqual(str(svn_path), ROOT + TRUNK_OLD_PATH + '@15')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python2
+
+import sys
+import unittest
+from os.path import dirname, realpath
+sys.path.insert(0, dirname(realpath(__file__)) + '/..')
+sys.path.insert(0, dirname(realpath(__file__)) + '/../../pycommon')
+
+from common import ExecutionError
+from linemap import ADDED, CHANGED, LineMap
+
+
+class LineMapTests(unittest.TestCase):
+    def test_unchanged_lines(self):
+        line_map = LineMap(['a', 'b', 'c'], ['a', 'b', 'c'])
+        for line_no in [1, 2, 3]:
+            self.assertEqual(line_map.get_old_line(line_no), (line_no, None))
+            self.assertEqual(line_map.get_new_line(line_no), line_no)
+
+    def test_inserted_line(self):
+        line_map = LineMap(['a', 'b'], ['a', 'x', 'b'])
+        old_line_no, hunk = line_map.get_old_line(2)
+        self.assertEqual(old_line_no, ADDED)
+        self.assertEqual(hunk[0], '@@ -2,0 +2,1 @@')
+        self.assertEqual(line_map.get_old_line(3), (2, None))
+        self.assertEqual(line_map.get_new_line(2), 3)
+
+    def test_deleted_line(self):
+        line_map = LineMap(['a', 'b', 'c'], ['a', 'c'])
+        self.assertEqual(line_map.get_old_line(2), (3, None))
+        self.assertEqual(line_map.get_new_line(2), ADDED)
+        self.assertEqual(line_map.get_new_line(3), 2)
+
+    def test_changed_lines(self):
+        line_map = LineMap(['a', 'b', 'c', 'd'], ['a', 'x', 'y', 'd'])
+        old_line_no, hunk = line_map.get_old_line(3)
+        self.assertEqual(old_line_no, CHANGED)
+        self.assertEqual(hunk[0], '@@ -2,2 +2,2 @@')
+        self.assertEqual(len(hunk), 5)
+        self.assertEqual(line_map.get_new_line(2), CHANGED)
+        self.assertEqual(line_map.get_new_line(4), 4)
+
+    def test_single_line_hunks(self):
+        # In svn diff output these hunks have no line count, e.g. "@@ -2 +2
+        # @@" and "@@ -4,0 +5 @@".
+        line_map = LineMap(['a', 'b', 'c', 'd'], ['a', 'x', 'c', 'd', 'e'])
+        old_line_no, hunk = line_map.get_old_line(2)
+        self.assertEqual(old_line_no, CHANGED)
+        self.assertEqual(hunk[0], '@@ -2,1 +2,1 @@')
+        self.assertTrue(hunk[1].startswith('-b '))
+        self.assertTrue(hunk[1].endswith('<== Line 2'))
+        self.assertEqual(line_map.get_old_line(3), (3, None))
+        self.assertEqual(line_map.get_old_line(4), (4, None))
+        old_line_no, hunk = line_map.get_old_line(5)
+        self.assertEqual(old_line_no, ADDED)
+        self.assertEqual(hunk[0], '@@ -5,0 +5,1 @@')
+        self.assertEqual(line_map.get_new_line(2), CHANGED)
+        self.assertEqual(line_map.get_new_line(3), 3)
+
+    def test_lines_out_of_range(self):
+        line_map = LineMap(['a'], ['a'])
+        self.assertRaises(ExecutionError, line_map.get_old_line, 0)
+        self.assertRaises(ExecutionError, line_map.get_old_line, 2)
+        self.assertEqual(line_map.get_new_line(2), ADDED)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)